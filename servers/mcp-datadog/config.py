@@ -17,3 +17,85 @@ configuration.api_key["appKeyAuth"] = DATADOG_APP_KEY
 configuration.server_variables["site"] = DATADOG_SITE
 configuration.verify_ssl = True  # Consider setting to True for production
 # configuration.debug = True  # Enable debug mode
+
+# Upstream request scheduling
+RATE_LIMIT_MAX_WAIT = float(os.getenv("DATADOG_RATE_LIMIT_MAX_WAIT", "60"))  # seconds a request may queue
+RATE_LIMIT_INITIAL_CONCURRENCY = int(os.getenv("DATADOG_INITIAL_CONCURRENCY", "4"))
+RATE_LIMIT_MAX_CONCURRENCY = int(os.getenv("DATADOG_MAX_CONCURRENCY", "16"))
+
+# Upstream resilience
+REQUEST_TIMEOUT = float(os.getenv("DATADOG_REQUEST_TIMEOUT", "30"))  # seconds per HTTP request
+RETRY_MAX_ATTEMPTS = int(os.getenv("DATADOG_RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("DATADOG_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("DATADOG_RETRY_MAX_DELAY", "8"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("DATADOG_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("DATADOG_BREAKER_RESET_TIMEOUT", "30"))
+SUBMIT_MAX_ATTEMPTS = int(os.getenv("DATADOG_SUBMIT_MAX_ATTEMPTS", "8"))  # sends of a buffered submission before it is dropped
+configuration.request_timeout = REQUEST_TIMEOUT
+
+# Request hedging for read-only tools
+HEDGING_ENABLED = os.getenv("DATADOG_HEDGING_ENABLED", "false").lower() in ("1", "true", "yes")
+HEDGE_BUDGET_RATIO = float(os.getenv("DATADOG_HEDGE_BUDGET_RATIO", "0.05"))  # max fraction of requests hedged
+HEDGE_MIN_SAMPLES = int(os.getenv("DATADOG_HEDGE_MIN_SAMPLES", "20"))  # latencies needed before estimating p95
+
+# Time-window fan-out for large span and event searches
+FANOUT_MAX_WINDOWS = int(os.getenv("DATADOG_FANOUT_MAX_WINDOWS", "16"))
+FANOUT_MAX_WORKERS = int(os.getenv("DATADOG_FANOUT_MAX_WORKERS", "8"))
+
+# Local event ring used by stream_events
+EVENT_RING_SIZE = int(os.getenv("DATADOG_EVENT_RING_SIZE", "5000"))  # events kept per query
+EVENT_RING_QUERIES = int(os.getenv("DATADOG_EVENT_RING_QUERIES", "32"))
+EVENT_INGEST_DELAY = float(os.getenv("DATADOG_EVENT_INGEST_DELAY", "60"))  # seconds before recent events are final
+
+# Metrics query cache, filled in fixed time blocks
+METRICS_CACHE_ENTRIES = int(os.getenv("DATADOG_METRICS_CACHE_ENTRIES", "1024"))  # blocks kept across all queries
+METRICS_CACHE_BLOCK = int(os.getenv("DATADOG_METRICS_CACHE_BLOCK", "86400"))  # seconds per cached block
+METRICS_CACHE_TTL = float(os.getenv("DATADOG_METRICS_CACHE_TTL", "3600"))  # blocks that ended before the ingest delay
+METRICS_CACHE_RECENT_TTL = float(os.getenv("DATADOG_METRICS_CACHE_RECENT_TTL", "60"))  # blocks that may still change
+METRICS_INGEST_DELAY = float(os.getenv("DATADOG_METRICS_INGEST_DELAY", "600"))  # seconds before recent points are final
+
+# Service dependency graph built from span peer.service data
+SERVICE_GRAPH_LOOKBACK = int(os.getenv("DATADOG_SERVICE_GRAPH_LOOKBACK", "3600"))  # seconds of spans the graph covers
+SERVICE_GRAPH_MAX_AGE = float(os.getenv("DATADOG_SERVICE_GRAPH_MAX_AGE", "600"))  # seconds before a background rebuild
+SERVICE_GRAPH_QUERY = os.getenv("DATADOG_SERVICE_GRAPH_QUERY", "")  # extra span filter, e.g. env:prod
+SERVICE_GRAPH_MAX_SERVICES = int(os.getenv("DATADOG_SERVICE_GRAPH_MAX_SERVICES", "1000"))
+SERVICE_GRAPH_MAX_PEERS = int(os.getenv("DATADOG_SERVICE_GRAPH_MAX_PEERS", "100"))  # callees kept per service
+
+# Burn-rate history of metric SLOs, kept without expiry
+SLO_HISTORY_MAX_QUERIES = int(os.getenv("DATADOG_SLO_HISTORY_MAX_QUERIES", "4096"))  # SLO count queries kept; 2 per metric SLO
+
+# SLO status board, rebuilt in the background
+SLO_BOARD_MAX_AGE = float(os.getenv("DATADOG_SLO_BOARD_MAX_AGE", "300"))  # seconds before a background rebuild
+SLO_BOARD_MAX_WORKERS = int(os.getenv("DATADOG_SLO_BOARD_MAX_WORKERS", "4"))  # SLOs evaluated at once
+
+# Local incident index with full-text search
+INCIDENT_INDEX_PATH = os.path.expanduser(os.getenv("DATADOG_INCIDENT_INDEX_PATH", "~/.cache/mcp-datadog/incidents.db"))
+INCIDENT_SYNC_MAX_AGE = float(os.getenv("DATADOG_INCIDENT_SYNC_MAX_AGE", "300"))  # seconds before a background sync
+
+# Incident watch and context prefetch
+INCIDENT_WATCH_INTERVAL = float(os.getenv("DATADOG_INCIDENT_WATCH_INTERVAL", "60"))  # seconds between checks for new incidents; 0 disables
+INCIDENT_CONTEXT_TTL = float(os.getenv("DATADOG_INCIDENT_CONTEXT_TTL", "600"))  # seconds a prefetched bundle is served
+INCIDENT_CONTEXT_ENTRIES = int(os.getenv("DATADOG_INCIDENT_CONTEXT_ENTRIES", "64"))
+INCIDENT_CONTEXT_LOOKBACK = int(os.getenv("DATADOG_INCIDENT_CONTEXT_LOOKBACK", "3600"))  # seconds before the incident
+INCIDENT_CONTEXT_OPERATION = os.getenv("DATADOG_INCIDENT_CONTEXT_OPERATION", "http.request")  # span operation for golden signals
+
+# Hourly usage warehouse
+USAGE_CHUNK_DAYS = int(os.getenv("DATADOG_USAGE_CHUNK_DAYS", "7"))  # days of hourly usage per backfill request
+USAGE_FINALIZE_DELAY = float(os.getenv("DATADOG_USAGE_FINALIZE_DELAY", "259200"))  # seconds after which an hour's usage is final
+USAGE_RECENT_TTL = float(os.getenv("DATADOG_USAGE_RECENT_TTL", "3600"))  # seconds before refetching hours that may still change
+
+# Local downtime index used for coverage and conflict checks
+DOWNTIME_SYNC_MAX_AGE = float(os.getenv("DATADOG_DOWNTIME_SYNC_MAX_AGE", "60"))  # seconds before a background sync
+DOWNTIME_RECURRENCE_WINDOW = float(os.getenv("DATADOG_DOWNTIME_RECURRENCE_WINDOW", "1209600"))  # seconds around now recurrences are expanded
+
+# Buffered service check submission
+SERVICE_CHECK_FLUSH_INTERVAL = float(os.getenv("DATADOG_SERVICE_CHECK_FLUSH_INTERVAL", "2"))  # seconds between flushes
+SERVICE_CHECK_BATCH_SIZE = int(os.getenv("DATADOG_SERVICE_CHECK_BATCH_SIZE", "100"))  # checks per request; a full batch flushes early
+SERVICE_CHECK_MAX_PENDING = int(os.getenv("DATADOG_SERVICE_CHECK_MAX_PENDING", "10000"))  # distinct checks waiting before submissions block
+SERVICE_CHECK_ENQUEUE_TIMEOUT = float(os.getenv("DATADOG_SERVICE_CHECK_ENQUEUE_TIMEOUT", "5"))  # seconds a submission waits for room
+
+# Buffered custom metric submission with client-side aggregation
+METRIC_SUBMIT_FLUSH_INTERVAL = float(os.getenv("DATADOG_METRIC_SUBMIT_FLUSH_INTERVAL", "10"))  # seconds aggregated into one point
+METRIC_SUBMIT_BATCH_SIZE = int(os.getenv("DATADOG_METRIC_SUBMIT_BATCH_SIZE", "500"))  # aggregates per request; a full batch flushes early
+METRIC_SUBMIT_MAX_PENDING = int(os.getenv("DATADOG_METRIC_SUBMIT_MAX_PENDING", "50000"))  # distinct series waiting before submissions block
+METRIC_SUBMIT_ENQUEUE_TIMEOUT = float(os.getenv("DATADOG_METRIC_SUBMIT_ENQUEUE_TIMEOUT", "5"))  # seconds a submission waits for room
@@ -3,7 +3,13 @@ import sys
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(module)s:%(lineno)d - %(message)s', stream=sys.stderr) # Redirect logs to stderr
 
 from mcp.server.fastmcp import FastMCP
-from modules import mcp_tools  # Import tool functions
+from mcp.types import ToolAnnotations
+from modules import mcp_tools, read_only_tools  # Import tool functions
+from modules.incident import start_incident_watch
+from modules.service_dependencies import start_service_graph
+from modules.slo import start_slo_board
+from utils.hedging import hedged
+from utils.offload import off_loop
 from pathlib import Path
 from mcp.server.fastmcp.resources import FileResource
 
@@ -11,7 +17,10 @@ from mcp.server.fastmcp.resources import FileResource
 mcp = FastMCP("Datadog Integration Service", host="0.0.0.0", port=8000)
 
 for tool in mcp_tools:
-    mcp.tool()(tool)
+    if tool in read_only_tools:
+        mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))(off_loop(hedged(tool)))
+    else:
+        mcp.tool(annotations=ToolAnnotations(readOnlyHint=False))(off_loop(tool))
 
 @mcp.resource("docs://modules")
 def view_documentation():
@@ -35,4 +44,7 @@ def review_code(code: str) -> str:
     return f"Please review this code:\n\n{code}"
 
 if __name__ == "__main__":
+    start_incident_watch()  # Notices new incidents and prefetches their context
+    start_slo_board()  # First board build runs while the server starts
+    start_service_graph()  # Likewise for the service dependency graph
     mcp.run(transport="sse")
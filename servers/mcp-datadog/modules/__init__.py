@@ -10,23 +10,28 @@ from .monitor import (
     delete_monitor,
     get_monitor,
     update_monitor,
+    backtest_monitor,
 )
 from .dashboard import list_dashboards, list_prompts
-from .downtime import create_downtime, update_downtime, cancel_downtime
+from .downtime import create_downtime, update_downtime, cancel_downtime, get_downtime_coverage, find_downtime_conflicts
 from .host import list_hosts, mute_host, unmute_host, get_host_totals
-from .incident import search_incidents, list_incidents, get_incident
-from .trace import list_traces
-from .metrics import query_metrics, list_metrics, query_p99_latency, query_error_rate, query_downstream_latency
-from .logs import archive_logs
-from .events import delete_event, search_events, get_event
+from .incident import search_incidents, list_incidents, get_incident, search_similar_incidents
+from .incident_context import get_incident_context
+from .trace import list_traces, get_trace_details, analyze_traces, sample_span_stats
+from .metrics import query_metrics, list_metrics, query_p99_latency, query_error_rate, query_downstream_latency, detect_metric_anomalies, compare_metrics, submit_metric
+from .logs import archive_logs, search_logs
+from .events import delete_event, search_events, get_event, stream_events, rollup_events
 from .tags import list_host_tags, add_host_tags, delete_host_tags
 from .users import list_users, get_user
 from .roles import list_roles, get_role, create_role, delete_role, update_role
 from .service_checks import submit_service_check, list_service_checks
-from .usage import get_hourly_usage
+from .usage import forecast_usage, get_hourly_usage, query_usage
 from .alerts import mute_alert, unmute_alert
-from .apm import query_apm_errors, query_apm_latency, query_apm_spans
-from .root_cause import analyze_service_with_apm
+from .apm import query_apm_errors, query_apm_latency, query_apm_spans, top_apm_endpoints, group_apm_errors
+from .root_cause import analyze_service_with_apm, correlate_deploys
+from .slo import list_slos, get_slo, delete_slo, get_slo_burn_rate, get_slo_board
+from .service_dependencies import list_service_dependencies, walk_service_dependencies, get_service_blast_radius, find_service_path
+from .instrumentation import get_rate_limit_status, get_circuit_breaker_status, get_hedging_status
 # List of tools for registration
 mcp_tools = [
     ## Monitor tools
@@ -40,6 +45,7 @@ mcp_tools = [
     delete_monitor,
     get_monitor,
     update_monitor,
+    backtest_monitor,
     ## Dashboard tools
     list_dashboards,
     list_prompts,
@@ -47,6 +53,8 @@ mcp_tools = [
     create_downtime,
     update_downtime,
     cancel_downtime,
+    get_downtime_coverage,
+    find_downtime_conflicts,
     ## Host tools
     list_hosts,
     # mute_host,
@@ -56,20 +64,31 @@ mcp_tools = [
     search_incidents,
     list_incidents,
     get_incident,
+    search_similar_incidents,
+    get_incident_context,
     ## Trace tools
     list_traces,
+    get_trace_details,
+    analyze_traces,
+    sample_span_stats,
     ## Metrics tools
     query_metrics,
     list_metrics,
     query_p99_latency,
     query_error_rate,
     query_downstream_latency,
+    detect_metric_anomalies,
+    compare_metrics,
+    submit_metric,
     ## Logs tools
     # archive_logs,
+    search_logs,
     ## Events tools
     # delete_event,
     search_events,
     get_event,
+    stream_events,
+    rollup_events,
     # Tags tools
     list_host_tags,
     # add_host_tags,
@@ -88,6 +107,8 @@ mcp_tools = [
     list_service_checks,
     # Usage tools
     get_hourly_usage,
+    query_usage,
+    forecast_usage,
     # Alerts tools
     mute_alert,
     unmute_alert,
@@ -95,8 +116,26 @@ mcp_tools = [
     query_apm_errors,
     query_apm_latency,
     query_apm_spans,
+    top_apm_endpoints,
+    group_apm_errors,
     # # Root Cause Analysis tools
     # analyze_service_with_apm,
+    correlate_deploys,
+    # Service dependency tools
+    list_service_dependencies,
+    walk_service_dependencies,
+    get_service_blast_radius,
+    find_service_path,
+    # SLO tools
+    list_slos,
+    get_slo,
+    # delete_slo,
+    get_slo_burn_rate,
+    get_slo_board,
+    # Instrumentation tools
+    get_rate_limit_status,
+    get_circuit_breaker_status,
+    get_hedging_status,
 ]
 
 mcp_tools.extend([
@@ -106,3 +145,66 @@ mcp_tools.extend([
     search_monitors,
     get_monitor,
 ])
+
+# Tools that only read from Datadog. Anything not listed here is treated as a write.
+read_only_tools = {
+    get_monitor_status,
+    backtest_monitor,
+    get_downtime_coverage,
+    find_downtime_conflicts,
+    list_monitor_config_policies,
+    search_monitors,
+    get_monitor,
+    list_dashboards,
+    list_prompts,
+    list_hosts,
+    get_host_totals,
+    search_incidents,
+    list_incidents,
+    get_incident,
+    search_similar_incidents,
+    get_incident_context,
+    list_traces,
+    get_trace_details,
+    analyze_traces,
+    sample_span_stats,
+    query_metrics,
+    list_metrics,
+    search_logs,
+    query_p99_latency,
+    query_error_rate,
+    query_downstream_latency,
+    detect_metric_anomalies,
+    compare_metrics,
+    search_events,
+    get_event,
+    stream_events,
+    rollup_events,
+    list_host_tags,
+    list_users,
+    get_user,
+    list_roles,
+    get_role,
+    list_service_checks,
+    get_hourly_usage,
+    query_usage,
+    forecast_usage,
+    query_apm_errors,
+    query_apm_latency,
+    query_apm_spans,
+    top_apm_endpoints,
+    group_apm_errors,
+    analyze_service_with_apm,
+    correlate_deploys,
+    list_service_dependencies,
+    walk_service_dependencies,
+    get_service_blast_radius,
+    find_service_path,
+    list_slos,
+    get_slo,
+    get_slo_burn_rate,
+    get_slo_board,
+    get_rate_limit_status,
+    get_circuit_breaker_status,
+    get_hedging_status,
+}
@@ -1,12 +1,16 @@
 from typing import Optional, Dict, Any
+from itertools import islice
 from pydantic import Field
-from datadog_api_client import ApiClient
+from utils.api_client import ApiClient
 from datadog_api_client.v2.api.spans_api import SpansApi
 from config import configuration
 from mcp.server.fastmcp import FastMCP
 from datadog_api_client.exceptions import (
     ApiException
 )
+from .trace import iter_spans, span_record
+from utils.fingerprint import fingerprint, normalize_stack, normalize_text
+from utils.sketches import SpaceSaving, TopN
 
 mcp = FastMCP("Datadog APM Service")
 
@@ -242,3 +246,157 @@ def query_apm_spans(
         return {"status": "error", "message": f"API error while querying APM spans: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while querying APM spans: {e}"}
+
+@mcp.tool()
+def top_apm_endpoints(
+    query: str = Field(..., description="The query selecting spans, e.g. 'service:web span.kind:server'"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    k: int = Field(default=10, ge=1, le=100, description="Number of endpoints in each top table"),
+    slowest: int = Field(default=5, ge=0, le=100, description="Number of slowest trace exemplars to keep"),
+    max_spans: int = Field(default=100000, ge=1, le=1000000, description="Maximum number of spans to scan")
+) -> Dict[str, Any]:
+    """Find the busiest, noisiest and slowest endpoints by streaming over matching spans.
+
+    Spans are read page by page and folded into Space-Saving counters keyed by
+    service and resource, plus a bounded heap of the slowest traces, so
+    memory stays constant however many spans are scanned. Counts for keys
+    that entered the table late can be overestimated by at most 'error'.
+
+    Args:
+        query (str): The query selecting spans.
+        from_time (int): Start time in epoch seconds.
+        to_time (int): End time in epoch seconds.
+        k (int): Number of endpoints in each top table. Default is 10.
+        slowest (int): Number of slowest trace exemplars to keep. Default is 5.
+        max_spans (int): Maximum number of spans to scan. Default is 100000.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing the status and message of the operation, along with
+        spans_scanned, top tables by hits, errors and total time (each row with endpoint, value and
+        error bound) and the slowest traces (trace_id, duration, service, resource)."""
+    try:
+        capacity = max(100, k * 10)
+        hits, errors, total_time = SpaceSaving(capacity), SpaceSaving(capacity), SpaceSaving(capacity)
+        slowest_traces = TopN(slowest) if slowest else None
+        scanned = 0
+        for span in islice(iter_spans(query, from_time, to_time, raw=True), max_spans):
+            record = span_record(span)
+            endpoint = f"{record['service']} {record['resource']}"
+            duration = record["end"] - record["start"]
+            hits.offer(endpoint)
+            if record["error"]:
+                errors.offer(endpoint)
+            total_time.offer(endpoint, duration)
+            if slowest_traces is not None:
+                slowest_traces.offer(duration, record["trace_id"], record)
+            scanned += 1
+
+        def table(sketch: SpaceSaving, scale: float = 1.0, digits: int = 0):
+            return [
+                {"endpoint": endpoint, "value": round(count * scale, digits), "error": round(error * scale, digits)}
+                for endpoint, count, error in sketch.top(k)
+            ]
+
+        return {
+            "status": "success",
+            "message": f"Scanned {scanned} spans",
+            "content": {
+                "spans_scanned": scanned,
+                "truncated": scanned >= max_spans,
+                "by_hits": table(hits),
+                "by_errors": table(errors),
+                "by_total_time_ms": table(total_time, 1000, 3),
+                "slowest_traces": [
+                    {"trace_id": record["trace_id"], "duration_ms": round(duration * 1000, 3),
+                     "service": record["service"], "resource": record["resource"], "start": int(record["start"])}
+                    for duration, record in (slowest_traces.items() if slowest_traces else [])
+                ],
+            },
+        }
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while ranking APM endpoints: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while ranking APM endpoints: {e}"}
+
+
+def error_groups(query: str, from_time: int, to_time: int, max_groups: int, max_spans: int) -> Dict[str, Any]:
+    """Scan error spans of a query and group them by fingerprint, largest groups first.
+
+    Returns spans_scanned, groups_found and the top `max_groups` groups.
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    scanned = 0
+    for span in islice(iter_spans(f"{query} status:error", from_time, to_time, raw=True), max_spans):
+        record = span_record(span)
+        error = (span["attributes"].get("custom") or {}).get("error") or {}
+        if not isinstance(error, dict):
+            error = {}
+        error_type = error.get("type") or error.get("kind") or ""
+        message = normalize_text(error.get("message") or error.get("msg"))
+        frames = normalize_stack(error.get("stack"))
+        fp = fingerprint(error_type, message, *frames)
+        group = groups.get(fp)
+        if group is None:
+            group = groups[fp] = {
+                "fingerprint": fp,
+                "error_type": error_type,
+                "message": message,
+                "count": 0,
+                "resources": {},
+                "first_seen": record["start"],
+                "last_seen": record["start"],
+                "exemplar_trace_id": record["trace_id"],
+                "exemplar_message": error.get("message"),
+            }
+        group["count"] += 1
+        endpoint = f"{record['service']} {record['resource']}"
+        group["resources"][endpoint] = group["resources"].get(endpoint, 0) + 1
+        group["first_seen"] = min(group["first_seen"], record["start"])
+        group["last_seen"] = max(group["last_seen"], record["start"])
+        scanned += 1
+
+    ranked = sorted(groups.values(), key=lambda g: -g["count"])[:max_groups]
+    for group in ranked:
+        resources = sorted(group["resources"].items(), key=lambda r: -r[1])
+        group["resources"] = [{"resource": name, "count": count} for name, count in resources[:10]]
+        group["first_seen"] = int(group["first_seen"])
+        group["last_seen"] = int(group["last_seen"])
+    return {"spans_scanned": scanned, "groups_found": len(groups), "groups": ranked}
+
+
+@mcp.tool()
+def group_apm_errors(
+    query: str = Field(..., description="The query selecting spans, e.g. 'service:web'; 'status:error' is added"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    max_groups: int = Field(default=20, ge=1, le=200, description="Maximum number of error groups to return"),
+    max_spans: int = Field(default=10000, ge=1, le=200000, description="Maximum number of error spans to scan")
+) -> Dict[str, Any]:
+    """Group error spans by fingerprint instead of returning each one.
+
+    The fingerprint combines error.type, the error message with numbers,
+    ids and hex values stripped, and the outermost and innermost stack frames.
+
+    Args:
+        query (str): The query selecting spans. Only spans with status:error are scanned.
+        from_time (int): Start time in epoch seconds.
+        to_time (int): End time in epoch seconds.
+        max_groups (int): Maximum number of groups to return. Default is 20.
+        max_spans (int): Maximum number of error spans to scan. Default is 10000.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing the status and message of the operation, along with
+        spans_scanned and the groups, largest first, each with fingerprint, error type, normalized
+        message, count, affected resources, first/last seen and an exemplar trace id and message."""
+    try:
+        content = error_groups(query, from_time, to_time, max_groups, max_spans)
+        return {
+            "status": "success",
+            "message": f"Grouped {content['spans_scanned']} error spans into {content['groups_found']} groups",
+            "content": content,
+        }
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while grouping APM errors: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while grouping APM errors: {e}"}
@@ -3,7 +3,7 @@ import json
 import time
 import logging
 import sys
-from datadog_api_client import ApiClient
+from utils.api_client import ApiClient
 from datadog_api_client.v1.api.dashboards_api import DashboardsApi
 from config import configuration
 from mcp.server.fastmcp import FastMCP
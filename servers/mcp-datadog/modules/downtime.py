@@ -1,12 +1,22 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from pydantic import BaseModel, Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v1.api.downtimes_api import DowntimesApi
-from config import configuration
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as tz
+import contextvars
+import json
+import time
+from utils.api_client import ApiClient, raw_configuration
+from datadog_api_client.v1.api.monitors_api import MonitorsApi
+from datadog_api_client.v2.api.downtimes_api import DowntimesApi
+from config import configuration, DOWNTIME_RECURRENCE_WINDOW, DOWNTIME_SYNC_MAX_AGE, FANOUT_MAX_WORKERS
 from mcp.server.fastmcp import FastMCP
+from utils.background import BackgroundValue
+from utils.downtime_index import DowntimeIndex, downtime_key, schedule_intervals, scope_matches
 
 mcp = FastMCP("Datadog Downtime Service")
 
+DOWNTIME_PAGE_SIZE = 100
+
 class DowntimeResponse(BaseModel):
     id: int
     scope: str
@@ -14,30 +24,140 @@ class DowntimeResponse(BaseModel):
     start: int
     end: int
 
+downtime_index = DowntimeIndex()
+
+
+def downtime_record(item: Dict[str, Any], now: float) -> Optional[Dict[str, Any]]:
+    """Index record of a v2 downtime, or None when it is canceled."""
+    attributes = item.get("attributes") or {}
+    if attributes.get("canceled") or attributes.get("status") == "canceled":
+        return None
+    schedule = attributes.get("schedule") or {}
+    identifier = attributes.get("monitor_identifier") or {}
+    return {
+        "id": str(item["id"]),
+        "scope": attributes.get("scope") or "*",
+        "message": attributes.get("message"),
+        "status": attributes.get("status"),
+        "monitor_id": identifier.get("monitor_id"),
+        "monitor_tags": identifier.get("monitor_tags"),
+        "recurring": "recurrences" in schedule,
+        "modified": attributes.get("modified"),
+        "intervals": schedule_intervals(schedule, now, DOWNTIME_RECURRENCE_WINDOW),
+    }
+
+
+def _list_downtime_page(offset: int) -> Dict[str, Any]:
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        response = DowntimesApi(api_client).list_downtimes(page_offset=offset, page_limit=DOWNTIME_PAGE_SIZE)
+        return json.loads(response.data)
+
+
+def list_all_downtimes() -> List[Dict[str, Any]]:
+    """Every downtime; the first page reports the total, so the remaining pages are fetched at once."""
+    first = _list_downtime_page(0)
+    items = first.get("data") or []
+    total = ((first.get("meta") or {}).get("page") or {}).get("total_filtered_count") or 0
+    offsets = list(range(DOWNTIME_PAGE_SIZE, total, DOWNTIME_PAGE_SIZE)) if len(items) == DOWNTIME_PAGE_SIZE else []
+    if offsets:
+        with ThreadPoolExecutor(max_workers=min(FANOUT_MAX_WORKERS, len(offsets)), thread_name_prefix="downtimes") as executor:
+            for page in executor.map(lambda o: contextvars.copy_context().run(_list_downtime_page, o), offsets):
+                items.extend(page.get("data") or [])
+    return items
+
+
+def sync_downtime_index() -> Dict[str, Any]:
+    """Bring the index in line with the API; only trees of downtimes that changed are rebuilt."""
+    now = time.time()
+    records = [r for r in (downtime_record(item, now) for item in list_all_downtimes()) if r is not None]
+    changed = downtime_index.apply(records, complete=True)
+    return {"changed": changed, "synced_at": int(now), **downtime_index.stats()}
+
+
+downtime_sync = BackgroundValue("downtime-sync", sync_downtime_index, DOWNTIME_SYNC_MAX_AGE)
+
+
+def _target(monitor_id: Optional[int], monitor_tags: Optional[List[str]]) -> Dict[str, Any]:
+    if monitor_id is not None:
+        return {"monitor_id": monitor_id}
+    return {"monitor_tags": monitor_tags or ["*"]}
+
+
+def _monitor_tags(monitor_id: int) -> List[str]:
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        response = MonitorsApi(api_client).get_monitor(monitor_id)
+    return json.loads(response.data).get("tags") or []
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz.utc).isoformat()
+
+
+def _window(downtime: Dict[str, Any], start: float, end: float) -> Dict[str, Any]:
+    return {
+        "id": downtime["id"],
+        "scope": downtime["scope"],
+        "monitor_id": downtime["monitor_id"],
+        "monitor_tags": downtime["monitor_tags"],
+        "message": downtime["message"],
+        "recurring": downtime["recurring"],
+        "start": int(start),
+        "end": None if end == float("inf") else int(end),
+    }
+
+
+def downtime_conflicts(scope: str, start: float, end: Optional[float], monitor_id: Optional[int],
+                       monitor_tags: Optional[List[str]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Downtimes overlapping a planned one in time and scope: (same target, other targets that may include it)."""
+    downtime_sync.get()
+    key = downtime_key({"scope": scope, **_target(monitor_id, monitor_tags)})
+    conflicts, possible = [], []
+    for downtime, s, e in downtime_index.overlapping(key, start, end if end is not None else float("inf")):
+        window = _window(downtime, s, e)
+        (conflicts if downtime_key(downtime)[:2] == key[:2] else possible).append(window)
+    return conflicts, possible
+
 @mcp.tool()
 def create_downtime(
     scope: str = Field(..., description="The scope to apply the downtime to"),
     message: str = Field(default="", description="The message for the downtime"),
     start: int = Field(default_factory=lambda: int(time.time()), description="Start time in epoch seconds"),
     end: Optional[int] = Field(default=None, description="End time in epoch seconds"),
-    timezone: str = Field(default="UTC", description="Timezone for the downtime")
+    timezone: str = Field(default="UTC", description="Timezone for the downtime"),
+    monitor_id: Optional[int] = Field(default=None, description="Silence only this monitor"),
+    monitor_tags: Optional[List[str]] = Field(default=None, description="Silence monitors carrying all these tags; every monitor if neither this nor monitor_id is given"),
+    allow_overlap: bool = Field(default=False, description="Create the downtime even if one with the same target already covers part of its scope and time")
 ) -> Dict[str, Any]:
     """Create a new downtime.
-    
+
+    Existing downtimes are checked first against the local downtime index;
+    if one with the same target overlaps in scope and time, nothing is
+    created unless allow_overlap is set.
+
     Args:
         scope (str): The scope to apply the downtime to.
         message (str, optional): The message for the downtime.
         start (int, optional): Start time in epoch seconds. Defaults to current time.
         end (Optional[int], optional): End time in epoch seconds.
         timezone (str, optional): Timezone for the downtime. Defaults to "UTC".
+        monitor_id (Optional[int], optional): Silence only this monitor.
+        monitor_tags (Optional[List[str]], optional): Silence monitors carrying all these tags.
+        allow_overlap (bool, optional): Create the downtime despite conflicts. Defaults to False.
 
     Returns:
         Dict[str, Any]: A dictionary containing:
             - status (str): 'success' or 'error'
             - message (str): Description of the operation result
-            - content (dict): Response data from the API if successful"""
+            - content (dict): Response data from the API if successful, or the conflicting downtimes"""
     try:
-        with ApiClient(configuration) as api_client:
+        conflicts, possible = downtime_conflicts(scope, start, end, monitor_id, monitor_tags)
+        if conflicts and not allow_overlap:
+            return {
+                "status": "error",
+                "message": f"{len(conflicts)} existing downtime(s) already cover part of this scope and time; set allow_overlap to create it anyway",
+                "content": {"conflicts": conflicts, "possible_overlaps": possible},
+            }
+        with ApiClient(raw_configuration(configuration)) as api_client:
             downtimes_api = DowntimesApi(api_client)
             body = {
                 "data": {
@@ -45,14 +165,18 @@ def create_downtime(
                     "attributes": {
                         "scope": scope,
                         "message": message,
-                        "start": start,
-                        "end": end,
-                        "timezone": timezone,
+                        "monitor_identifier": _target(monitor_id, monitor_tags),
+                        "schedule": {"start": _iso(start), "end": _iso(end) if end else None},
+                        "display_timezone": timezone,
                     },
                 }
             }
-            response = downtimes_api.create_downtime(body)
-            return {"status": "success", "message": "Downtime created successfully", "content": response.to_dict()}
+            response = json.loads(downtimes_api.create_downtime(body).data)
+        record = downtime_record(response["data"], time.time())
+        if record:
+            downtime_index.apply([record])
+        return {"status": "success", "message": "Downtime created successfully",
+                "content": {**response, "conflicts": conflicts, "possible_overlaps": possible}}
     except Exception as e:
         return {"status": "error", "message": f"Error creating downtime: {e}"}
 
@@ -77,7 +201,7 @@ def update_downtime(
             - message (str): Description of the operation result
             - content (dict): Response data from the API if successful"""
     try:
-        with ApiClient(configuration) as api_client:
+        with ApiClient(raw_configuration(configuration)) as api_client:
             downtimes_api = DowntimesApi(api_client)
             body = {"data": {"type": "downtime", "id": downtime_id, "attributes": {}}}
             if scope:
@@ -85,9 +209,14 @@ def update_downtime(
             if message:
                 body["data"]["attributes"]["message"] = message
             if end:
-                body["data"]["attributes"]["end"] = end
-            response = downtimes_api.update_downtime(downtime_id, body)
-            return {"status": "success", "message": "Downtime updated successfully", "content": response.to_dict()}
+                body["data"]["attributes"]["schedule"] = {"end": _iso(end)}
+            response = json.loads(downtimes_api.update_downtime(downtime_id, body).data)
+        record = downtime_record(response["data"], time.time())
+        if record:
+            downtime_index.apply([record])
+        else:
+            downtime_index.remove(downtime_id)
+        return {"status": "success", "message": "Downtime updated successfully", "content": response}
     except Exception as e:
         return {"status": "error", "message": f"Error updating downtime: {e}"}
 
@@ -108,6 +237,93 @@ def cancel_downtime(
         with ApiClient(configuration) as api_client:
             downtimes_api = DowntimesApi(api_client)
             downtimes_api.cancel_downtime(downtime_id)
-            return {"status": "success", "message": "Downtime canceled successfully"}
+        downtime_index.remove(downtime_id)
+        return {"status": "success", "message": "Downtime canceled successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error canceling downtime: {e}"}
+
+@mcp.tool()
+def get_downtime_coverage(
+    monitor_id: Optional[int] = Field(default=None, description="The monitor to check"),
+    monitor_tags: Optional[List[str]] = Field(default=None, description="Tags of the monitor; fetched from the monitor when omitted"),
+    group: Optional[str] = Field(default=None, description="Monitor group as comma-separated tags, e.g. 'host:web-1,env:prod'"),
+    at: Optional[int] = Field(default=None, description="Time to check in epoch seconds; now when omitted")
+) -> Dict[str, Any]:
+    """Check whether a monitor (or one of its groups) is silenced by a downtime at a given time.
+
+    Answered from a local index of downtimes, one interval tree per target
+    and scope, which is refreshed in the background; recurring downtimes are
+    expanded within DATADOG_DOWNTIME_RECURRENCE_WINDOW of now.
+
+    Args:
+        monitor_id (Optional[int]): The monitor to check.
+        monitor_tags (Optional[List[str]]): Tags of the monitor; fetched from the monitor when omitted.
+        group (Optional[str]): Monitor group as comma-separated tags.
+        at (Optional[int]): Time to check in epoch seconds. Defaults to now.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): Whether the monitor or group is silenced and the downtimes in effect,
+              each with whether its scope includes the group ('covers_group', None when undecidable)"""
+    if monitor_id is None and monitor_tags is None:
+        return {"status": "error", "message": "Either monitor_id or monitor_tags must be provided"}
+    try:
+        at = at if at is not None else int(time.time())
+        if monitor_tags is None:
+            monitor_tags = _monitor_tags(monitor_id)
+        sync = downtime_sync.get()
+        group_tags = [t for t in (group or "").split(",") if t.strip()]
+        downtimes = []
+        for downtime, start, end in downtime_index.covering(at, monitor_id, monitor_tags):
+            window = _window(downtime, start, end)
+            window["covers_group"] = scope_matches(downtime["scope"], group_tags) if group_tags else downtime["scope"].strip() in ("", "*")
+            downtimes.append(window)
+        silenced = any(d["covers_group"] for d in downtimes)
+        if silenced:
+            message = f"Silenced by {sum(1 for d in downtimes if d['covers_group'])} downtime(s)"
+        elif downtimes:
+            message = f"{len(downtimes)} downtime(s) in effect for other scopes"
+        else:
+            message = "No downtime in effect"
+        return {
+            "status": "success",
+            "message": message,
+            "content": {"at": at, "silenced": silenced, "downtimes": downtimes, "index": sync},
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error checking downtime coverage: {e}"}
+
+@mcp.tool()
+def find_downtime_conflicts(
+    scope: str = Field(..., description="Scope of the planned downtime"),
+    start: int = Field(default_factory=lambda: int(time.time()), description="Start time in epoch seconds"),
+    end: Optional[int] = Field(default=None, description="End time in epoch seconds; open-ended when omitted"),
+    monitor_id: Optional[int] = Field(default=None, description="Monitor the planned downtime targets"),
+    monitor_tags: Optional[List[str]] = Field(default=None, description="Monitor tags the planned downtime targets")
+) -> Dict[str, Any]:
+    """Find existing downtimes that overlap a planned one in time and scope, the same check create_downtime runs.
+
+    Args:
+        scope (str): Scope of the planned downtime.
+        start (int): Start time in epoch seconds. Defaults to now.
+        end (Optional[int]): End time in epoch seconds; open-ended when omitted.
+        monitor_id (Optional[int]): Monitor the planned downtime targets.
+        monitor_tags (Optional[List[str]]): Monitor tags the planned downtime targets; all monitors when neither is given.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): 'conflicts' with the same target and 'possible_overlaps' with targets that may
+              include the same monitors"""
+    try:
+        conflicts, possible = downtime_conflicts(scope, start, end, monitor_id, monitor_tags)
+        return {
+            "status": "success",
+            "message": f"Found {len(conflicts)} conflicting and {len(possible)} possibly overlapping downtime(s)",
+            "content": {"conflicts": conflicts, "possible_overlaps": possible},
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error finding downtime conflicts: {e}"}
@@ -1,7 +1,12 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+from itertools import islice
+import base64
+import json
+import threading
+import time
 from pydantic import Field
-from datadog_api_client import ApiClient
-from config import configuration
+from utils.api_client import ApiClient
+from config import configuration, EVENT_RING_SIZE, EVENT_RING_QUERIES, EVENT_INGEST_DELAY
 from mcp.server.fastmcp import FastMCP
 from datadog_api_client.v1.api.events_api import EventsApi as EventsApiV1
 from datadog_api_client.v2.api.events_api import EventsApi as EventsApiV2
@@ -9,9 +14,86 @@ from datadog_api_client.v2.model.events_list_request import EventsListRequest
 from datadog_api_client.v2.model.events_query_filter import EventsQueryFilter
 from datadog_api_client.v2.model.events_request_page import EventsRequestPage
 from datadog_api_client.v2.model.events_sort import EventsSort
+from utils.fanout import fan_out, iso8601, plan_windows
+from utils.event_ring import EventRing
+from utils.fingerprint import fingerprint, group_by_fingerprint, normalize_text
 
 mcp = FastMCP("Datadog Events Service")
 
+EVENTS_PAGE_LIMIT = 1000  # maximum page size of the v2 events search API
+ESTIMATE_PROBE_LIMIT = 100
+
+event_ring = EventRing(EVENT_RING_SIZE, EVENT_RING_QUERIES)
+
+
+def iter_events(query: str, from_time: int, to_time: int, sort: str = "timestamp",
+                page_limit: int = EVENTS_PAGE_LIMIT, stop: Optional[threading.Event] = None) -> Iterator[Any]:
+    """Yield v2 events matching a query, following the search cursor page by page until `stop` is set."""
+    cursor = None
+    with ApiClient(configuration) as api_client:
+        api_instance = EventsApiV2(api_client)
+        while stop is None or not stop.is_set():
+            page = EventsRequestPage(limit=page_limit, cursor=cursor) if cursor else EventsRequestPage(limit=page_limit)
+            body = EventsListRequest(
+                filter=EventsQueryFilter(query=query, _from=iso8601(from_time), to=iso8601(to_time)),
+                sort=EventsSort(sort),
+                page=page,
+            )
+            response = api_instance.search_events(body=body)
+            data = response.get("data") or []
+            yield from data
+            meta = response.get("meta")
+            cursor = meta.get("page", {}).get("after") if meta else None
+            if not cursor or len(data) < page_limit:
+                return
+
+
+def estimate_event_count(query: str, from_time: int, to_time: int) -> float:
+    """Estimate how many events match from the density of one small page."""
+    probe = list(islice(iter_events(query, from_time, to_time, "timestamp", ESTIMATE_PROBE_LIMIT), ESTIMATE_PROBE_LIMIT))
+    if len(probe) < ESTIMATE_PROBE_LIMIT:
+        return float(len(probe))
+    covered = probe[-1].attributes.timestamp.timestamp() - from_time
+    return len(probe) * (to_time - from_time) / max(covered, 1.0)
+
+
+def fetch_events(query: str, from_time: int, to_time: int, limit: int, sort: str = "timestamp") -> List[Any]:
+    """Return up to `limit` events in sort order.
+
+    Requests that fit in one page are a single call. Larger ones are split
+    into time windows sized from a probe estimate and fetched concurrently.
+    """
+    def fetch(start: int, end: int, n: int, stop: Optional[threading.Event] = None) -> List[Any]:
+        return list(islice(iter_events(query, start, end, sort, min(n, EVENTS_PAGE_LIMIT), stop), n))
+
+    if limit <= EVENTS_PAGE_LIMIT:
+        return fetch(from_time, to_time, limit)
+    descending = sort.startswith("-")
+    estimate = estimate_event_count(query, from_time, to_time)
+    windows = plan_windows(from_time, to_time, estimate, limit, EVENTS_PAGE_LIMIT, descending)
+    return fan_out(windows, fetch, limit, key=lambda event: event.attributes.timestamp,
+                  ident=lambda event: event.id, descending=descending)
+
+
+def _encode_watermark(query: str, ts_ms: int, ids: List[str]) -> str:
+    payload = json.dumps({"q": query, "ts": ts_ms, "ids": ids}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_watermark(watermark: str, query: str) -> Tuple[int, List[str]]:
+    payload = json.loads(base64.urlsafe_b64decode(watermark.encode()))
+    if payload.get("q") != query:
+        raise ValueError("watermark was issued for a different query")
+    return int(payload["ts"]), list(payload.get("ids", []))
+
+
+def _event_fingerprint(event: Dict[str, Any]) -> str:
+    attributes = event.get("attributes") or {}
+    inner = attributes.get("attributes") or {}
+    title = normalize_text(inner.get("title") or attributes.get("message"))
+    source = inner.get("source_type_name") or (inner.get("evt") or {}).get("source") or ""
+    tags = sorted({normalize_text(tag) for tag in attributes.get("tags") or []})
+    return fingerprint(title, source.lower(), ",".join(tags))
 
 
 @mcp.tool()
@@ -19,7 +101,8 @@ def search_events(
     query = Field(..., description="The search query to filter events"),
     from_time = Field(..., description="Start time in epoch seconds"),
     to_time = Field(..., description="End time in epoch seconds"),
-    limit: int = Field(default=5, description="Maximum number of events to return"),
+    limit: int = Field(default=5, ge=1, le=10000, description="Maximum number of events to return"),
+    sort: str = Field(default="timestamp", description="Sort order: 'timestamp' (oldest first) or '-timestamp' (newest first)"),
     ) -> Dict[str, Any]:
 
     """
@@ -29,36 +112,22 @@ def search_events(
         query (str): The search query to filter events.
         from_time (int): Start time in epoch seconds.
         to_time (int): End time in epoch seconds.
-        limit (int): Maximum number of events to return. Default is 5.
+        limit (int): Maximum number of events to return (1-10000). Default is 5.
+            Limits above one page (1000) are fetched as concurrent time windows.
+        sort (str): 'timestamp' (oldest first, default) or '-timestamp' (newest first).
     Returns:
         Dict[str, Any]: A dictionary containing:
             - status (str): 'success' or 'error'
             - message (str): Description of the operation result
-            - content (list): List of events if successful
+            - content (dict): Events under 'data' if successful
     """
     try:
-        # Criar o corpo da requisição
-        body = EventsListRequest(
-            filter=EventsQueryFilter(
-                query=query,
-                _from=str(from_time),  # Garante que o timestamp seja string
-                to=str(to_time)        # Garante que o timestamp seja string
-            ),
-            sort=EventsSort.TIMESTAMP_ASCENDING,
-            page=EventsRequestPage(
-                limit=limit
-            )
-        )
-
-        # Fazer a chamada à API
-        with ApiClient(configuration) as api_client:
-            api_instance = EventsApiV2(api_client)
-            response = api_instance.search_events(body=body)
-            return {
-                "status": "success",
-                "message": "Incidents retrieved successfully",
-                "content": response.to_dict()
-            }
+        events = fetch_events(query, int(from_time), int(to_time), limit, sort)
+        return {
+            "status": "success",
+            "message": "Events retrieved successfully",
+            "content": {"data": [event.to_dict() for event in events]}
+        }
             
     except Exception as e:
         return {"error": str(e), "details": "Failed to search events"}
@@ -112,3 +181,150 @@ def delete_event(
             return {"status": "success", "message": "Event deleted successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error deleting event: {e}"}
+
+@mcp.tool()
+def stream_events(
+    query: str = Field(..., description="The search query to filter events"),
+    watermark: Optional[str] = Field(default=None, description="Watermark returned by the previous call; only newer events are returned"),
+    from_time: Optional[int] = Field(default=None, description="Start time in epoch seconds when no watermark is given (default: 1 hour ago)"),
+    to_time: Optional[int] = Field(default=None, description="End time in epoch seconds (default: now minus the ingestion delay)"),
+    limit: int = Field(default=100, ge=1, le=1000, description="Maximum number of events to return"),
+) -> Dict[str, Any]:
+    """Stream events oldest first, resuming from the watermark of a previous call.
+
+    Follows the v2 events cursor, deduplicates by event id and keeps recent
+    events in a bounded local ring. The part of the window the ring already
+    holds is served from it, and Datadog is only asked for the rest, or not
+    at all when the ring alone has more than `limit` new events.
+
+    Args:
+        query (str): The search query to filter events.
+        watermark (Optional[str]): Opaque watermark from the previous call for the same query.
+        from_time (Optional[int]): Start time in epoch seconds if no watermark is given. Defaults to 1 hour ago.
+        to_time (Optional[int]): End time in epoch seconds. Defaults to now minus DATADOG_EVENT_INGEST_DELAY,
+            the newest point whose events are final, so repeated calls can be answered from the ring.
+        limit (int): Maximum number of events to return (1-1000). Defaults to 100.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): Events plus:
+                - watermark (str): Pass to the next call to continue after the last returned event
+                - has_more (bool): Whether more events are already available in the window
+                - source (str): 'cache' if answered from the local ring, 'api' otherwise"""
+    try:
+        now = time.time()
+        end_ms = int((to_time or now - EVENT_INGEST_DELAY) * 1000)
+        if watermark:
+            start_ms, seen = _decode_watermark(watermark, query)
+        else:
+            start_ms, seen = int((from_time or now - 3600) * 1000), []
+
+        seen_ids = set(seen)
+        source = "cache"
+        fetch_from = event_ring.resume_from(query, start_ms)
+        held = 0
+        if fetch_from > start_ms:
+            held = sum(1 for e in event_ring.read(query, start_ms, min(fetch_from, end_ms)) if e[1] not in seen_ids)
+        if not event_ring.covers(query, start_ms, end_ms) and held <= limit:
+            source = "api"
+            batch = []
+            exhausted = True
+            for event in iter_events(query, fetch_from // 1000, -(-end_ms // 1000), "timestamp"):
+                ts = int(event.attributes.timestamp.timestamp() * 1000)
+                if ts < fetch_from or ts >= end_ms:
+                    continue  # the API works in whole seconds
+                batch.append((ts, str(event.id), event.to_dict()))
+                if len(batch) > limit - held + len(seen):
+                    exhausted = False
+                    break
+            if exhausted:
+                # Events can still be ingested shortly after their timestamp
+                fetched_to = min(end_ms, int((now - EVENT_INGEST_DELAY) * 1000))
+            else:
+                fetched_to = batch[-1][0]
+            event_ring.add(query, batch, fetch_from, max(fetch_from, fetched_to))
+
+        candidates = [e for e in event_ring.read(query, start_ms, end_ms) if e[1] not in seen_ids]
+        events = candidates[:limit]
+        if events:
+            last_ts = events[-1][0]
+            ids = [event_id for ts, event_id, _ in events if ts == last_ts]
+            if last_ts == start_ms:
+                ids += seen
+            next_watermark = _encode_watermark(query, last_ts, ids)
+        else:
+            next_watermark = watermark or _encode_watermark(query, start_ms, [])
+        return {
+            "status": "success",
+            "message": "Events streamed successfully",
+            "content": {
+                "data": [event for _, _, event in events],
+                "watermark": next_watermark,
+                "has_more": len(candidates) > limit,
+                "source": source,
+            },
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error streaming events: {e}"}
+
+@mcp.tool()
+def rollup_events(
+    query: str = Field(..., description="The search query to filter events"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    bucket_minutes: int = Field(default=60, ge=0, description="Time bucket size in minutes; 0 groups over the whole range"),
+    max_events: int = Field(default=5000, ge=1, le=10000, description="Maximum number of events to scan"),
+    max_groups: int = Field(default=50, ge=1, le=500, description="Maximum number of groups to return"),
+) -> Dict[str, Any]:
+    """Collapse repeated events into one row per group.
+
+    Events are grouped by a fingerprint of their normalized title, source and
+    tags (numbers, ids and hex values stripped) and by time bucket, so an
+    alert storm of hundreds of near-identical events becomes a few rows.
+
+    Args:
+        query (str): The search query to filter events.
+        from_time (int): Start time in epoch seconds.
+        to_time (int): End time in epoch seconds.
+        bucket_minutes (int): Time bucket size in minutes; 0 groups over the whole range. Defaults to 60.
+        max_events (int): Maximum number of events to scan (1-10000). Defaults to 5000.
+        max_groups (int): Maximum number of groups to return (1-500). Defaults to 50.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): Counts of events scanned and groups found, and the groups, each with
+              fingerprint, bucket_start, count, first_seen, last_seen, title, source, tags and an exemplar event"""
+    try:
+        events = [
+            (event.attributes.timestamp.timestamp(), event.to_dict())
+            for event in fetch_events(query, int(from_time), int(to_time), max_events, "-timestamp")
+        ]
+        groups = group_by_fingerprint(
+            events,
+            key=lambda item: _event_fingerprint(item[1]),
+            timestamp=lambda item: item[0],
+            bucket_seconds=bucket_minutes * 60,
+        )
+        rows = []
+        for group in groups[:max_groups]:
+            exemplar = group.pop("exemplar")[1]
+            attributes = exemplar.get("attributes") or {}
+            inner = attributes.get("attributes") or {}
+            rows.append({
+                **group,
+                "title": inner.get("title") or attributes.get("message"),
+                "source": inner.get("source_type_name") or (inner.get("evt") or {}).get("source"),
+                "tags": attributes.get("tags") or [],
+                "exemplar": {"id": exemplar.get("id"), "message": (attributes.get("message") or "")[:500]},
+            })
+        return {
+            "status": "success",
+            "message": "Events rolled up successfully",
+            "content": {"events_scanned": len(events), "groups_found": len(groups), "groups": rows},
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error rolling up events: {e}"}
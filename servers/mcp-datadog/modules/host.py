@@ -1,6 +1,6 @@
 import json
 import sys
-from datadog_api_client import ApiClient
+from utils.api_client import ApiClient
 from datadog_api_client.v1.api.hosts_api import HostsApi
 from config import configuration
 from mcp.server.fastmcp import FastMCP
@@ -1,21 +1,44 @@
 from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import contextvars
 import json
 import logging
 import sys
-from datadog_api_client import ApiClient
+import threading
+import time
+from utils.api_client import ApiClient, raw_configuration
 from datadog_api_client.v2.api.incidents_api import IncidentsApi
-from config import configuration
+from datadog_api_client.v2.model.incident_search_sort_order import IncidentSearchSortOrder
+from config import (
+    configuration,
+    FANOUT_MAX_WORKERS,
+    INCIDENT_INDEX_PATH,
+    INCIDENT_SYNC_MAX_AGE,
+    INCIDENT_WATCH_INTERVAL,
+)
 from mcp.server.fastmcp import FastMCP
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
+from utils.background import BackgroundValue
+from utils.incident_index import IncidentIndex
 
 mcp = FastMCP("Datadog Incident Service")
 
+logger = logging.getLogger(__name__)
+
+INCIDENT_PAGE_SIZE = 100  # maximum page size of the incidents API
+INCIDENT_ALL_QUERY = "state:(active OR stable OR resolved OR completed)"  # search needs a query; this is every incident
+
+# Called with the records of incidents a sync saw for the first time
+new_incident_listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+
 
 configuration.unstable_operations["search_incidents"] = True
 configuration.unstable_operations["list_incidents"] = True
 configuration.unstable_operations["get_incident"] = True
 configuration.unstable_operations["update_incident"] = True
 configuration.unstable_operations["delete_incident"] = True
+configuration.unstable_operations["list_incident_attachments"] = True
 
 @mcp.tool()
 def search_incidents(
@@ -175,3 +198,246 @@ def delete_incident(
             return {"status": "success", "message": "Incident deleted successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error deleting incident: {e}"}
+
+
+def _epoch(timestamp: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp() if timestamp else None
+
+
+def _list_incident_page(offset: int) -> List[Dict[str, Any]]:
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        response = IncidentsApi(api_client).list_incidents(page_size=INCIDENT_PAGE_SIZE, page_offset=offset)
+        return json.loads(response.data).get("data") or []
+
+
+def list_all_incidents() -> List[Dict[str, Any]]:
+    """Every incident of the organization, fetched FANOUT_MAX_WORKERS pages at a time.
+
+    The API reports no total, so pages are requested in waves until one
+    comes back short.
+    """
+    incidents, offset = [], 0
+    with ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="incidents") as executor:
+        while True:
+            offsets = [offset + i * INCIDENT_PAGE_SIZE for i in range(FANOUT_MAX_WORKERS)]
+            futures = [executor.submit(contextvars.copy_context().run, _list_incident_page, o) for o in offsets]
+            pages = [future.result() for future in futures]
+            for page in pages:
+                incidents.extend(page)
+                if len(page) < INCIDENT_PAGE_SIZE:
+                    return incidents
+            offset = offsets[-1] + INCIDENT_PAGE_SIZE
+
+
+def _incident_attachments(incident_id: str) -> List[Dict[str, Any]]:
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        response = IncidentsApi(api_client).list_incident_attachments(incident_id)
+    attachments = []
+    for item in json.loads(response.data).get("data") or []:
+        attributes = item.get("attributes") or {}
+        attachment = attributes.get("attachment") or {}
+        attachments.append({"type": attributes.get("attachment_type"), "title": attachment.get("title"),
+                            "url": attachment.get("documentUrl")})
+    return attachments
+
+
+def _incident_record(item: Dict[str, Any], attachments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    attributes = item.get("attributes") or {}
+    fields = {}
+    for name, field in (attributes.get("fields") or {}).items():
+        value = (field or {}).get("value")
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        if value:
+            fields[name] = value
+    if attributes.get("customer_impact_scope"):
+        fields["customer_impact_scope"] = attributes["customer_impact_scope"]
+    return {
+        "id": item["id"],
+        "public_id": attributes.get("public_id"),
+        "title": attributes.get("title"),
+        "state": attributes.get("state") or fields.get("state"),
+        "severity": attributes.get("severity") or fields.get("severity"),
+        "created": _epoch(attributes.get("created")),
+        "modified": _epoch(attributes.get("modified")),
+        "resolved": _epoch(attributes.get("resolved")),
+        "customer_impacted": attributes.get("customer_impacted"),
+        "fields": fields,
+        "attachments": attachments,
+    }
+
+
+# The database is opened on the first sync or search, not at import
+incident_index = IncidentIndex(INCIDENT_INDEX_PATH)
+
+# Full syncs and new-incident checks write the index one at a time
+_sync_lock = threading.Lock()
+
+
+def _records_with_attachments(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Index records for listed incidents, their attachments fetched concurrently."""
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(FANOUT_MAX_WORKERS, len(items)), thread_name_prefix="incidents") as executor:
+        futures = [(item, executor.submit(contextvars.copy_context().run, _incident_attachments, item["id"]))
+                   for item in items]
+        return [_incident_record(item, future.result()) for item, future in futures]
+
+
+def _notify_new(records: List[Dict[str, Any]]) -> None:
+    if not records:
+        return
+    for listener in new_incident_listeners:
+        try:
+            listener(records)
+        except Exception as e:
+            logger.warning("New incident listener failed: %s", e)
+
+
+def sync_incident_index() -> Dict[str, Any]:
+    """Bring the local index up to date with Datadog.
+
+    The incident list is read in full on every sync, since that is the only
+    way to notice deleted incidents; only the attachment requests are
+    incremental, made concurrently for incidents that are new or whose
+    modified time moved. Incidents no longer listed are dropped.
+    """
+    with _sync_lock:
+        listed = list_all_incidents()
+        known = incident_index.modified_times()
+        changed = [item for item in listed
+                   if known.get(item["id"]) != _epoch((item.get("attributes") or {}).get("modified"))]
+        records = _records_with_attachments(changed)
+        incident_index.upsert(records)
+        deleted = incident_index.delete_missing(item["id"] for item in listed)
+        synced_at = int(time.time())
+        incident_index.set_state("last_sync", str(synced_at))
+        new = [r for r in records if r["id"] not in known]
+        _notify_new(new)
+    return {
+        "synced_at": synced_at,
+        "listed": len(listed),
+        "new": [r["id"] for r in new],
+        "updated": sum(1 for r in records if r["id"] in known),
+        "deleted": deleted,
+    }
+
+
+def _newest_incident_page(offset: int) -> List[Dict[str, Any]]:
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        response = IncidentsApi(api_client).search_incidents(
+            query=INCIDENT_ALL_QUERY, sort=IncidentSearchSortOrder.CREATED_DESCENDING,
+            page_size=INCIDENT_PAGE_SIZE, page_offset=offset,
+        )
+    attributes = (json.loads(response.data).get("data") or {}).get("attributes") or {}
+    return [item.get("data") or {} for item in attributes.get("incidents") or []]
+
+
+def sync_new_incidents() -> Dict[str, Any]:
+    """Add incidents created since the last check to the index.
+
+    Incidents are read newest first and paging stops at the first page
+    holding an incident already indexed, so a check with nothing new costs
+    one request. Changes to known incidents and deletions wait for the next
+    full sync_incident_index.
+    """
+    with _sync_lock:
+        known = incident_index.modified_times()
+        fresh, offset = [], 0
+        while True:
+            page = _newest_incident_page(offset)
+            unseen = [item for item in page if item.get("id") and item["id"] not in known]
+            fresh.extend(unseen)
+            if len(unseen) < len(page) or len(page) < INCIDENT_PAGE_SIZE:
+                break
+            offset += len(page)
+        records = _records_with_attachments(fresh)
+        incident_index.upsert(records)
+        _notify_new(records)
+    return {"checked_at": int(time.time()), "pages": offset // INCIDENT_PAGE_SIZE + 1, "new": [r["id"] for r in records]}
+
+
+incident_sync = BackgroundValue("incident-sync", sync_incident_index, INCIDENT_SYNC_MAX_AGE)
+
+
+def _watch_incidents(interval: float) -> None:
+    while True:
+        try:
+            if incident_index.get_state("last_sync") is None:
+                incident_sync.refresh()
+            else:
+                # The full re-list only runs, in the background, once older than INCIDENT_SYNC_MAX_AGE
+                incident_sync.get(wait=False)
+                sync_new_incidents()
+        except Exception as e:
+            logger.warning("Incident sync failed: %s", e)
+        time.sleep(interval)
+
+
+def start_incident_watch(interval: float = INCIDENT_WATCH_INTERVAL) -> Optional[threading.Thread]:
+    """Check for new incidents every `interval` seconds in a daemon thread, so they are noticed without a tool call."""
+    if interval <= 0:
+        return None
+    thread = threading.Thread(target=_watch_incidents, args=(interval,), name="incident-watch", daemon=True)
+    thread.start()
+    return thread
+
+
+def synced_incident_index() -> IncidentIndex:
+    """The local index, synced in the foreground only if it has never been synced."""
+    incident_sync.get(wait=incident_index.get_state("last_sync") is None)
+    return incident_index
+
+@mcp.tool()
+def search_similar_incidents(
+    text: Optional[str] = Field(default=None, description="Free text describing the problem, e.g. an alert title or error message"),
+    incident_id: Optional[str] = Field(default=None, description="Find incidents similar to this incident (UUID or public ID) instead"),
+    limit: int = Field(default=10, ge=1, le=100, description="Maximum number of incidents to return"),
+) -> dict:
+    """Find past incidents similar to a description or to another incident, from a local full-text index.
+
+    All incidents are synced into a local SQLite FTS5 index (title, fields,
+    customer impact scope and attachment titles) that is refreshed in the
+    background once older than DATADOG_INCIDENT_SYNC_MAX_AGE, so searches
+    run locally. Results are ranked by BM25, title matches weighing most.
+
+    Args:
+        text (Optional[str]): Free text describing the problem.
+        incident_id (Optional[str]): Find incidents similar to this incident instead.
+        limit (int): Maximum number of incidents to return (1-100, default: 10).
+
+    Returns:
+        dict: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): Matching incidents with score and matched snippet, and the index state"""
+    if not text and not incident_id:
+        return {"status": "error", "message": "Either text or incident_id is required", "content": []}
+    try:
+        index = synced_incident_index()
+        exclude = None
+        if incident_id:
+            incident = index.get(incident_id)
+            if incident is None:
+                return {"status": "error", "message": f"Incident {incident_id} is not in the local index", "content": []}
+            exclude = incident["id"]
+            # State and severity are shared by too many incidents to say anything about similarity
+            descriptive = [str(v) for k, v in incident["fields"].items() if k not in ("state", "severity")]
+            text = " ".join([text or "", incident["title"] or "", *descriptive])
+        matches = index.search(text, limit, exclude)
+        last_sync = index.get_state("last_sync")
+        return {
+            "status": "success",
+            "message": f"Found {len(matches)} similar incidents",
+            "content": {
+                "incidents": [
+                    {key: match[key] for key in ("id", "public_id", "title", "state", "severity", "created",
+                                                 "resolved", "customer_impacted", "score", "snippet")}
+                    for match in matches
+                ],
+                "index": {"incidents": index.count(), "last_sync": int(last_sync) if last_sync else None,
+                          "sync": incident_sync.status()},
+            },
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error searching similar incidents: {e}", "content": []}
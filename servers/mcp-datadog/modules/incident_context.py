@@ -0,0 +1,186 @@
+from typing import Dict, Any, List, Optional
+from pydantic import Field
+from mcp.server.fastmcp import FastMCP
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import json
+import logging
+import threading
+import time
+import numpy as np
+from utils.api_client import ApiClient, raw_configuration
+from datadog_api_client.v1.api.monitors_api import MonitorsApi
+from config import (
+    configuration,
+    FANOUT_MAX_WORKERS,
+    INCIDENT_CONTEXT_ENTRIES,
+    INCIDENT_CONTEXT_LOOKBACK,
+    INCIDENT_CONTEXT_OPERATION,
+    INCIDENT_CONTEXT_TTL,
+)
+from utils.cache import TTLCache
+from .apm import error_groups
+from .events import fetch_events
+from .incident import new_incident_listeners, synced_incident_index
+from .metrics import fetch_metric_series
+from .root_cause import DEPLOY_EVENTS_LIMIT
+
+mcp = FastMCP("Datadog Incident Context Service")
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_MAX_SERVICES = 3  # services of an incident that get their own signals
+CONTEXT_MONITORS_LIMIT = 30
+CONTEXT_ERROR_SPANS = 2000
+CONTEXT_PREFETCH_MAX = 5  # incidents prefetched per sync, newest first
+ACTIVE_STATES = {"active", "stable"}
+MONITOR_STATE_ORDER = {"Alert": 0, "Warn": 1, "No Data": 2}
+
+context_cache = TTLCache(INCIDENT_CONTEXT_ENTRIES)
+
+
+def incident_services(incident: Dict[str, Any]) -> List[str]:
+    value = (incident.get("fields") or {}).get("services") or ""
+    return [s.strip() for s in value.split(",") if s.strip()][:CONTEXT_MAX_SERVICES]
+
+
+def _monitors(service: str) -> List[Dict[str, Any]]:
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        response = MonitorsApi(api_client).search_monitors(query=f'tag:"service:{service}"', per_page=CONTEXT_MONITORS_LIMIT)
+    monitors = [
+        {"id": m.get("id"), "name": m.get("name"), "status": m.get("status"), "query": m.get("query")}
+        for m in json.loads(response.data).get("monitors") or []
+    ]
+    return sorted(monitors, key=lambda m: MONITOR_STATE_ORDER.get(m["status"], 3))
+
+
+def _signal(query: str, from_time: int, started: float, to_time: int) -> Dict[str, Any]:
+    """Mean of a metric before and since the incident started, summed over its series."""
+    before, since = [], []
+    for _, times, values in fetch_metric_series(query, from_time, to_time):
+        before.append(values[times < started])
+        since.append(values[times >= started])
+    before_values, since_values = np.concatenate(before or [np.empty(0)]), np.concatenate(since or [np.empty(0)])
+    mean_before = float(before_values.mean()) if len(before_values) else None
+    mean_since = float(since_values.mean()) if len(since_values) else None
+    change = None
+    if mean_before and mean_since is not None:
+        change = round((mean_since - mean_before) / abs(mean_before) * 100, 1)
+    return {"query": query, "mean_before": mean_before, "mean_since": mean_since, "change_pct": change}
+
+
+def _deploys(service: str, from_time: int, to_time: int) -> List[Dict[str, Any]]:
+    deploys = []
+    for event in fetch_events(f"service:{service} (source:deployment OR deploy)", from_time, to_time, DEPLOY_EVENTS_LIMIT):
+        attributes = event.attributes
+        inner = attributes.get("attributes")
+        deploys.append({"event_id": event.get("id"), "at": int(attributes.timestamp.timestamp()),
+                        "title": (inner.get("title") if inner else None) or attributes.get("message")})
+    return sorted(deploys, key=lambda d: -d["at"])
+
+
+def build_incident_context(incident: Dict[str, Any]) -> Dict[str, Any]:
+    """Fetch everything responders usually ask for first, all requests at once.
+
+    For each service of the incident: monitors tagged with it, hits, errors
+    and latency of INCIDENT_CONTEXT_OPERATION before and since the incident
+    started, deploy events and the top error groups. A failing part is
+    reported in `errors` without failing the bundle.
+    """
+    now = int(time.time())
+    started = incident.get("created") or now
+    from_time = int(started) - INCIDENT_CONTEXT_LOOKBACK
+    services = incident_services(incident)
+    operation = INCIDENT_CONTEXT_OPERATION
+    tasks = {}
+    for service in services:
+        tag = f"{{service:{service}}}"
+        tasks[(service, "monitors")] = (_monitors, service)
+        tasks[(service, "hits")] = (_signal, f"sum:trace.{operation}.hits{tag}.as_count()", from_time, started, now)
+        tasks[(service, "errors")] = (_signal, f"sum:trace.{operation}.errors{tag}.as_count()", from_time, started, now)
+        tasks[(service, "latency")] = (_signal, f"avg:trace.{operation}.duration{tag}", from_time, started, now)
+        tasks[(service, "deploys")] = (_deploys, service, from_time, now)
+        tasks[(service, "error_groups")] = (error_groups, f"service:{service}", from_time, now, 5, CONTEXT_ERROR_SPANS)
+
+    bundle: Dict[str, Any] = {service: {"golden_signals": {}} for service in services}
+    errors = []
+    if tasks:
+        with ThreadPoolExecutor(max_workers=min(FANOUT_MAX_WORKERS, len(tasks)), thread_name_prefix="incident-context") as executor:
+            futures = {key: executor.submit(contextvars.copy_context().run, *task) for key, task in tasks.items()}
+            for (service, part), future in futures.items():
+                try:
+                    value = future.result()
+                except Exception as e:
+                    errors.append({"service": service, "part": part, "error": str(e)})
+                    continue
+                if part in ("hits", "errors", "latency"):
+                    bundle[service]["golden_signals"][part] = value
+                else:
+                    bundle[service][part] = value
+    return {
+        "incident": {key: incident.get(key) for key in ("id", "public_id", "title", "state", "severity", "created")},
+        "time_range": {"from": from_time, "incident_start": int(started), "to": now},
+        "services": bundle,
+        "errors": errors,
+        "built_at": now,
+    }
+
+
+def _prefetch(incidents: List[Dict[str, Any]]) -> None:
+    for incident in incidents:
+        try:
+            context_cache.set(incident["id"], build_incident_context(incident), INCIDENT_CONTEXT_TTL)
+        except Exception as e:
+            logger.warning("Prefetching context of incident %s failed: %s", incident.get("id"), e)
+
+
+def prefetch_new_incidents(incidents: List[Dict[str, Any]]) -> None:
+    """Sync listener: build the context of newly seen active incidents in the background."""
+    active = [i for i in incidents if (i.get("state") or "").lower() in ACTIVE_STATES and incident_services(i)]
+    active = sorted(active, key=lambda i: -(i.get("created") or 0))[:CONTEXT_PREFETCH_MAX]
+    if active:
+        threading.Thread(target=_prefetch, args=(active,), name="incident-prefetch", daemon=True).start()
+
+
+new_incident_listeners.append(prefetch_new_incidents)
+
+@mcp.tool()
+def get_incident_context(
+    incident_id: str = Field(..., description="The incident UUID or public ID"),
+    refresh: bool = Field(False, description="Rebuild the bundle even if a prefetched one is available")
+) -> Dict[str, Any]:
+    """Return the first-response bundle of an incident: related monitors, golden signals, deploys and top error groups.
+
+    New active incidents noticed by the incident sync are prefetched in the
+    background, so the bundle is usually served from the cache; otherwise
+    it is built on the spot with all requests in parallel.
+
+    Args:
+        incident_id (str): The incident UUID or public ID.
+        refresh (bool): Rebuild the bundle even if a prefetched one is available. Default is False.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): The incident, the time range and, per service, monitors, golden signals
+              before and since the incident started, deploys and error groups, plus whether the bundle
+              was prefetched and its age"""
+    try:
+        incident = synced_incident_index().get(incident_id)
+        if incident is None:
+            return {"status": "error", "message": f"Incident {incident_id} is not in the local index"}
+        if not incident_services(incident):
+            return {"status": "error", "message": f"Incident {incident_id} has no services field to build context from"}
+        bundle: Optional[Dict[str, Any]] = None if refresh else context_cache.get(incident["id"])
+        prefetched = bundle is not None
+        if bundle is None:
+            bundle = build_incident_context(incident)
+            context_cache.set(incident["id"], bundle, INCIDENT_CONTEXT_TTL)
+        return {
+            "status": "success",
+            "message": "Incident context served from prefetch" if prefetched else "Incident context built",
+            "content": {**bundle, "prefetched": prefetched, "age_seconds": int(time.time()) - bundle["built_at"]},
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error building incident context: {e}"}
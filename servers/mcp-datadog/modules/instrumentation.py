@@ -0,0 +1,61 @@
+from typing import Dict, Any
+from mcp.server.fastmcp import FastMCP
+from utils.rate_limit import scheduler
+from utils.resilience import breakers
+from utils.hedging import hedger
+
+mcp = FastMCP("Datadog Instrumentation Service")
+
+@mcp.tool()
+def get_rate_limit_status() -> Dict[str, Any]:
+    """Report the state of the upstream rate-limit scheduler.
+
+    Args:
+        None
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (list): One entry per Datadog rate-limit name with the learned limit,
+              remaining tokens, concurrency, in-flight requests, queue depth and time spent throttled"""
+    try:
+        return {"status": "success", "message": "Rate-limit status retrieved successfully", "content": scheduler.stats()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error retrieving rate-limit status: {e}"}
+
+@mcp.tool()
+def get_circuit_breaker_status() -> Dict[str, Any]:
+    """Report the circuit breaker state of every Datadog endpoint called so far.
+
+    Args:
+        None
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (list): One entry per endpoint with its state ('closed', 'open' or 'half_open'),
+              consecutive failures, retries, retriable and non-retriable failures, rejected calls and last error"""
+    try:
+        return {"status": "success", "message": "Circuit breaker status retrieved successfully", "content": breakers.stats()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error retrieving circuit breaker status: {e}"}
+
+@mcp.tool()
+def get_hedging_status() -> Dict[str, Any]:
+    """Report request hedging activity for read-only tools.
+
+    Args:
+        None
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): Whether hedging is enabled, the remaining hedge budget, counts of hedges
+              sent, won and denied, and the observed p95 latency per endpoint"""
+    try:
+        return {"status": "success", "message": "Hedging status retrieved successfully", "content": hedger.stats()}
+    except Exception as e:
+        return {"status": "error", "message": f"Error retrieving hedging status: {e}"}
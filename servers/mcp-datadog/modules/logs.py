@@ -1,12 +1,63 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 from pydantic import Field
-from datadog_api_client import ApiClient
+import json
+import time
+from utils.api_client import ApiClient, raw_configuration
 from datadog_api_client.v1.api.logs_api import LogsApi
+from datadog_api_client.v2.api.logs_api import LogsApi as LogsApiV2
 from config import configuration
 from mcp.server.fastmcp import FastMCP
+from utils.fanout import iso8601
 
 mcp = FastMCP("Datadog Logs Service")
 
+LOGS_PAGE_LIMIT = 1000  # maximum page size of the v2 logs list API
+DEFAULT_LOG_COLUMNS = ["timestamp", "host", "service", "status", "message"]
+LOG_FIELDS = {"timestamp", "host", "service", "status", "message", "tags"}  # top level of a log's attributes
+
+
+def iter_log_pages(query: str, from_time: int, to_time: int, sort: str, limit: int,
+                   cursor: Optional[str] = None, indexes: Optional[List[str]] = None) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str], int]]:
+    """Yield (logs, next cursor, response bytes) page by page, following the list cursor, up to `limit` logs.
+
+    Logs are read as plain JSON. A page is only requested when the consumer
+    asks for it, so stopping iteration stops the requests, and the last page
+    asks for no more than what is left so the cursor resumes exactly after it.
+    """
+    remaining = limit
+    body: Dict[str, Any] = {"filter": {"query": query, "from": iso8601(from_time), "to": iso8601(to_time)}, "sort": sort}
+    if indexes:
+        body["filter"]["indexes"] = indexes
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        logs_api = LogsApiV2(api_client)
+        while True:
+            body["page"] = {"limit": min(remaining, LOGS_PAGE_LIMIT), **({"cursor": cursor} if cursor else {})}
+            response = logs_api.list_logs(body=body)
+            payload = json.loads(response.data)
+            data = payload.get("data") or []
+            cursor = ((payload.get("meta") or {}).get("page") or {}).get("after")
+            remaining -= len(data)
+            yield data, cursor, len(response.data)
+            if not cursor or not data or remaining <= 0:
+                return
+
+
+def _log_value(log: Dict[str, Any], column: str, max_chars: int) -> Any:
+    """A column of a log: 'id', a standard field or a dotted attribute path, with or without a leading '@'."""
+    if column == "id":
+        return log.get("id")
+    attributes = log.get("attributes") or {}
+    path = column[1:] if column.startswith("@") else column
+    if not column.startswith("@") and path in LOG_FIELDS:
+        value = attributes.get(path)
+    else:
+        value = attributes.get("attributes") or {}
+        for part in path.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + "..."
+    return value
+
 @mcp.tool()
 def archive_logs(
     query: str = Field(..., description="The query to filter logs for archiving"),
@@ -33,3 +84,79 @@ def archive_logs(
             return {"status": "success", "message": "Logs archived successfully", "content": response.to_dict()}
     except Exception as e:
         return {"status": "error", "message": f"Error archiving logs: {e}"}
+
+@mcp.tool()
+def search_logs(
+    query: str = Field(..., description="Log search query, e.g. 'service:web status:error'"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    columns: List[str] = Field(default_factory=lambda: list(DEFAULT_LOG_COLUMNS), description="Columns to return: id, timestamp, host, service, status, message, tags or attribute paths such as '@http.status_code'"),
+    sort: str = Field(default="-timestamp", description="Sort order: '-timestamp' (newest first) or 'timestamp' (oldest first)"),
+    max_rows: int = Field(default=100, ge=1, le=10000, description="Stop after this many logs"),
+    max_seconds: float = Field(default=20, gt=0, le=120, description="Stop requesting pages after this many seconds"),
+    max_bytes: int = Field(default=5_000_000, ge=10_000, description="Stop requesting pages after reading this many response bytes"),
+    max_message_chars: int = Field(default=500, ge=20, description="Truncate string values longer than this"),
+    indexes: Optional[List[str]] = Field(default=None, description="Log indexes to search; all when omitted"),
+    cursor: Optional[str] = Field(default=None, description="Cursor returned by a previous call, to continue where it stopped")
+) -> Dict[str, Any]:
+    """Search logs and return only the requested columns as a compact table.
+
+    Pages of the v2 logs list API are requested one at a time, following the
+    cursor, until the row, time or byte budget is reached. When a budget
+    stops the search early, the returned cursor continues it.
+
+    Args:
+        query (str): Log search query.
+        from_time (int): Start time in epoch seconds.
+        to_time (int): End time in epoch seconds.
+        columns (List[str]): Columns to return. Default is timestamp, host, service, status and message.
+        sort (str): '-timestamp' (newest first, default) or 'timestamp' (oldest first).
+        max_rows (int): Stop after this many logs (1-10000). Default is 100.
+        max_seconds (float): Stop requesting pages after this many seconds. Default is 20.
+        max_bytes (int): Stop requesting pages after reading this many response bytes. Default is 5000000.
+        max_message_chars (int): Truncate string values longer than this. Default is 500.
+        indexes (Optional[List[str]]): Log indexes to search.
+        cursor (Optional[str]): Cursor returned by a previous call.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): 'columns', 'rows' (one list of values per log), 'stopped_by' (the budget that
+              ended the search, or None when every log was read), 'cursor' to continue, 'pages' and 'bytes'"""
+    if sort not in ("timestamp", "-timestamp"):
+        return {"status": "error", "message": "sort must be 'timestamp' or '-timestamp'"}
+    try:
+        deadline = time.monotonic() + max_seconds
+        rows: List[List[Any]] = []
+        pages = read = 0
+        stopped_by, next_cursor = None, None
+        for logs, next_cursor, size in iter_log_pages(query, from_time, to_time, sort, max_rows, cursor, indexes):
+            pages += 1
+            read += size
+            for log in logs:
+                rows.append([_log_value(log, column, max_message_chars) for column in columns])
+            if not next_cursor:
+                break
+            if len(rows) >= max_rows:
+                stopped_by = "rows"
+            elif time.monotonic() >= deadline:
+                stopped_by = "time"
+            elif read >= max_bytes:
+                stopped_by = "bytes"
+            if stopped_by:
+                break
+        return {
+            "status": "success",
+            "message": f"Found {len(rows)} logs" + (f", stopped by the {stopped_by} budget" if stopped_by else ""),
+            "content": {
+                "columns": columns,
+                "rows": rows,
+                "stopped_by": stopped_by,
+                "cursor": next_cursor if stopped_by else None,
+                "pages": pages,
+                "bytes": read,
+            },
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error searching logs: {e}"}
@@ -1,15 +1,143 @@
 from typing import Optional, Dict, Any, List
 from pydantic import Field
-from datadog_api_client import ApiClient
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import json
+import math
+import time
+import warnings
+import numpy as np
+from utils.api_client import ApiClient, raw_configuration
 from datadog_api_client.v1.api.metrics_api import MetricsApi
-from config import configuration
+from datadog_api_client.v2.api.metrics_api import MetricsApi as MetricsApiV2
+from datadog_api_client.v1.model.distribution_points_content_encoding import DistributionPointsContentEncoding
+from datadog_api_client.v2.model.metric_content_encoding import MetricContentEncoding
+from config import (
+    configuration,
+    FANOUT_MAX_WORKERS,
+    METRICS_CACHE_BLOCK,
+    METRICS_CACHE_ENTRIES,
+    METRICS_CACHE_RECENT_TTL,
+    METRICS_CACHE_TTL,
+    METRICS_INGEST_DELAY,
+    METRIC_SUBMIT_BATCH_SIZE,
+    METRIC_SUBMIT_ENQUEUE_TIMEOUT,
+    METRIC_SUBMIT_FLUSH_INTERVAL,
+    METRIC_SUBMIT_MAX_PENDING,
+)
 from mcp.server.fastmcp import FastMCP
 from datadog_api_client.exceptions import (
     ApiException
 )
+from utils.cache import TTLCache
+from utils.metric_aggregate import METRIC_TYPES, MetricAggregate
+from utils.submit_buffer import BufferFullError, SubmissionBuffer
+from utils.anomaly import DETECTORS, anomalous_intervals, combined_scores
+from utils.timeseries import align, align_to, response_series
 
 mcp = FastMCP("Datadog Metrics Service")
 
+metrics_cache = TTLCache(METRICS_CACHE_ENTRIES)
+
+
+def fetch_metric_series(query: str, from_time: int, to_time: int):
+    """Run a metrics query and return (scope, times, values) arrays for each series.
+
+    The response is read as plain JSON: building an SDK model per point costs
+    seconds on queries returning hundreds of series.
+    """
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        metrics_api = MetricsApi(api_client)
+        response = metrics_api.query_metrics(from_time, to_time, query)
+        return response_series(json.loads(response.data))
+
+
+def fetch_metric_blocks(query: str, starts: List[int]) -> Dict[int, List[Any]]:
+    """Fetch METRICS_CACHE_BLOCK-long blocks of a query starting at `starts`, concurrently."""
+    if not starts:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(FANOUT_MAX_WORKERS, len(starts)), thread_name_prefix="metrics") as executor:
+        futures = {
+            start: executor.submit(contextvars.copy_context().run, fetch_metric_series,
+                                   query, start, start + METRICS_CACHE_BLOCK)
+            for start in starts
+        }
+        return {start: future.result() for start, future in futures.items()}
+
+
+def merge_metric_blocks(blocks: List[List[Any]], from_time: int, to_time: int):
+    """Join consecutive blocks into one (scope, times, values) series per scope, trimmed to [from_time, to_time]."""
+    merged: Dict[str, List[Any]] = {}
+    for block in blocks:
+        for scope, times, values in block:
+            merged.setdefault(scope, []).append((times, values))
+    result = []
+    for scope, parts in merged.items():
+        times = np.concatenate([t for t, _ in parts])
+        values = np.concatenate([v for _, v in parts])
+        # Adjacent blocks share their boundary point
+        times, first = np.unique(times, return_index=True)
+        values = values[first]
+        keep = (times >= from_time) & (times <= to_time)
+        result.append((scope, times[keep], values[keep]))
+    return result
+
+
+def fetch_metric_series_cached(query: str, from_time: int, to_time: int):
+    """Like fetch_metric_series, for long ranges, served from fixed-size cached time blocks.
+
+    The range is covered with blocks aligned to METRICS_CACHE_BLOCK; blocks
+    not in the cache are fetched concurrently. Blocks that ended before the
+    ingest delay are kept for METRICS_CACHE_TTL, more recent ones only for
+    METRICS_CACHE_RECENT_TTL. Points come at the rollup Datadog picks for a
+    single block, so short ranges are better served by fetch_metric_series.
+    """
+    starts = range(from_time // METRICS_CACHE_BLOCK * METRICS_CACHE_BLOCK, to_time, METRICS_CACHE_BLOCK)
+    blocks = {start: metrics_cache.get((query, start)) for start in starts}
+    missing = [start for start, block in blocks.items() if block is None]
+    if missing:
+        settled_before = time.time() - METRICS_INGEST_DELAY
+        for start, block in fetch_metric_blocks(query, missing).items():
+            blocks[start] = block
+            settled = start + METRICS_CACHE_BLOCK <= settled_before
+            metrics_cache.set((query, start), block, METRICS_CACHE_TTL if settled else METRICS_CACHE_RECENT_TTL)
+    return merge_metric_blocks([blocks[start] for start in starts], from_time, to_time)
+
+
+def _send_metric_aggregates(aggregates: List[MetricAggregate]) -> None:
+    series = [aggregate.series(int(METRIC_SUBMIT_FLUSH_INTERVAL)) for aggregate in aggregates]
+    with ApiClient(configuration) as api_client:
+        MetricsApiV2(api_client).submit_metrics(body={"series": series}, content_encoding=MetricContentEncoding.GZIP)
+
+
+def _send_distributions(aggregates: List[MetricAggregate]) -> None:
+    series = [aggregate.distribution_series() for aggregate in aggregates]
+    with ApiClient(configuration) as api_client:
+        MetricsApi(api_client).submit_distribution_points(
+            body={"series": series}, content_encoding=DistributionPointsContentEncoding.DEFLATE
+        )
+
+
+# Submissions of the same metric, type, tags and host within a flush interval are aggregated into one series
+metric_buffer = SubmissionBuffer(
+    "metrics",
+    _send_metric_aggregates,
+    METRIC_SUBMIT_FLUSH_INTERVAL,
+    METRIC_SUBMIT_BATCH_SIZE,
+    METRIC_SUBMIT_MAX_PENDING,
+    merge=lambda old, new: old.merge(new),
+)
+
+# Distributions go to their own intake, so a failure of one never resends the other
+distribution_buffer = SubmissionBuffer(
+    "distributions",
+    _send_distributions,
+    METRIC_SUBMIT_FLUSH_INTERVAL,
+    METRIC_SUBMIT_BATCH_SIZE,
+    METRIC_SUBMIT_MAX_PENDING,
+    merge=lambda old, new: old.merge(new),
+)
+
 @mcp.tool()
 def query_metrics(
     query: str = Field(..., description="The query to execute"),
@@ -200,3 +328,224 @@ def query_downstream_latency(
         return {"status": "error", "message": f"API error while querying downstream latency: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while querying downstream latency: {e}"}
+
+@mcp.tool()
+def detect_metric_anomalies(
+    query: str = Field(..., description="The metrics query; use 'by {tag}' to analyze many series at once"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    detectors: List[str] = Field(default=list(DETECTORS), description="Detectors to run: 'zscore' (rolling z-score), 'ewma' (EWMA bands), 'seasonal' (seasonal-naive residuals)"),
+    window: int = Field(default=30, ge=5, le=1000, description="Points of history used by the z-score and EWMA detectors"),
+    season_seconds: int = Field(default=86400, ge=60, description="Season length for the seasonal detector (e.g. 86400 for daily)"),
+    threshold: float = Field(default=4.0, gt=0, description="Score magnitude above which a point is anomalous"),
+    max_intervals: int = Field(default=50, ge=1, le=1000, description="Maximum number of anomalous intervals to return")
+) -> Dict[str, Any]:
+    """Detect anomalous intervals in metric series.
+
+    All series returned by the query are aligned into one matrix and scored
+    together; only runs of consecutive anomalous points are returned, highest
+    peak score first.
+
+    Args:
+        query (str): The metrics query. Grouped queries ('by {host}') return one series per group.
+        from_time (int): Start time in epoch seconds.
+        to_time (int): End time in epoch seconds.
+        detectors (List[str]): Detectors to run. Defaults to all of 'zscore', 'ewma' and 'seasonal'.
+        window (int): Points of history used by the z-score and EWMA detectors. Default is 30.
+        season_seconds (int): Season length for the seasonal detector. Default is 86400 (daily).
+            The seasonal detector needs a range longer than one season.
+        threshold (float): Score magnitude above which a point is anomalous. Default is 4.0.
+        max_intervals (int): Maximum number of intervals to return. Default is 50.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): If successful:
+                - series_scanned (int): Number of series analyzed
+                - anomalous_series (int): Number of series with at least one interval
+                - intervals (list): Each with scope, start/end (epoch seconds), points,
+                  peak time/value/score, direction and the detectors that flagged it"""
+    try:
+        unknown = set(detectors) - set(DETECTORS)
+        if unknown:
+            return {"status": "error", "message": f"Unknown detectors: {sorted(unknown)}"}
+        series = fetch_metric_series(query, from_time, to_time)
+        grid, matrix = align(series)
+        if not series or len(grid) < 2:
+            return {"status": "success", "message": "No data to analyze",
+                    "content": {"series_scanned": len(series), "anomalous_series": 0, "intervals": []}}
+
+        step = float(np.median(np.diff(grid)))
+        scores, winner = combined_scores(matrix, detectors, window, int(round(season_seconds / step)))
+        intervals = []
+        for run in anomalous_intervals(scores, threshold):
+            row, start, end = run["row"], run["start"], run["end"]
+            peak = start + int(np.argmax(np.abs(scores[row, start:end])))
+            intervals.append({
+                "scope": series[row][0],
+                "start": int(grid[start]),
+                "end": int(grid[end - 1]),
+                "points": end - start,
+                "peak_at": int(grid[peak]),
+                "peak_value": round(float(matrix[row, peak]), 6),
+                "peak_score": round(float(scores[row, peak]), 2),
+                "direction": "above" if scores[row, peak] > 0 else "below",
+                "detectors": sorted({detectors[i] for i in np.unique(winner[row, start:end])}),
+            })
+        intervals.sort(key=lambda i: -abs(i["peak_score"]))
+        return {
+            "status": "success",
+            "message": f"Found {len(intervals)} anomalous intervals",
+            "content": {
+                "series_scanned": len(series),
+                "anomalous_series": len({i["scope"] for i in intervals}),
+                "intervals": intervals[:max_intervals],
+            },
+        }
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while detecting anomalies: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while detecting anomalies: {e}"}
+
+@mcp.tool()
+def compare_metrics(
+    query: str = Field(..., description="The metrics query; use 'by {tag}' to compare many series at once"),
+    from_time: int = Field(..., description="Start time in epoch seconds"),
+    to_time: int = Field(..., description="End time in epoch seconds"),
+    baselines: int = Field(default=1, ge=1, le=8, description="How many shifted baseline windows to compare against"),
+    shift_seconds: int = Field(default=604800, ge=60, description="Shift between windows, e.g. 604800 for week over week, 86400 for day over day"),
+    min_change_pct: float = Field(default=10.0, ge=0, description="Smallest change, in percent of the baseline mean, reported as significant"),
+    max_series: int = Field(default=20, ge=1, le=500, description="Maximum number of series to return")
+) -> Dict[str, Any]:
+    """Compare a window against the same window shifted back in time (e.g. last week).
+
+    The current window and every baseline window are fetched concurrently.
+    Baselines are shifted onto the current timestamps, combined point by
+    point with the median, and each series' change is computed on the
+    aligned points. A series is significant when its mean moved by at least
+    min_change_pct and the pointwise differences are consistent (|t| >= 3).
+
+    Args:
+        query (str): The metrics query.
+        from_time (int): Start time in epoch seconds.
+        to_time (int): End time in epoch seconds.
+        baselines (int): Number of baseline windows, each shift_seconds further back. Default is 1.
+        shift_seconds (int): Shift between windows. Default is 604800 (one week).
+        min_change_pct (float): Smallest significant change in percent. Default is 10.
+        max_series (int): Maximum number of series to return. Default is 20.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): If successful:
+                - series_compared (int): Number of series in the current window
+                - significant (list): Per series: current and baseline mean, delta,
+                  change_pct, t statistic and aligned points, largest change first"""
+    try:
+        offsets = [k * shift_seconds for k in range(baselines + 1)]
+        with ThreadPoolExecutor(max_workers=len(offsets), thread_name_prefix="compare") as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, fetch_metric_series, query, from_time - offset, to_time - offset)
+                for offset in offsets
+            ]
+            windows = [future.result() for future in futures]
+
+        current = windows[0]
+        grid, matrix = align(current)
+        scopes = [scope for scope, _, _ in current]
+        if not scopes or len(grid) == 0:
+            return {"status": "success", "message": "No data to compare", "content": {"series_compared": 0, "significant": []}}
+        shifted = np.stack([align_to(grid, scopes, window, offset) for window, offset in zip(windows[1:], offsets[1:])])
+        with warnings.catch_warnings():
+            # Points no baseline covers are all-NaN slices
+            warnings.simplefilter("ignore", RuntimeWarning)
+            baseline = np.nanmedian(shifted, axis=0)
+            paired = ~np.isnan(matrix) & ~np.isnan(baseline)
+            points = paired.sum(axis=1)
+            diff = np.where(paired, matrix - baseline, np.nan)
+            current_mean = np.nanmean(np.where(paired, matrix, np.nan), axis=1)
+            baseline_mean = np.nanmean(np.where(paired, baseline, np.nan), axis=1)
+            delta = current_mean - baseline_mean
+            with np.errstate(invalid="ignore", divide="ignore"):
+                change_pct = delta / np.abs(baseline_mean) * 100
+                t_stat = delta / (np.nanstd(diff, axis=1, ddof=1) / np.sqrt(points))
+
+        significant_rows = np.flatnonzero(
+            (points >= 3) & (np.abs(np.nan_to_num(change_pct, nan=np.inf)) >= min_change_pct)
+            & (np.abs(np.nan_to_num(t_stat, nan=np.inf)) >= 3) & (np.nan_to_num(delta) != 0)
+        )
+        significant = []
+        for row in significant_rows[np.argsort(-np.abs(np.nan_to_num(change_pct[significant_rows], nan=np.inf)))][:max_series]:
+            significant.append({
+                "scope": scopes[row],
+                "current_mean": round(float(current_mean[row]), 6),
+                "baseline_mean": round(float(baseline_mean[row]), 6),
+                "delta": round(float(delta[row]), 6),
+                "change_pct": round(float(change_pct[row]), 1) if np.isfinite(change_pct[row]) else None,
+                "t_stat": round(float(t_stat[row]), 2) if np.isfinite(t_stat[row]) else None,
+                "points": int(points[row]),
+            })
+        return {
+            "status": "success",
+            "message": f"{len(significant_rows)} of {len(scopes)} series changed significantly",
+            "content": {"series_compared": len(scopes), "significant": significant},
+        }
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while comparing metrics: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while comparing metrics: {e}"}
+
+@mcp.tool()
+def submit_metric(
+    metric: str = Field(..., description="The metric name, e.g. 'deploy.duration'"),
+    value: float = Field(..., description="The value to submit"),
+    metric_type: str = Field(default="gauge", description="'count' (summed), 'gauge' (last value) or 'distribution' (sketched, then submitted as distribution points)"),
+    tags: List[str] = Field(default_factory=list, description="Tags of the series"),
+    host: Optional[str] = Field(default=None, description="Host the value belongs to"),
+    unit: Optional[str] = Field(default=None, description="Unit of the metric, e.g. 'second'"),
+    sample_rate: float = Field(default=1.0, gt=0, le=1, description="Fraction of events this value stands for; counts and distributions are scaled up by its inverse"),
+    wait: bool = Field(default=False, description="Flush the buffer and wait until the series are delivered")
+) -> Dict[str, Any]:
+    """Submit a custom metric value through a client-side aggregation buffer.
+
+    Values are aggregated per metric, type, tags and host like DogStatsD does,
+    and every DATADOG_METRIC_SUBMIT_FLUSH_INTERVAL seconds the aggregates are
+    sent as gzip-compressed batches of series to the v2 submit_metrics API.
+    Distributions are sketched and sent as deflate-compressed distribution
+    points to the v1 intake, so they can be aggregated across hosts and tags.
+
+    Args:
+        metric (str): The metric name.
+        value (float): The value to submit.
+        metric_type (str): 'count', 'gauge' or 'distribution'. Default is 'gauge'.
+        tags (List[str]): Tags of the series.
+        host (Optional[str]): Host the value belongs to.
+        unit (Optional[str]): Unit of the metric.
+        sample_rate (float): Fraction of events this value stands for. Default is 1.0.
+        wait (bool): Flush the buffer and wait until the series are delivered. Default is False.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): Statistics of the buffer the value went to (metrics or distributions)"""
+    if metric_type not in METRIC_TYPES:
+        return {"status": "error", "message": f"metric_type must be one of {', '.join(METRIC_TYPES)}"}
+    if not math.isfinite(value):
+        return {"status": "error", "message": "value must be a finite number"}
+    try:
+        aggregate = MetricAggregate(metric, metric_type, tuple(sorted(set(tags))), host, unit, value, sample_rate=sample_rate)
+        buffer = distribution_buffer if metric_type == "distribution" else metric_buffer
+        buffer.add(aggregate.key, aggregate, METRIC_SUBMIT_ENQUEUE_TIMEOUT)
+        if wait:
+            if not buffer.flush(METRIC_SUBMIT_ENQUEUE_TIMEOUT):
+                stats = buffer.stats()
+                return {"status": "error", "message": f"Metric queued but not delivered yet: {stats['last_error']}", "content": stats}
+            return {"status": "success", "message": "Metric submitted successfully", "content": buffer.stats()}
+        return {"status": "success", "message": "Metric queued for submission", "content": buffer.stats()}
+    except BufferFullError as e:
+        return {"status": "error", "message": f"Metric not queued: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Error submitting metric: {e}"}
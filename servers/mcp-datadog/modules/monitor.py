@@ -1,9 +1,14 @@
 from typing import Optional, List, Dict, Any
 from pydantic import Field
-from datadog_api_client import ApiClient
+import time
+import numpy as np
+from utils.api_client import ApiClient
 from datadog_api_client.v1.api.monitors_api import MonitorsApi
 from config import configuration
 from mcp.server.fastmcp import FastMCP
+from .metrics import fetch_metric_series_cached
+from utils.backtest import breaches, parse_monitor_query, rolling_aggregate
+from utils.timeseries import align, true_runs
 
 mcp = FastMCP("Datadog Monitor Service")
 
@@ -326,3 +331,104 @@ def get_monitor(
             return {"status": "success", "message": "Monitor retrieved successfully", "content": response.to_dict()}
     except Exception as e:
         return {"status": "error", "message": f"Error retrieving monitor: {e}"}
+
+@mcp.tool()
+def backtest_monitor(
+    query: Optional[str] = Field(default=None, description="Metric monitor query, e.g. 'avg(last_5m):avg:system.cpu.user{*} by {host} > 90'"),
+    monitor_id: Optional[int] = Field(default=None, description="Backtest an existing monitor instead of a query"),
+    critical: Optional[float] = Field(default=None, description="Critical threshold. Defaults to the threshold in the query"),
+    warning: Optional[float] = Field(default=None, description="Warning threshold. Defaults to the monitor's, if any"),
+    days: int = Field(default=30, ge=1, le=90, description="How many days of history to replay"),
+    max_series: int = Field(default=20, ge=1, le=500, description="Maximum number of series to detail, noisiest first")
+) -> Dict[str, Any]:
+    """Replay a metric monitor over historical data to see how often it would have fired.
+
+    The monitor's time aggregation (avg, sum, min or max over last_N) is
+    evaluated locally on every point of the history, for every group at once.
+
+    Args:
+        query (Optional[str]): Metric monitor query. Required unless monitor_id is given.
+        monitor_id (Optional[int]): ID of an existing monitor whose query and thresholds are used.
+        critical (Optional[float]): Critical threshold. Defaults to the threshold in the query.
+        warning (Optional[float]): Warning threshold. Defaults to the monitor's warning threshold, if any.
+        days (int): Days of history to replay (1-90). Default is 30.
+        max_series (int): Maximum number of series to detail. Default is 20.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): If successful:
+                - monitor (dict): The parsed query, window and thresholds that were evaluated
+                - summary (dict): Series evaluated/alerting, total alerts and flaps, percent of time alerting
+                - series (list): Per series: alert and warning counts, flaps, seconds alerting and alert intervals"""
+    try:
+        if monitor_id is not None:
+            with ApiClient(configuration) as api_client:
+                monitor = MonitorsApi(api_client).get_monitor(monitor_id)
+            query = query or monitor.query
+            thresholds = monitor.get("options", {}).get("thresholds")
+            if thresholds:
+                critical = critical if critical is not None else thresholds.get("critical")
+                warning = warning if warning is not None else thresholds.get("warning")
+        if not query:
+            return {"status": "error", "message": "Either query or monitor_id is required"}
+        parsed = parse_monitor_query(query)
+        critical = parsed["threshold"] if critical is None else critical
+
+        to_time = int(time.time())
+        from_time = to_time - days * 86400
+        series = fetch_metric_series_cached(parsed["query"], from_time, to_time)
+        grid, matrix = align(series)
+        if len(grid) == 0:
+            return {"status": "success", "message": "No data to backtest", "content": {"monitor": parsed, "series": []}}
+
+        step = float(np.median(np.diff(grid))) if len(grid) > 1 else float(parsed["window_seconds"])
+        points = max(1, int(round(parsed["window_seconds"] / step)))
+        aggregated = rolling_aggregate(matrix, points, parsed["aggregation"])
+        alert = breaches(aggregated, parsed["comparator"], critical)
+        warn = breaches(aggregated, parsed["comparator"], warning) & ~alert if warning is not None else np.zeros_like(alert)
+        states = alert * 2 + warn
+        flaps = np.count_nonzero(np.diff(states, axis=1), axis=1)
+
+        details: Dict[int, Dict[str, Any]] = {}
+        for row, start, end in true_runs(alert):
+            detail = details.setdefault(row, {"alerts": 0, "alert_seconds": 0, "intervals": []})
+            detail["alerts"] += 1
+            detail["alert_seconds"] += int(grid[end - 1] + step - grid[start])
+            detail["intervals"].append({"start": int(grid[start]), "end": int(grid[end - 1] + step)})
+        warnings = {}
+        for row, _, _ in true_runs(warn):
+            warnings[row] = warnings.get(row, 0) + 1
+
+        rows = sorted(set(details) | set(warnings), key=lambda r: (-details.get(r, {}).get("alerts", 0), -int(flaps[r])))
+        result = []
+        for row in rows[:max_series]:
+            detail = details.get(row, {"alerts": 0, "alert_seconds": 0, "intervals": []})
+            result.append({
+                "scope": series[row][0],
+                "alerts": detail["alerts"],
+                "warnings": warnings.get(row, 0),
+                "flaps": int(flaps[row]),
+                "alert_seconds": detail["alert_seconds"],
+                "intervals": detail["intervals"][-10:],
+            })
+        total_alerts = sum(d["alerts"] for d in details.values())
+        return {
+            "status": "success",
+            "message": f"Monitor would have alerted {total_alerts} times over {days} days",
+            "content": {
+                "monitor": {**parsed, "critical": critical, "warning": warning, "window_points": points, "step_seconds": step},
+                "summary": {
+                    "series_evaluated": len(series),
+                    "series_alerting": len(details),
+                    "alerts": total_alerts,
+                    "warnings": sum(warnings.values()),
+                    "flaps": int(flaps.sum()),
+                    "percent_time_alerting": round(float(alert.sum()) / alert.size * 100, 2),
+                },
+                "series": result,
+            },
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error backtesting monitor: {e}"}
@@ -1,12 +1,21 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from pydantic import Field
 from mcp.server.fastmcp import FastMCP
 from .apm import query_apm_errors, query_apm_latency, query_apm_spans
+from .events import fetch_events
+from .metrics import fetch_metric_series
 from datadog_api_client.exceptions import (
     ApiException
 )
+from concurrent.futures import ThreadPoolExecutor
+from utils.changepoint import binary_segmentation
+import contextvars
 import json
+import math
 import time
+import numpy as np
+
+DEPLOY_EVENTS_LIMIT = 200
 
 
 mcp = FastMCP("Datadog Root Cause Analysis Service")
@@ -79,3 +88,132 @@ def analyze_service_with_apm(
             "status": "error",
             "message": f"Unexpected error during root cause analysis with APM: {str(e)}"
         }
+
+
+def _detect_shifts(metric: str, series) -> List[Dict[str, Any]]:
+    """Run change-point detection over every series of one metric query."""
+    shifts = []
+    for scope, times, values in series:
+        step = float(np.median(np.diff(times))) if len(times) > 1 else 0.0
+        for change in binary_segmentation(values):
+            before, after = change["before"], change["after"]
+            shifts.append({
+                "metric": metric,
+                "scope": scope,
+                "at": int(times[change["index"]]),
+                "direction": "increase" if after > before else "decrease",
+                "before": round(before, 4),
+                "after": round(after, 4),
+                "change_pct": round((after - before) / abs(before) * 100, 1) if before else None,
+                "score": change["score"],
+                "_step": step,
+            })
+    return shifts
+
+
+@mcp.tool()
+def correlate_deploys(
+    service_name: str = Field(..., description="The name of the service to analyze"),
+    from_time: Optional[int] = Field(None, description="Start time in epoch seconds. Defaults to 6 hours ago if not provided"),
+    to_time: Optional[int] = Field(None, description="End time in epoch seconds. Defaults to current time if not provided"),
+    operation_name: str = Field("http.request", description="Span operation whose trace metrics are analyzed (e.g. 'http.request', 'grpc.server')"),
+    latency_query: Optional[str] = Field(None, description="Metric query for latency. Defaults to the operation's average duration for the service"),
+    error_query: Optional[str] = Field(None, description="Metric query for errors. Defaults to the operation's error count for the service"),
+    deploy_query: Optional[str] = Field(None, description="Event search query matching deploys. Defaults to deployment events tagged with the service"),
+    max_lag_minutes: int = Field(30, ge=1, le=1440, description="How long after a deploy a shift may start and still be attributed to it"),
+    limit: int = Field(5, ge=1, le=50, description="Maximum number of candidate deploys to return")
+) -> Dict[str, Any]:
+    """Rank deploys by how closely they precede shifts in a service's latency and error series.
+
+    Latency, errors and deploy events are fetched concurrently. Mean shifts
+    are detected in each series by binary segmentation, and every deploy is
+    scored by the regressions (increases) that start within
+    `max_lag_minutes` after it, weighting closer and stronger shifts higher.
+
+    Args:
+        service_name (str): The name of the service to analyze.
+        from_time (Optional[int], optional): Start time in epoch seconds. Defaults to 6 hours ago if not provided.
+        to_time (Optional[int], optional): End time in epoch seconds. Defaults to current time if not provided.
+        operation_name (str): Span operation whose trace metrics are analyzed. Defaults to 'http.request'.
+        latency_query (Optional[str], optional): Metric query for latency.
+        error_query (Optional[str], optional): Metric query for errors.
+        deploy_query (Optional[str], optional): Event search query matching deploys.
+        max_lag_minutes (int): Attribution window after each deploy, in minutes. Default is 30.
+        limit (int): Maximum number of candidate deploys to return. Default is 5.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): If successful:
+                - candidates (list): Deploys ranked by score, each with the shift closest after it
+                - shifts (list): Detected shifts with time, direction, means before/after and score
+                - deploys_considered (int): Number of deploy events examined"""
+    try:
+        current_time = int(time.time())
+        to_time = to_time or current_time
+        from_time = from_time or (current_time - 21600)  # 21600 seconds = 6 hours
+        tag = f"{{service:{service_name}}}"
+        queries = {
+            "latency": latency_query or f"avg:trace.{operation_name}.duration{tag}",
+            "errors": error_query or f"sum:trace.{operation_name}.errors{tag}.as_count()",
+        }
+        deploy_query = deploy_query or f"service:{service_name} (source:deployment OR deploy)"
+
+        with ThreadPoolExecutor(max_workers=len(queries) + 1, thread_name_prefix="correlate") as executor:
+            def submit(fn, *args):
+                return executor.submit(contextvars.copy_context().run, fn, *args)
+
+            series_futures = {name: submit(fetch_metric_series, q, from_time, to_time) for name, q in queries.items()}
+            deploys_future = submit(fetch_events, deploy_query, from_time, to_time, DEPLOY_EVENTS_LIMIT)
+            shifts = []
+            for name, future in series_futures.items():
+                shifts.extend(_detect_shifts(name, future.result()))
+            deploys = deploys_future.result()
+
+        max_lag = max_lag_minutes * 60
+        candidates = []
+        for event in deploys:
+            attributes = event.attributes
+            deployed_at = int(attributes.timestamp.timestamp())
+            score, nearest = 0.0, None
+            for shift in shifts:
+                lag = shift["at"] - deployed_at
+                # A shift may land up to one bucket before the deploy because of rollup alignment
+                if shift["direction"] != "increase" or not -shift["_step"] <= lag <= max_lag:
+                    continue
+                score += math.log1p(shift["score"]) * math.exp(-max(lag, 0) / max_lag)
+                if nearest is None or abs(lag) < abs(nearest["lag_seconds"]):
+                    nearest = {"metric": shift["metric"], "at": shift["at"], "lag_seconds": lag,
+                               "change_pct": shift["change_pct"]}
+            if nearest is None:
+                continue
+            inner = attributes.get("attributes")
+            candidates.append({
+                "event_id": event.get("id"),
+                "title": (inner.get("title") if inner else None) or attributes.get("message"),
+                "at": deployed_at,
+                "score": round(score, 3),
+                "nearest_shift": nearest,
+            })
+        candidates.sort(key=lambda c: -c["score"])
+        for rank, candidate in enumerate(candidates, start=1):
+            candidate["rank"] = rank
+
+        for shift in shifts:
+            del shift["_step"]
+        shifts.sort(key=lambda s: s["at"])
+        return {
+            "status": "success",
+            "message": f"Found {len(shifts)} shifts and {len(candidates)} candidate deploys",
+            "content": {
+                "time_range": {"from": from_time, "to": to_time},
+                "candidates": candidates[:limit],
+                "shifts": shifts,
+                "deploys_considered": len(deploys),
+            },
+        }
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while correlating deploys: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while correlating deploys: {e}"}
@@ -1,39 +1,81 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pydantic import Field
-from datadog_api_client import ApiClient
+import time
+from utils.api_client import ApiClient
 from datadog_api_client.v1.api.service_checks_api import ServiceChecksApi
-from config import configuration
+from config import (
+    configuration,
+    SERVICE_CHECK_BATCH_SIZE,
+    SERVICE_CHECK_ENQUEUE_TIMEOUT,
+    SERVICE_CHECK_FLUSH_INTERVAL,
+    SERVICE_CHECK_MAX_PENDING,
+)
 from mcp.server.fastmcp import FastMCP
+from utils.submit_buffer import BufferFullError, SubmissionBuffer
 
 mcp = FastMCP("Datadog Service Checks Service")
 
+
+def _send_service_checks(checks: List[Dict[str, Any]]) -> None:
+    with ApiClient(configuration) as api_client:
+        ServiceChecksApi(api_client).submit_service_check(body=checks)
+
+
+# Identical (check, host, tags) submissions waiting for the same flush keep only the latest status
+service_check_buffer = SubmissionBuffer(
+    "service-checks",
+    _send_service_checks,
+    SERVICE_CHECK_FLUSH_INTERVAL,
+    SERVICE_CHECK_BATCH_SIZE,
+    SERVICE_CHECK_MAX_PENDING,
+    merge=lambda old, new: new if new["timestamp"] >= old["timestamp"] else old,
+)
+
 @mcp.tool()
 def submit_service_check(
     check_name: str = Field(..., description="The name of the service check"),
     host_name: str = Field(..., description="The name of the host"),
     status: int = Field(..., description="The status of the service check (e.g., 0 for OK, 1 for WARNING, etc.)"),
     message: str = Field(default="", description="A message describing the service check status"),
-    tags: List[str] = Field(default_factory=list, description="Tags to associate with the service check")
+    tags: List[str] = Field(default_factory=list, description="Tags to associate with the service check"),
+    timestamp: Optional[int] = Field(default=None, description="Time of the check in epoch seconds; now when omitted"),
+    wait: bool = Field(default=False, description="Flush the buffer and wait until the check is delivered")
 ) -> Dict[str, Any]:
     """Submit a service check.
 
+    Checks are buffered and sent in batches every DATADOG_SERVICE_CHECK_FLUSH_INTERVAL
+    seconds or once DATADOG_SERVICE_CHECK_BATCH_SIZE are waiting; a check with the
+    same name, host and tags as one still waiting replaces it. Unsent checks are
+    flushed when the server shuts down.
+
     Args:
         check_name (str): The name of the service check.
         host_name (str): The name of the host.
         status (int): The status of the service check (e.g., 0 for OK, 1 for WARNING, etc.).
         message (str, optional): A message describing the service check status. Defaults to "".
         tags (List[str], optional): Tags to associate with the service check. Defaults to empty list.
+        timestamp (Optional[int], optional): Time of the check in epoch seconds. Defaults to now.
+        wait (bool, optional): Flush the buffer and wait until the check is delivered. Defaults to False.
     
     Returns:
         Dict[str, Any]: A dictionary containing:
             - status (str): 'success' or 'error'
-            - message (str): Description of the operation result"""
+            - message (str): Description of the operation result
+            - content (dict): Buffer statistics"""
+    if status not in (0, 1, 2, 3):
+        return {"status": "error", "message": "status must be 0 (OK), 1 (WARNING), 2 (CRITICAL) or 3 (UNKNOWN)"}
     try:
-        with ApiClient(configuration) as api_client:
-            service_checks_api = ServiceChecksApi(api_client)
-            body = [{"check": check_name, "host_name": host_name, "status": status, "message": message, "tags": tags}]
-            service_checks_api.submit_service_check(body=body)
-            return {"status": "success", "message": "Service check submitted successfully"}
+        check = {"check": check_name, "host_name": host_name, "status": status, "message": message, "tags": tags,
+                 "timestamp": timestamp if timestamp is not None else int(time.time())}
+        service_check_buffer.add((check_name, host_name, tuple(sorted(tags))), check, SERVICE_CHECK_ENQUEUE_TIMEOUT)
+        if wait:
+            if not service_check_buffer.flush(SERVICE_CHECK_ENQUEUE_TIMEOUT):
+                stats = service_check_buffer.stats()
+                return {"status": "error", "message": f"Service check queued but not delivered yet: {stats['last_error']}", "content": stats}
+            return {"status": "success", "message": "Service check submitted successfully", "content": service_check_buffer.stats()}
+        return {"status": "success", "message": "Service check queued for submission", "content": service_check_buffer.stats()}
+    except BufferFullError as e:
+        return {"status": "error", "message": f"Service check not queued: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Error submitting service check: {e}"}
 
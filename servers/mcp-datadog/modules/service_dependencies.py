@@ -1,97 +1,250 @@
-from typing import Optional, Dict, Any
+import json
+import time
+from typing import Optional, Dict, Any, List
 from pydantic import Field
-from datadog_api_client import ApiClient
-from datadog_api_client.v2.api.service_dependencies_api import ServiceDependenciesApi
-from config import configuration
+from utils.api_client import ApiClient, raw_configuration
+from datadog_api_client.v2.api.spans_api import SpansApi
+from config import (
+    configuration,
+    SERVICE_GRAPH_LOOKBACK,
+    SERVICE_GRAPH_MAX_AGE,
+    SERVICE_GRAPH_QUERY,
+    SERVICE_GRAPH_MAX_SERVICES,
+    SERVICE_GRAPH_MAX_PEERS,
+)
 from mcp.server.fastmcp import FastMCP
 from datadog_api_client.exceptions import (
     ApiException
 )
+from utils.background import BackgroundValue
+from utils.service_graph import ServiceGraph
+from utils.fanout import iso8601
 
 mcp = FastMCP("Datadog Service Dependencies Service")
 
+
+def fetch_service_edges(from_time: int, to_time: int) -> List[tuple]:
+    """Caller -> callee edges with call count and average duration, from spans tagged with peer.service."""
+    query = f"@peer.service:* {SERVICE_GRAPH_QUERY}".strip()
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        spans_api = SpansApi(api_client)
+        response = spans_api.aggregate_spans(
+            body={
+                "data": {
+                    "attributes": {
+                        "compute": [{"aggregation": "count"}, {"aggregation": "avg", "metric": "@duration"}],
+                        "filter": {"query": query, "from": iso8601(from_time), "to": iso8601(to_time)},
+                        "group_by": [
+                            {"facet": "service", "limit": SERVICE_GRAPH_MAX_SERVICES},
+                            {"facet": "@peer.service", "limit": SERVICE_GRAPH_MAX_PEERS},
+                        ],
+                    },
+                    "type": "aggregate_request",
+                }
+            }
+        )
+    edges = []
+    for bucket in json.loads(response.data).get("data") or []:
+        attributes = bucket.get("attributes") or {}
+        by, compute = attributes.get("by") or {}, attributes.get("compute") or {}
+        duration = compute.get("c1")
+        edges.append((by.get("service"), by.get("@peer.service"), float(compute.get("c0") or 0),
+                      float(duration) if duration is not None else None))
+    return edges
+
+
+def _build_graph() -> ServiceGraph:
+    now = int(time.time())
+    return ServiceGraph(fetch_service_edges(now - SERVICE_GRAPH_LOOKBACK, now), built_at=now)
+
+
+service_graph = BackgroundValue("service-graph", _build_graph, SERVICE_GRAPH_MAX_AGE)
+
+
+def start_service_graph() -> None:
+    """Start building the dependency graph in a background thread, so no tool call has to wait for the first build."""
+    service_graph.get(wait=False)
+
+
+def _building() -> Dict[str, Any]:
+    build = service_graph.status()
+    message = "Service dependency graph is being built; try again shortly"
+    if build["last_error"]:
+        message += f" (last attempt failed: {build['last_error']})"
+    return {"status": "building", "message": message, "content": build}
+
+
+def _graph_info(graph: ServiceGraph) -> Dict[str, Any]:
+    return {"services": len(graph.names), "edges": graph.edge_count, "built_at": int(graph.built_at),
+            "lookback_seconds": SERVICE_GRAPH_LOOKBACK}
+
+
+def _missing(graph: ServiceGraph, *services: str) -> Optional[Dict[str, Any]]:
+    unknown = [s for s in services if s not in graph.index]
+    if not unknown:
+        return None
+    return {"status": "error",
+            "message": f"Service(s) not found in the dependency graph: {', '.join(unknown)}",
+            "content": {"graph": _graph_info(graph)}}
+
+
 @mcp.tool()
 def list_service_dependencies(
-    service_id: str = Field(..., description="The ID of the service to retrieve dependencies for")
+    service_id: str = Field(..., description="The name of the service to retrieve dependencies for")
 ) -> Dict[str, Any]:
-    """List all dependencies for a specific service.
+    """List the services a service calls and the services that call it.
+
+    The dependency graph is built from spans tagged with peer.service over the
+    last DATADOG_SERVICE_GRAPH_LOOKBACK seconds, in the background starting at
+    server startup, and rebuilt when older than DATADOG_SERVICE_GRAPH_MAX_AGE.
+    Calls made before the first build finishes return status 'building'.
 
     Args:
-        service_id (str): The ID of the service to retrieve dependencies for.
-    
+        service_id (str): The name of the service to retrieve dependencies for.
+
     Returns:
         Dict[str, Any]: A dictionary containing:
-            - status (str): 'success' or 'error'
+            - status (str): 'success', 'building' or 'error'
             - message (str): Description of the operation result
-            - content (dict): List of service dependencies if successful"""
+            - content (dict): Direct downstream and upstream services with call counts and average duration"""
     try:
-        with ApiClient(configuration) as api_client:
-            service_dependencies_api = ServiceDependenciesApi(api_client)
-            response = service_dependencies_api.list_service_dependencies(service_id)
-            return {"status": "success", "message": "Service dependencies retrieved successfully", "content": response.to_dict()}
+        graph = service_graph.get(wait=False)
+        if graph is None:
+            return _building()
+        missing = _missing(graph, service_id)
+        if missing:
+            return missing
+        return {
+            "status": "success",
+            "message": "Service dependencies retrieved successfully",
+            "content": {
+                "service": service_id,
+                "downstream": graph.neighbours(service_id, "downstream"),
+                "upstream": graph.neighbours(service_id, "upstream"),
+                "graph": _graph_info(graph),
+            },
+        }
     except ApiException as e:
         return {"status": "error", "message": f"API error while retrieving service dependencies: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Unexpected error while retrieving service dependencies: {e}"}
 
 @mcp.tool()
-def create_service_dependency(
-    service_id: str = Field(..., description="The ID of the service to add a dependency to"),
-    dependent_service_id: str = Field(..., description="The ID of the dependent service"),
-    relationship_type: str = Field(..., description="The type of relationship (e.g., 'uses', 'depends_on')")
+def walk_service_dependencies(
+    service_name: str = Field(..., description="The service to start from"),
+    direction: str = Field("downstream", description="'downstream' for services it calls, 'upstream' for services calling it"),
+    max_depth: int = Field(3, ge=1, le=20, description="Maximum number of hops to follow")
 ) -> Dict[str, Any]:
-    """Create a new service dependency.
+    """List every service reachable from a service within max_depth hops, answered from the cached dependency graph.
 
     Args:
-        service_id (str): The ID of the service to add a dependency to.
-        dependent_service_id (str): The ID of the dependent service.
-        relationship_type (str): The type of relationship (e.g., 'uses', 'depends_on').
-    
+        service_name (str): The service to start from.
+        direction (str): 'downstream' for services it calls, 'upstream' for services calling it.
+        max_depth (int): Maximum number of hops to follow (1-20). Default is 3.
+
     Returns:
         Dict[str, Any]: A dictionary containing:
-            - status (str): 'success' or 'error'
+            - status (str): 'success', 'building' or 'error'
             - message (str): Description of the operation result
-            - content (dict): Created dependency data if successful"""
+            - content (dict): Reachable services with their depth and the service they were reached through"""
+    if direction not in ("downstream", "upstream"):
+        return {"status": "error", "message": "direction must be 'downstream' or 'upstream'"}
     try:
-        with ApiClient(configuration) as api_client:
-            service_dependencies_api = ServiceDependenciesApi(api_client)
-            body = {
-                "data": {
-                    "type": "service_dependency",
-                    "attributes": {
-                        "dependent_service_id": dependent_service_id,
-                        "relationship_type": relationship_type,
-                    },
-                }
-            }
-            response = service_dependencies_api.create_service_dependency(service_id, body=body)
-            return {"status": "success", "message": "Service dependency created successfully", "content": response.to_dict()}
+        graph = service_graph.get(wait=False)
+        if graph is None:
+            return _building()
+        missing = _missing(graph, service_name)
+        if missing:
+            return missing
+        reached = graph.bfs(service_name, direction, max_depth)
+        return {
+            "status": "success",
+            "message": f"Found {len(reached)} {direction} services within {max_depth} hops",
+            "content": {"service": service_name, "direction": direction, "services": reached,
+                        "graph": _graph_info(graph)},
+        }
     except ApiException as e:
-        return {"status": "error", "message": f"API error while creating service dependency: {e}"}
+        return {"status": "error", "message": f"API error while walking service dependencies: {e}"}
     except Exception as e:
-        return {"status": "error", "message": f"Unexpected error while creating service dependency: {e}"}
+        return {"status": "error", "message": f"Unexpected error while walking service dependencies: {e}"}
 
 @mcp.tool()
-def delete_service_dependency(
-    service_id: str = Field(..., description="The ID of the service to delete a dependency from"),
-    dependency_id: str = Field(..., description="The ID of the dependency to delete")
+def get_service_blast_radius(
+    service_name: str = Field(..., description="The service assumed to be failing"),
+    max_depth: int = Field(10, ge=1, le=20, description="Maximum number of hops to follow upstream")
 ) -> Dict[str, Any]:
-    """Delete a specific service dependency.
+    """Estimate which services are affected when a service fails: everything that calls it, directly or transitively.
 
     Args:
-        service_id (str): The ID of the service to delete a dependency from.
-        dependency_id (str): The ID of the dependency to delete.
-    
+        service_name (str): The service assumed to be failing.
+        max_depth (int): Maximum number of hops to follow upstream (1-20). Default is 10.
+
     Returns:
         Dict[str, Any]: A dictionary containing:
-            - status (str): 'success' or 'error'
-            - message (str): Description of the operation result"""
+            - status (str): 'success', 'building' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): Direct callers with call counts, affected services by depth and the
+              affected entry points (services nothing else calls)"""
+    try:
+        graph = service_graph.get(wait=False)
+        if graph is None:
+            return _building()
+        missing = _missing(graph, service_name)
+        if missing:
+            return missing
+        affected = graph.bfs(service_name, "upstream", max_depth)
+        by_depth: Dict[int, List[str]] = {}
+        for item in affected:
+            by_depth.setdefault(item["depth"], []).append(item["service"])
+        entry_points = [item["service"] for item in affected if not graph.neighbours(item["service"], "upstream")]
+        return {
+            "status": "success",
+            "message": f"{len(affected)} services depend on {service_name}",
+            "content": {
+                "service": service_name,
+                "affected_count": len(affected),
+                "direct_callers": graph.neighbours(service_name, "upstream"),
+                "affected_by_depth": {str(depth): services for depth, services in sorted(by_depth.items())},
+                "entry_points": entry_points,
+                "graph": _graph_info(graph),
+            },
+        }
+    except ApiException as e:
+        return {"status": "error", "message": f"API error while computing blast radius: {e}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Unexpected error while computing blast radius: {e}"}
+
+@mcp.tool()
+def find_service_path(
+    source: str = Field(..., description="The calling service"),
+    target: str = Field(..., description="The service to reach")
+) -> Dict[str, Any]:
+    """Find the shortest call chain from one service down to another.
+
+    Args:
+        source (str): The calling service.
+        target (str): The service to reach.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success', 'building' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): The path as a list of services, or null when target is not downstream of source"""
     try:
-        with ApiClient(configuration) as api_client:
-            service_dependencies_api = ServiceDependenciesApi(api_client)
-            service_dependencies_api.delete_service_dependency(service_id, dependency_id)
-            return {"status": "success", "message": "Service dependency deleted successfully"}
+        graph = service_graph.get(wait=False)
+        if graph is None:
+            return _building()
+        missing = _missing(graph, source, target)
+        if missing:
+            return missing
+        path = graph.shortest_path(source, target)
+        message = f"Shortest path has {len(path) - 1} hops" if path else f"{target} is not downstream of {source}"
+        return {
+            "status": "success",
+            "message": message,
+            "content": {"source": source, "target": target, "path": path, "graph": _graph_info(graph)},
+        }
     except ApiException as e:
-        return {"status": "error", "message": f"API error while deleting service dependency: {e}"}
+        return {"status": "error", "message": f"API error while finding service path: {e}"}
     except Exception as e:
-        return {"status": "error", "message": f"Unexpected error while deleting service dependency: {e}"}
+        return {"status": "error", "message": f"Unexpected error while finding service path: {e}"}
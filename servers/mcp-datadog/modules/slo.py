@@ -1,12 +1,36 @@
 from typing import Optional, Dict, Any, List
 from pydantic import Field
-from datadog_api_client import ApiClient
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import json
+import time
+import numpy as np
+from utils.api_client import ApiClient, raw_configuration
 from datadog_api_client.v1.api.service_level_objectives_api import ServiceLevelObjectivesApi
-from config import configuration
+from config import (
+    configuration,
+    FANOUT_MAX_WORKERS,
+    METRICS_CACHE_BLOCK,
+    METRICS_CACHE_RECENT_TTL,
+    METRICS_INGEST_DELAY,
+    SLO_BOARD_MAX_AGE,
+    SLO_BOARD_MAX_WORKERS,
+    SLO_HISTORY_MAX_QUERIES,
+)
 from mcp.server.fastmcp import FastMCP
+from .metrics import fetch_metric_blocks, merge_metric_blocks
+from utils.burn_rate import BURN_RULES, TIMEFRAME_SECONDS, evaluate_burn, exhaustion_eta
+from utils.background import BackgroundValue
+from utils.series_history import SeriesHistory
+from utils.timeseries import align
 
 mcp = FastMCP("Datadog SLO Service")
 
+SLO_PAGE_LIMIT = 1000  # SLOs per list request
+
+# Count history of metric SLOs; settled days are never fetched twice
+slo_history = SeriesHistory(METRICS_CACHE_BLOCK, METRICS_INGEST_DELAY, METRICS_CACHE_RECENT_TTL, SLO_HISTORY_MAX_QUERIES)
+
 @mcp.tool()
 def list_slos(
     query: Optional[str] = Field(default=None, description="Query to filter SLOs"),
@@ -75,3 +99,262 @@ def delete_slo(
             return {"status": "success", "message": "SLO deleted successfully"}
     except Exception as e:
         return {"status": "error", "message": f"Error deleting SLO: {e}"}
+
+
+def fetch_slo(slo_id: str) -> Dict[str, Any]:
+    """Return an SLO definition as a plain dict."""
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        response = ServiceLevelObjectivesApi(api_client).get_slo(slo_id)
+        return json.loads(response.data).get("data") or {}
+
+
+def slo_target(slo: Dict[str, Any], timeframe: Optional[str] = None):
+    """Pick (timeframe, target) of an SLO, preferring the requested timeframe."""
+    thresholds = slo.get("thresholds") or []
+    for threshold in thresholds:
+        if threshold.get("timeframe") not in TIMEFRAME_SECONDS:
+            continue
+        if threshold["timeframe"] == timeframe or (timeframe is None and threshold["timeframe"] == slo.get("timeframe")):
+            return threshold["timeframe"], float(threshold["target"])
+    if timeframe is None and slo.get("timeframe") in TIMEFRAME_SECONDS and slo.get("target_threshold") is not None:
+        return slo["timeframe"], float(slo["target_threshold"])
+    usable = [t for t in thresholds if t.get("timeframe") in TIMEFRAME_SECONDS and (timeframe is None or t["timeframe"] == timeframe)]
+    if not usable:
+        raise ValueError(f"SLO {slo.get('id')} has no target for timeframe {timeframe or slo.get('timeframe') or '7d, 30d or 90d'}")
+    return usable[0]["timeframe"], float(usable[0]["target"])
+
+
+def _summed_counts(slo_id: str, timeframe: str, query: str, from_time: int, to_time: int):
+    """Fetch a count query through the SLO history store and add up all its series into one (times, values) pair."""
+    blocks = slo_history.get((slo_id, timeframe, query), from_time, to_time,
+                             lambda starts: fetch_metric_blocks(query, starts))
+    grid, matrix = align(merge_metric_blocks(blocks, from_time, to_time))
+    return grid, np.nansum(matrix, axis=0) if len(grid) else np.empty(0)
+
+
+def _history_sli(slo_id: str, from_time: int, to_time: int) -> Optional[float]:
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        response = ServiceLevelObjectivesApi(api_client).get_slo_history(slo_id, from_time, to_time)
+    overall = (json.loads(response.data).get("data") or {}).get("overall") or {}
+    return overall.get("sli_value")
+
+
+def _burn_from_history(slo_id: str, target: float, period: int, now: int) -> Dict[str, Any]:
+    """Burn rates of a non-metric SLO from the SLI the history endpoint reports over each window.
+
+    One history request per distinct window, run concurrently; there is no
+    per-interval data, so past firings are not available.
+    """
+    budget = 1 - target / 100.0
+    windows = sorted({period} | {w for rule in BURN_RULES for w in rule[:2]})
+    with ThreadPoolExecutor(max_workers=min(FANOUT_MAX_WORKERS, len(windows)), thread_name_prefix="slo") as executor:
+        futures = {w: executor.submit(contextvars.copy_context().run, _history_sli, slo_id, now - w, now) for w in windows}
+        sli = {w: future.result() for w, future in futures.items()}
+
+    def burn(window: int) -> Optional[float]:
+        return round((1 - sli[window] / 100.0) / budget, 3) if sli[window] is not None and budget > 0 else None
+
+    rules = []
+    for long_window, short_window, share, severity in BURN_RULES:
+        threshold = share * period / long_window
+        long_burn, short_burn = burn(long_window), burn(short_window)
+        rules.append({
+            "long_window_seconds": long_window,
+            "short_window_seconds": short_window,
+            "threshold": round(threshold, 3),
+            "severity": severity,
+            "long_burn": long_burn,
+            "short_burn": short_burn,
+            "firing": long_burn is not None and short_burn is not None and min(long_burn, short_burn) >= threshold,
+        })
+    firing = [rule for rule in rules if rule["firing"]]
+    period_burn = burn(period)
+    return {
+        "sli": sli[period],
+        "error_budget_remaining_pct": round((1 - period_burn) * 100, 3) if period_burn is not None else None,
+        "alert": "page" if any(r["severity"] == "page" for r in firing) else "ticket" if firing else None,
+        "rules": rules,
+    }
+
+
+def slo_burn_status(slo: Dict[str, Any], timeframe: Optional[str] = None) -> Dict[str, Any]:
+    """Error budget, multi-window burn rates and budget exhaustion ETA of one SLO.
+
+    Metric SLOs are evaluated from their numerator and denominator count
+    queries, held by day in slo_history, so only the newest, still-changing
+    day is fetched again on repeated checks.
+    Other SLO types fall back to the SLI reported by the history endpoint.
+    """
+    timeframe, target = slo_target(slo, timeframe)
+    period = TIMEFRAME_SECONDS[timeframe]
+    now = int(time.time())
+    query = slo.get("query") or {}
+    if slo.get("type") == "metric" and query.get("numerator") and query.get("denominator"):
+        good_times, good = _summed_counts(slo["id"], timeframe, query["numerator"], now - period, now)
+        total_times, total = _summed_counts(slo["id"], timeframe, query["denominator"], now - period, now)
+        grid, matrix = align([("good", good_times, good), ("total", total_times, total)])
+        if len(grid) == 0:
+            raise ValueError(f"No data for SLO {slo.get('id')} over the last {timeframe}")
+        matrix = np.nan_to_num(matrix)
+        status = evaluate_burn(grid, matrix[0], matrix[1], target, period)
+        source = "metrics"
+    else:
+        status = _burn_from_history(slo["id"], target, period, now)
+        source = "history"
+    current_burn = status["rules"][0]["long_burn"]
+    eta = exhaustion_eta(status["error_budget_remaining_pct"], current_burn, period)
+    return {
+        "slo": {"id": slo.get("id"), "name": slo.get("name"), "type": slo.get("type"), "timeframe": timeframe,
+                "target": target},
+        "source": source,
+        **status,
+        "current_burn": current_burn,
+        "budget_exhausted_in_seconds": int(eta) if eta is not None else None,
+    }
+
+@mcp.tool()
+def get_slo_burn_rate(
+    slo_id: str = Field(..., description="The ID of the SLO"),
+    timeframe: Optional[str] = Field(default=None, description="SLO timeframe to evaluate: '7d', '30d' or '90d'. Defaults to the SLO's own")
+) -> Dict[str, Any]:
+    """Compute an SLO's error budget and multi-window, multi-burn-rate alert state.
+
+    Four rules are evaluated: 1h/5m and 6h/30m (page) and 24h/2h and 3d/6h
+    (ticket), each firing when both windows burn faster than the rate that
+    would spend 2%, 5%, 10% and 10% of the period's budget within the long
+    window. For metric SLOs the windows are computed at every point of the
+    period, so past firings are reported too.
+
+    Args:
+        slo_id (str): The ID of the SLO.
+        timeframe (Optional[str]): SLO timeframe to evaluate. Defaults to the SLO's own.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): SLI, error budget remaining, the burn rate of every rule window, which
+              rules are firing and when the budget runs out at the current 1h burn rate"""
+    if timeframe is not None and timeframe not in TIMEFRAME_SECONDS:
+        return {"status": "error", "message": f"timeframe must be one of {', '.join(TIMEFRAME_SECONDS)}"}
+    try:
+        status = slo_burn_status(fetch_slo(slo_id), timeframe)
+        message = f"SLO burn alert: {status['alert']}" if status["alert"] else "No burn-rate alert firing"
+        return {"status": "success", "message": message, "content": status}
+    except Exception as e:
+        return {"status": "error", "message": f"Error computing SLO burn rate: {e}"}
+
+
+def iter_slos(query: Optional[str] = None):
+    """Yield every SLO definition as a plain dict, following limit/offset pages."""
+    offset = 0
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        slo_api = ServiceLevelObjectivesApi(api_client)
+        while True:
+            kwargs = {"limit": SLO_PAGE_LIMIT, "offset": offset}
+            if query:
+                kwargs["query"] = query
+            data = json.loads(slo_api.list_slos(**kwargs).data).get("data") or []
+            yield from data
+            if len(data) < SLO_PAGE_LIMIT:
+                return
+            offset += len(data)
+
+
+def _board_row(slo: Dict[str, Any]) -> Dict[str, Any]:
+    status = slo_burn_status(slo)
+    return {
+        **status["slo"],
+        "tags": slo.get("tags") or [],
+        "sli": status["sli"],
+        "error_budget_remaining_pct": status["error_budget_remaining_pct"],
+        "current_burn": status["current_burn"],
+        "alert": status["alert"],
+        "budget_exhausted_in_seconds": status["budget_exhausted_in_seconds"],
+    }
+
+
+def _board_rank(row: Dict[str, Any]):
+    alert = {"page": 0, "ticket": 1}.get(row["alert"], 2)
+    eta = row["budget_exhausted_in_seconds"]
+    remaining = row["error_budget_remaining_pct"]
+    return (alert, eta if eta is not None else float("inf"), remaining if remaining is not None else float("inf"))
+
+
+def build_slo_board() -> Dict[str, Any]:
+    """Evaluate every SLO concurrently and rank them, most urgent first.
+
+    Requests still go through the shared rate-limit scheduler, so the worker
+    count only bounds how many SLOs are in progress at once.
+    """
+    slos = list(iter_slos())
+    rows, errors = [], []
+    if slos:
+        with ThreadPoolExecutor(max_workers=min(SLO_BOARD_MAX_WORKERS, len(slos)), thread_name_prefix="slo-board") as executor:
+            futures = [(slo, executor.submit(contextvars.copy_context().run, _board_row, slo)) for slo in slos]
+            for slo, future in futures:
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    errors.append({"id": slo.get("id"), "name": slo.get("name"), "error": str(e)})
+    rows.sort(key=_board_rank)
+    return {"built_at": int(time.time()), "rows": rows, "errors": errors}
+
+
+slo_board = BackgroundValue("slo-board", build_slo_board, SLO_BOARD_MAX_AGE)
+
+
+def start_slo_board() -> None:
+    """Start building the SLO board in a background thread, so no tool call has to wait for the first build."""
+    slo_board.get(wait=False)
+
+@mcp.tool()
+def get_slo_board(
+    tags: Optional[List[str]] = Field(default=None, description="Only include SLOs carrying all of these tags"),
+    alerting_only: bool = Field(default=False, description="Only include SLOs with a burn-rate alert firing"),
+    limit: int = Field(default=50, ge=1, le=1000, description="Maximum number of SLOs to return")
+) -> Dict[str, Any]:
+    """Rank every SLO by urgency: firing burn-rate alerts first, then by how soon the error budget runs out.
+
+    The board covers all SLOs and is built in the background, starting at
+    server startup, and rebuilt once older than DATADOG_SLO_BOARD_MAX_AGE.
+    Calls made before the first build finishes return status 'building'.
+
+    Args:
+        tags (Optional[List[str]]): Only include SLOs carrying all of these tags.
+        alerting_only (bool): Only include SLOs with a burn-rate alert firing. Default is False.
+        limit (int): Maximum number of SLOs to return. Default is 50.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success', 'building' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): Ranked rows with SLI, budget remaining, 1h burn rate, alert and
+              exhaustion ETA, SLOs that could not be evaluated, and the board's age; while
+              building, the state of the build"""
+    try:
+        board = slo_board.get(wait=False)
+        if board is None:
+            build = slo_board.status()
+            message = "SLO board is being built; try again shortly"
+            if build["last_error"]:
+                message += f" (last attempt failed: {build['last_error']})"
+            return {"status": "building", "message": message, "content": build}
+        rows = board["rows"]
+        if tags:
+            rows = [row for row in rows if set(tags) <= set(row["tags"])]
+        if alerting_only:
+            rows = [row for row in rows if row["alert"]]
+        firing = sum(1 for row in rows if row["alert"])
+        return {
+            "status": "success",
+            "message": f"{len(rows)} SLOs, {firing} with a burn-rate alert firing",
+            "content": {
+                "rows": rows[:limit],
+                "errors": board["errors"],
+                "built_at": board["built_at"],
+                "age_seconds": int(time.time()) - board["built_at"],
+            },
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error building SLO board: {e}"}
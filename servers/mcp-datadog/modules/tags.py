@@ -1,6 +1,6 @@
 from typing import Optional, Dict, Any, List
 from pydantic import Field
-from datadog_api_client import ApiClient
+from utils.api_client import ApiClient
 from datadog_api_client.v1.api.tags_api import TagsApi
 from config import configuration
 from mcp.server.fastmcp import FastMCP
@@ -1,20 +1,179 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List
 from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+import contextvars
 import json
+import random
+import threading
 import time
-from datadog_api_client import ApiClient
+import numpy as np
+from utils.api_client import ApiClient, raw_configuration
 from datadog_api_client.v2.api.spans_api import SpansApi
-from config import configuration
+from config import configuration, FANOUT_MAX_WORKERS
 from mcp.server.fastmcp import FastMCP
+from utils.fanout import fan_out, iso8601, plan_windows
+from utils.trace_tree import analyze_trace, group_traces
+from utils.sampling import Stratum, stratified_mean, stratified_proportion, weighted_quantile
 
 mcp = FastMCP("Datadog Traces Service")
 
+SPANS_PAGE_LIMIT = 1000  # maximum page size of the spans search API
+TRACE_SPANS_LIMIT = 10000  # spans fetched when assembling traces
+TRACE_IDS_PER_QUERY = 20
+SAMPLE_STATUSES = {"error": "status:error", "ok": "-status:error"}
+SAMPLE_READ_SPANS = 10  # spans per read when sampling a stratum
+
+
+def iter_spans(query: str, from_time: int, to_time: int, sort: str = "-timestamp",
+               page_limit: int = SPANS_PAGE_LIMIT, raw: bool = False,
+               stop: Optional[threading.Event] = None) -> Iterator[Any]:
+    """Yield spans matching a query, following the search cursor page by page.
+
+    With raw=True spans are yielded as plain dicts parsed from the JSON
+    response, which is much faster when scanning many pages. No further
+    page is requested once `stop` is set.
+    """
+    cursor = None
+    with ApiClient(raw_configuration(configuration) if raw else configuration) as api_client:
+        spans_api = SpansApi(api_client)
+        while stop is None or not stop.is_set():
+            page = {"limit": page_limit}
+            if cursor:
+                page["cursor"] = cursor
+            response = spans_api.list_spans(
+                body={
+                    "data": {
+                        "attributes": {
+                            "filter": {"query": query, "from": iso8601(from_time), "to": iso8601(to_time)},
+                            "sort": sort,
+                            "page": page,
+                        },
+                        "type": "search_request",
+                    }
+                }
+            )
+            if raw:
+                response = json.loads(response.data)
+            data = response.get("data") or []
+            yield from data
+            meta = response.get("meta")
+            cursor = meta.get("page", {}).get("after") if meta else None
+            if not cursor or len(data) < page_limit:
+                return
+
+
+def count_spans(query: str, from_time: int, to_time: int) -> int:
+    """Count spans matching a query with a single aggregate request."""
+    with ApiClient(configuration) as api_client:
+        spans_api = SpansApi(api_client)
+        response = spans_api.aggregate_spans(
+            body={
+                "data": {
+                    "attributes": {
+                        "compute": [{"aggregation": "count"}],
+                        "filter": {"query": query, "from": iso8601(from_time), "to": iso8601(to_time)},
+                    },
+                    "type": "aggregate_request",
+                }
+            }
+        )
+        buckets = response.get("data") or []
+        if not buckets:
+            return 0
+        compute = buckets[0].attributes.get("compute") or {}
+        return int(next(iter(compute.values()), 0) or 0)
+
+
+def search_spans(query: str, from_time: int, to_time: int, limit: int, sort: str = "-timestamp") -> List[Any]:
+    """Return up to `limit` spans in sort order.
+
+    Requests that fit in one page are a single call. Larger ones are split
+    into time windows sized from an aggregate count and fetched concurrently.
+    """
+    def fetch(start: int, end: int, n: int, stop: Optional[threading.Event] = None) -> List[Any]:
+        return list(islice(iter_spans(query, start, end, sort, min(n, SPANS_PAGE_LIMIT), stop=stop), n))
+
+    if limit <= SPANS_PAGE_LIMIT:
+        return fetch(from_time, to_time, limit)
+    descending = sort.startswith("-")
+    estimate = count_spans(query, from_time, to_time)
+    windows = plan_windows(from_time, to_time, estimate, limit, SPANS_PAGE_LIMIT, descending)
+    return fan_out(windows, fetch, limit, key=lambda span: span.attributes.start_timestamp,
+                  ident=lambda span: span.id, descending=descending)
+
+
+def _epoch(timestamp: Any) -> float:
+    if isinstance(timestamp, str):
+        return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+    return timestamp.timestamp()
+
+
+def span_record(span: Any) -> Dict[str, Any]:
+    """Flatten a v2 span, model or raw dict, into the fields trace assembly needs."""
+    attributes = span["attributes"] if isinstance(span, dict) else span.attributes
+    custom = attributes.get("custom") or {}
+    start = _epoch(attributes.get("start_timestamp"))
+    end = _epoch(attributes.get("end_timestamp")) if attributes.get("end_timestamp") else start
+    return {
+        "trace_id": attributes.get("trace_id"),
+        "span_id": attributes.get("span_id"),
+        "parent_id": attributes.get("parent_id"),
+        "service": attributes.get("service") or "unknown",
+        "resource": attributes.get("resource_name") or "",
+        "start": start,
+        "end": end,
+        "error": bool(custom.get("error")) or custom.get("status") == "error",
+    }
+
+
+def fetch_traces(trace_ids: List[str], from_time: int, to_time: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Fetch every span of the given traces, grouped by trace_id."""
+    records = []
+    for i in range(0, len(trace_ids), TRACE_IDS_PER_QUERY):
+        chunk = trace_ids[i:i + TRACE_IDS_PER_QUERY]
+        query = f"trace_id:({' OR '.join(chunk)})"
+        records.extend(span_record(span) for span in search_spans(query, from_time, to_time, TRACE_SPANS_LIMIT, "timestamp"))
+    return group_traces(records)
+
+def sample_stratum(query: str, from_time: int, to_time: int, n: int) -> List[List[Dict[str, Any]]]:
+    """Sample up to n spans as short reads from a random instant in each equal slice of the window.
+
+    Spans read together are neighbours in time and alike, so each read is
+    returned as its own cluster. A read that runs short wraps to the start
+    of the window, and spans an earlier read already drew are dropped.
+    """
+    reads = -(-n // SAMPLE_READ_SPANS)
+    edges = [from_time + (to_time - from_time) * i // reads for i in range(reads + 1)]
+    pivots = [random.randint(edges[i], max(edges[i], edges[i + 1] - 1)) for i in range(reads)]
+    sizes = [min(SAMPLE_READ_SPANS, n - i * SAMPLE_READ_SPANS) for i in range(reads)]
+
+    def read(pivot: int, size: int) -> List[Any]:
+        spans = list(islice(iter_spans(query, pivot, to_time, "timestamp", size, raw=True), size))
+        if len(spans) < size and pivot > from_time:
+            spans += islice(iter_spans(query, from_time, pivot, "timestamp", size - len(spans), raw=True), size - len(spans))
+        return spans
+
+    with ThreadPoolExecutor(max_workers=min(reads, FANOUT_MAX_WORKERS), thread_name_prefix="sample-read") as executor:
+        futures = [executor.submit(contextvars.copy_context().run, read, pivot, size) for pivot, size in zip(pivots, sizes)]
+        results = [future.result() for future in futures]
+    seen = set()
+    clusters = []
+    for spans in results:
+        records = [span_record(span) for span in spans]
+        records = [record for record in records if record["span_id"] not in seen and not seen.add(record["span_id"])]
+        if records:
+            clusters.append(records)
+    return clusters
+
+
 @mcp.tool()
 def list_traces(
     query: str,
     from_time: int = Field(default_factory=lambda: int(time.time()) - 900, description="Start time in epoch seconds (default: last 15 minutes)"),
     to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds (default: now)"),
-    limit: int = Field(default=100, ge=1, le=1000, description="Maximum number of traces to return (default: 100)"),
+    limit: int = Field(default=100, ge=1, le=10000, description="Maximum number of traces to return (default: 100)"),
     sort: str = Field(default="-timestamp", description="Sort order for traces, default is descending timestamp"),
     service: Optional[str] = Field(default=None, description="Filter by service name"),
     operation: Optional[str] = Field(default=None, description="Filter by operation name")
@@ -25,7 +184,8 @@ def list_traces(
         query (str): Query to filter traces.
         from_time (int, optional): Start time in epoch seconds. Defaults to last 15 minutes.
         to_time (int, optional): End time in epoch seconds. Defaults to current time.
-        limit (int, optional): Maximum number of traces to return (1-1000). Defaults to 100.
+        limit (int, optional): Maximum number of traces to return (1-10000). Defaults to 100.
+            Limits above one page (1000) are fetched as concurrent time windows.
         sort (str, optional): Sort order for traces. Defaults to "-timestamp".
         service (Optional[str], optional): Filter by service name.
         operation (Optional[str], optional): Filter by operation name.
@@ -36,71 +196,116 @@ def list_traces(
             - message (str): Description of the operation result
             - content (List): List of trace data as formatted JSON text"""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
-            filter_query = [query]
-            if service:
-                filter_query.append(f"service:{service}")
-            if operation:
-                filter_query.append(f"operation:{operation}")
-
-            response = spans_api.list_spans(
-                body={
-                    "data": {
-                        "attributes": {
-                            "filter": {
-                                "query": " ".join(filter_query),
-                                "from": str(from_time),
-                                "to": str(to_time),
-                            },
-                            "sort": sort,
-                            "page": {"limit": limit},
-                        },
-                        "type": "search_request",
-                    }
-                }
-            )
+        filter_query = [query]
+        if service:
+            filter_query.append(f"service:{service}")
+        if operation:
+            filter_query.append(f"operation:{operation}")
+        spans = search_spans(" ".join(filter_query), from_time, to_time, limit, sort)
 
-            if not response.data:
-                return {"status": "error", "message": "No traces data returned", "content": []}
+        if not spans:
+            return {"status": "error", "message": "No traces data returned", "content": []}
 
-            return {
-                "status": "success",
-                "message": "Traces retrieved successfully",
-                "content": [{"type": "text", "text": json.dumps(response.data, indent=2)}]
-            }
+        return {
+            "status": "success",
+            "message": "Traces retrieved successfully",
+            "content": [{"type": "text", "text": json.dumps([span.to_dict() for span in spans], indent=2, default=str)}]
+        }
     except Exception as e:
         return {"status": "error", "message": f"Error fetching traces: {e}", "content": []}
 
 @mcp.tool()
 def get_trace_details(
-    trace_id: str = Field(..., description="The unique ID of the trace to retrieve")
+    trace_id: str = Field(..., description="The unique ID of the trace to retrieve"),
+    from_time: int = Field(default_factory=lambda: int(time.time()) - 86400, description="Start of the range to search for the trace's spans (default: last 24 hours)"),
+    to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds (default: now)"),
+    max_rows: int = Field(default=30, ge=1, le=500, description="Maximum number of waterfall rows")
 ) -> Dict[str, Any]:
-    """Retrieve details of a specific trace by ID.
+    """Retrieve a trace by ID, assembled from its spans into a compact summary.
 
     Args:
         trace_id (str): The unique ID of the trace to retrieve.
+        from_time (int, optional): Start of the search range in epoch seconds. Defaults to 24 hours ago.
+        to_time (int, optional): End of the search range in epoch seconds. Defaults to current time.
+        max_rows (int, optional): Maximum number of waterfall rows. Defaults to 30.
     
     Returns:
         Dict[str, Any]: A dictionary containing:
             - status (str): 'success' or 'error'
             - message (str): Description of the operation result
-            - content (List): List containing trace details as formatted JSON text"""
+            - content (dict): The trace summary: root, duration, span and error counts,
+              critical path, self time per service, slowest cross-service hops and a
+              waterfall where repeated identical calls are collapsed into one row"""
     try:
-        with ApiClient(configuration) as api_client:
-            spans_api = SpansApi(api_client)
-            response = spans_api.get_span(trace_id)
+        traces = fetch_traces([trace_id], from_time, to_time)
+        spans = traces.get(trace_id)
+        if not spans:
+            return {"status": "error", "message": "No trace data returned", "content": []}
 
-            if not response.data:
-                return {"status": "error", "message": "No trace data returned", "content": []}
+        return {
+            "status": "success",
+            "message": "Trace details retrieved successfully",
+            "content": analyze_trace(spans, max_rows)
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error fetching trace details: {e}", "content": []}
 
-            return {
-                "status": "success",
-                "message": "Trace details retrieved successfully",
-                "content": [{"type": "text", "text": json.dumps(response.data, indent=2)}]
+@mcp.tool()
+def analyze_traces(
+    query: str = Field(..., description="Query selecting spans whose traces are analyzed"),
+    from_time: int = Field(default_factory=lambda: int(time.time()) - 900, description="Start time in epoch seconds (default: last 15 minutes)"),
+    to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds (default: now)"),
+    max_traces: int = Field(default=10, ge=1, le=100, description="Maximum number of traces to assemble"),
+    sort: str = Field(default="-timestamp", description="Which matching spans pick the traces, default is most recent first"),
+    max_rows: int = Field(default=10, ge=0, le=500, description="Maximum number of waterfall rows per trace")
+) -> Dict[str, Any]:
+    """Assemble the traces of matching spans and summarize each one.
+
+    Matching spans only select the traces; every span of those traces is
+    then fetched, grouped by trace_id and built into a tree.
+
+    Args:
+        query (str): Query selecting spans whose traces are analyzed.
+        from_time (int, optional): Start time in epoch seconds. Defaults to last 15 minutes.
+        to_time (int, optional): End time in epoch seconds. Defaults to current time.
+        max_traces (int, optional): Maximum number of traces to assemble (1-100). Defaults to 10.
+        sort (str, optional): Sort order of the matching spans. Defaults to "-timestamp".
+        max_rows (int, optional): Maximum number of waterfall rows per trace. Defaults to 10.
+    
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict):
+                - self_time_by_service_ms (dict): Self time per service summed over all traces
+                - traces (list): One summary per trace, as returned by get_trace_details"""
+    try:
+        trace_ids: List[str] = []
+        for span in iter_spans(query, from_time, to_time, sort):
+            trace_id = span.attributes.get("trace_id")
+            if trace_id and trace_id not in trace_ids:
+                trace_ids.append(trace_id)
+                if len(trace_ids) >= max_traces:
+                    break
+        if not trace_ids:
+            return {"status": "error", "message": "No traces data returned", "content": []}
+
+        traces = fetch_traces(trace_ids, from_time, to_time)
+        summaries = [analyze_trace(traces[trace_id], max_rows) for trace_id in trace_ids if trace_id in traces]
+        totals: Dict[str, float] = {}
+        for summary in summaries:
+            for service, ms in summary["self_time_by_service_ms"].items():
+                totals[service] = totals.get(service, 0.0) + ms
+        return {
+            "status": "success",
+            "message": f"Assembled {len(summaries)} traces",
+            "content": {
+                "self_time_by_service_ms": {s: round(ms, 3) for s, ms in sorted(totals.items(), key=lambda i: -i[1])},
+                "traces": summaries,
             }
+        }
     except Exception as e:
-        return {"status": "error", "message": f"Error fetching trace details: {e}", "content": []}
+        return {"status": "error", "message": f"Error analyzing traces: {e}", "content": []}
 
 @mcp.tool()
 def summarize_traces(
@@ -159,3 +364,109 @@ def summarize_traces(
             }
     except Exception as e:
         return {"status": "error", "message": f"Error summarizing traces: {e}", "content": []}
+
+@mcp.tool()
+def sample_span_stats(
+    query: str = Field(..., description="Query selecting spans, e.g. 'service:web'"),
+    from_time: int = Field(default_factory=lambda: int(time.time()) - 3600, description="Start time in epoch seconds (default: last hour)"),
+    to_time: int = Field(default_factory=lambda: int(time.time()), description="End time in epoch seconds (default: now)"),
+    time_buckets: int = Field(default=6, ge=1, le=24, description="Number of time strata"),
+    per_stratum: int = Field(default=100, ge=5, le=1000, description="Spans sampled per stratum (time bucket x status)"),
+    group_by: str = Field(default="resource", description="Group shares by 'resource' or 'service'"),
+    top: int = Field(default=10, ge=1, le=50, description="Number of groups to report")
+) -> Dict[str, Any]:
+    """Estimate span statistics from a stratified sample instead of a full scan.
+
+    The range is split into time buckets and each bucket into error and ok
+    spans. Every stratum is counted exactly with the aggregate endpoint and a
+    small sample is read from it, all concurrently. Each sample is drawn as
+    short reads from random instants across its stratum. Estimates weight
+    each stratum by its count and come with 95% confidence intervals that
+    account for spans read together being alike.
+
+    Args:
+        query (str): Query selecting spans.
+        from_time (int, optional): Start time in epoch seconds. Defaults to last hour.
+        to_time (int, optional): End time in epoch seconds. Defaults to current time.
+        time_buckets (int, optional): Number of time strata (1-24). Defaults to 6.
+        per_stratum (int, optional): Spans sampled per stratum. Defaults to 100.
+        group_by (str, optional): 'resource' or 'service'. Defaults to 'resource'.
+        top (int, optional): Number of groups to report. Defaults to 10.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): If successful:
+                - population (dict): Exact span and error counts and error rate
+                - sampled (int): Spans read
+                - duration_ms (dict): mean, p50, p95 and p99 estimates, each with ci95
+                - groups (list): Largest groups with estimated share, span count and error share"""
+    try:
+        if group_by not in ("resource", "service"):
+            return {"status": "error", "message": "group_by must be 'resource' or 'service'"}
+        edges = [from_time + (to_time - from_time) * i // time_buckets for i in range(time_buckets + 1)]
+        strata_keys = [(status, edges[i], edges[i + 1]) for status in SAMPLE_STATUSES for i in range(time_buckets)
+                       if edges[i + 1] > edges[i]]
+
+        with ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="sample") as executor:
+            def submit(fn, *args):
+                return executor.submit(contextvars.copy_context().run, fn, *args)
+
+            counts = {key: submit(count_spans, f"{query} {SAMPLE_STATUSES[key[0]]}", key[1], key[2]) for key in strata_keys}
+            samples = {key: submit(sample_stratum, f"{query} {SAMPLE_STATUSES[key[0]]}", key[1], key[2], per_stratum)
+                       for key in strata_keys}
+            counts = {key: future.result() for key, future in counts.items()}
+            samples = {key: future.result() for key, future in samples.items()}
+
+        population = sum(counts.values())
+        errors = sum(count for key, count in counts.items() if key[0] == "error")
+        if not population:
+            return {"status": "error", "message": "No spans match the query", "content": []}
+
+        strata = [Stratum(counts[key], [(r["end"] - r["start"]) * 1000 for read in samples[key] for r in read],
+                          [i for i, read in enumerate(samples[key]) for _ in read]) for key in strata_keys]
+        labels = [[r[group_by] for read in samples[key] for r in read] for key in strata_keys]
+        is_error = [key[0] == "error" for key in strata_keys]
+
+        def rounded(estimate: Dict[str, Any], digits: int = 3) -> Dict[str, Any]:
+            if estimate["estimate"] is None:
+                return estimate
+            return {"estimate": round(estimate["estimate"], digits), "ci95": [round(v, digits) for v in estimate["ci95"]]}
+
+        # Rank labels by their weighted sample count; intervals are only computed for the top ones
+        weighted: Dict[str, float] = {}
+        for stratum, stratum_labels in zip(strata, labels):
+            for label in stratum_labels:
+                weighted[label] = weighted.get(label, 0.0) + stratum.population / stratum.n
+        groups = []
+        for label in sorted(weighted, key=lambda l: -weighted[l])[:top]:
+            matches = [np.array([l == label for l in stratum_labels], dtype=bool) for stratum_labels in labels]
+            share = stratified_proportion(strata, matches)
+            error_matches = [m if err else np.zeros_like(m) for m, err in zip(matches, is_error)]
+            error_share = stratified_proportion(strata, error_matches)
+            groups.append({
+                group_by: label,
+                "share": rounded(share, 4),
+                "estimated_spans": int(round(share["estimate"] * population)),
+                "estimated_errors": int(round(error_share["estimate"] * population)),
+            })
+
+        return {
+            "status": "success",
+            "message": f"Estimated from {sum(s.n for s in strata)} sampled spans out of {population}",
+            "content": {
+                "population": {"spans": population, "errors": errors, "error_rate": round(errors / population, 4)},
+                "strata": len(strata_keys),
+                "sampled": sum(s.n for s in strata),
+                "duration_ms": {
+                    "mean": rounded(stratified_mean(strata)),
+                    "p50": rounded(weighted_quantile(strata, 0.5)),
+                    "p95": rounded(weighted_quantile(strata, 0.95)),
+                    "p99": rounded(weighted_quantile(strata, 0.99)),
+                },
+                "groups": groups,
+            }
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error sampling spans: {e}", "content": []}
@@ -1,12 +1,26 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from pydantic import Field
-from datadog_api_client import ApiClient
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import contextvars
+import json
+import time
+import numpy as np
+from utils.api_client import ApiClient, raw_configuration
 from datadog_api_client.v1.api.usage_metering_api import UsageMeteringApi
-from config import configuration
+from datadog_api_client.v2.api.usage_metering_api import UsageMeteringApi as UsageMeteringApiV2
+from config import configuration, FANOUT_MAX_WORKERS, USAGE_CHUNK_DAYS, USAGE_FINALIZE_DELAY, USAGE_RECENT_TTL
 from mcp.server.fastmcp import FastMCP
+from utils.forecast import fill_gaps, forecast_batch
+from utils.usage_store import AGGREGATIONS, HOUR, HourlyUsageTable, aggregate
 
 mcp = FastMCP("Datadog Usage Service")
 
+USAGE_PAGE_LIMIT = 500  # records per hourly usage page
+DEFAULT_PRODUCT_FAMILIES = ("infra_hosts", "indexed_logs", "ingested_spans", "indexed_spans", "timeseries")
+
+usage_table = HourlyUsageTable(USAGE_FINALIZE_DELAY, USAGE_RECENT_TTL)
+
 @mcp.tool()
 def get_hourly_usage(
     start_date: str = Field(..., description="The start date for hourly usage in YYYY-MM-DD format"),
@@ -32,3 +46,249 @@ def get_hourly_usage(
             return {"status": "success", "message": "Hourly usage retrieved successfully", "content": response.to_dict()}
     except Exception as e:
         return {"status": "error", "message": f"Error retrieving hourly usage: {e}"}
+
+
+def _hour(day: str) -> int:
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()) // HOUR
+
+
+def _fetch_usage_chunk(family: str, first_hour: int, end_hour: int) -> List[Tuple[int, str, float]]:
+    """Hourly measurements of one product family over [first_hour, end_hour), following pages.
+
+    Rows for the same hour and usage type (e.g. several regions) are added up.
+    """
+    totals: Dict[Tuple[int, str], float] = {}
+    cursor = None
+    with ApiClient(raw_configuration(configuration)) as api_client:
+        usage_api = UsageMeteringApiV2(api_client)
+        while True:
+            kwargs = {"filter_timestamp_end": datetime.fromtimestamp(end_hour * HOUR, tz=timezone.utc),
+                      "page_limit": USAGE_PAGE_LIMIT}
+            if cursor:
+                kwargs["page_next_record_id"] = cursor
+            response = json.loads(usage_api.get_hourly_usage(
+                datetime.fromtimestamp(first_hour * HOUR, tz=timezone.utc), family, **kwargs).data)
+            for item in response.get("data") or []:
+                attributes = item.get("attributes") or {}
+                hour = int(datetime.fromisoformat(attributes["timestamp"].replace("Z", "+00:00")).timestamp()) // HOUR
+                for measurement in attributes.get("measurements") or []:
+                    if measurement.get("value") is not None:
+                        key = (hour, measurement["usage_type"])
+                        totals[key] = totals.get(key, 0.0) + float(measurement["value"])
+            cursor = ((response.get("meta") or {}).get("pagination") or {}).get("next_record_id")
+            if not cursor:
+                return [(hour, usage_type, value) for (hour, usage_type), value in totals.items()]
+
+
+def backfill_usage(families: List[str], first_hour: int, end_hour: int) -> Dict[str, int]:
+    """Make the usage table current for the families over [first_hour, end_hour).
+
+    Only hours that were never fetched, or are recent enough to still change
+    and were not fetched within USAGE_RECENT_TTL, are requested, in chunks of
+    USAGE_CHUNK_DAYS fetched concurrently.
+    """
+    now = time.time()
+    chunk = USAGE_CHUNK_DAYS * 24
+    chunks = []
+    for family in families:
+        for start, end in usage_table.stale_ranges(family, first_hour, end_hour, now):
+            chunks.extend((family, s, min(s + chunk, end)) for s in range(start, end, chunk))
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(FANOUT_MAX_WORKERS, len(chunks)), thread_name_prefix="usage") as executor:
+            futures = [(c, executor.submit(contextvars.copy_context().run, _fetch_usage_chunk, *c)) for c in chunks]
+            for (family, start, end), future in futures:
+                usage_table.store(family, start, end, now, future.result())
+    fetched_hours = sum(end - start for _, start, end in chunks)
+    return {"requests": len(chunks), "hours_fetched": fetched_hours,
+            "hours_reused": len(families) * (end_hour - first_hour) - fetched_hours}
+
+@mcp.tool()
+def query_usage(
+    start_date: str = Field(..., description="First day of usage in YYYY-MM-DD format (UTC)"),
+    end_date: str = Field(..., description="Last day of usage, included, in YYYY-MM-DD format (UTC)"),
+    product_families: List[str] = Field(default=list(DEFAULT_PRODUCT_FAMILIES), description="Product families to include, e.g. 'infra_hosts', 'indexed_logs', 'ingested_spans'"),
+    group_by: str = Field(default="month", description="'usage_type' for one value per usage type over the range, or 'day' or 'month'"),
+    aggregation: str = Field(default="sum", description="How hourly values are combined: 'sum', 'avg' or 'max'"),
+    usage_types: Optional[List[str]] = Field(default=None, description="Only these usage types, e.g. 'agent_host_count'")
+) -> Dict[str, Any]:
+    """Aggregate hourly usage by usage type, day or month from a local hourly usage table.
+
+    Missing hours are backfilled in parallel date chunks; hours that are
+    final (fetched DATADOG_USAGE_FINALIZE_DELAY after they ended) are never
+    fetched again, so repeated questions over past months run locally.
+
+    Args:
+        start_date (str): First day of usage in YYYY-MM-DD format (UTC).
+        end_date (str): Last day of usage, included, in YYYY-MM-DD format (UTC).
+        product_families (List[str]): Product families to include.
+        group_by (str): 'usage_type', 'day' or 'month'. Default is 'month'.
+        aggregation (str): 'sum', 'avg' or 'max' of the hourly values. Default is 'sum'.
+        usage_types (Optional[List[str]]): Only these usage types.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): One row per "product_family/usage_type" with its value, or values per
+              period, largest first, and how many hours were fetched versus served locally"""
+    if group_by not in ("usage_type", "day", "month"):
+        return {"status": "error", "message": "group_by must be 'usage_type', 'day' or 'month'"}
+    if aggregation not in AGGREGATIONS:
+        return {"status": "error", "message": f"aggregation must be one of {', '.join(AGGREGATIONS)}"}
+    try:
+        first_hour = _hour(start_date)
+        end_hour = min(_hour(end_date) + 24, int(time.time()) // HOUR + 1)
+        if end_hour <= first_hour:
+            return {"status": "error", "message": "end_date must not be before start_date"}
+        fetch = backfill_usage(product_families, first_hour, end_hour)
+        names = usage_table.column_names(product_families)
+        if usage_types:
+            names = [name for name in names if name.split("/", 1)[1] in usage_types]
+        matrix = usage_table.matrix(names, first_hour, end_hour)
+        labels, values = aggregate(matrix, first_hour, None if group_by == "usage_type" else group_by, aggregation)
+        order = np.argsort(-np.nansum(values, axis=1), kind="stable")
+        rows = []
+        for row in order:
+            if group_by == "usage_type":
+                rows.append({"usage_type": names[row], "value": _value(values[row, 0])})
+            else:
+                rows.append({"usage_type": names[row],
+                             "values": {label: _value(v) for label, v in zip(labels, values[row]) if not np.isnan(v)}})
+        return {
+            "status": "success",
+            "message": f"Aggregated {len(names)} usage types over {end_hour - first_hour} hours",
+            "content": {"group_by": group_by, "aggregation": aggregation, "rows": rows, "fetch": fetch},
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error querying usage: {e}"}
+
+
+def _value(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 3)
+
+
+def _crossing(values: np.ndarray, days: np.ndarray, limit: float, period: str, aggregation: str) -> Optional[Dict[str, Any]]:
+    """First day (and period) where usage goes over a limit, from a daily series of actuals followed by forecast.
+
+    With a monthly limit, summed usage crosses on the day the month's running
+    total passes it; avg or max usage crosses in the first month whose value
+    is over the limit.
+    """
+    if period == "day":
+        over = np.flatnonzero(values > limit)
+        return {"date": str(days[over[0]]), "value": round(float(values[over[0]]), 3)} if len(over) else None
+    months = days.astype("datetime64[M]")
+    for month in np.unique(months):
+        month_values = values[months == month]
+        if aggregation == "sum":
+            running = np.cumsum(month_values)
+            over = np.flatnonzero(running > limit)
+            if len(over):
+                return {"date": str(days[months == month][over[0]]), "month": str(month),
+                        "value": round(float(running[-1]), 3)}
+        else:
+            value = month_values.max() if aggregation == "max" else month_values.mean()
+            if value > limit:
+                return {"date": str(days[months == month][0]), "month": str(month), "value": round(float(value), 3)}
+    return None
+
+@mcp.tool()
+def forecast_usage(
+    product_families: List[str] = Field(default=list(DEFAULT_PRODUCT_FAMILIES), description="Product families to forecast; host counts are in 'infra_hosts'"),
+    usage_types: Optional[List[str]] = Field(default=None, description="Only these usage types, e.g. 'agent_host_count'"),
+    history_days: int = Field(default=90, ge=21, le=730, description="Days of history the models are fitted on"),
+    horizon_days: int = Field(default=90, ge=1, le=365, description="Days to forecast"),
+    aggregation: str = Field(default="sum", description="How each day's hours are combined: 'sum' for volumes, 'max' or 'avg' for counts such as hosts"),
+    limits: Optional[Dict[str, float]] = Field(default=None, description="Commitment or quota per usage type, keyed 'product_family/usage_type' or 'usage_type'"),
+    limit_period: str = Field(default="month", description="'month' if limits apply to each calendar month, 'day' if to each day")
+) -> Dict[str, Any]:
+    """Forecast daily usage of many usage types at once and project when limits will be exceeded.
+
+    Daily series come from the local hourly usage table (backfilled as
+    needed). Two models are fitted in batch over all series with NumPy: a
+    linear trend with a weekday profile and additive Holt-Winters with weekly
+    seasonality over a grid of smoothing parameters; each series keeps the
+    model with the lower error on its last 14 days.
+
+    Args:
+        product_families (List[str]): Product families to forecast.
+        usage_types (Optional[List[str]]): Only these usage types.
+        history_days (int): Days of history the models are fitted on (21-730). Default is 90.
+        horizon_days (int): Days to forecast (1-365). Default is 90.
+        aggregation (str): 'sum', 'max' or 'avg' of the hours of each day. Default is 'sum'.
+        limits (Optional[Dict[str, float]]): Commitment or quota per usage type.
+        limit_period (str): 'month' or 'day'. Default is 'month'.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing:
+            - status (str): 'success' or 'error'
+            - message (str): Description of the operation result
+            - content (dict): Per usage type: chosen model, recent and forecast means, forecast per month
+              with an 80% interval and, when a limit is given, the projected and earliest dates it is exceeded"""
+    if aggregation not in AGGREGATIONS:
+        return {"status": "error", "message": f"aggregation must be one of {', '.join(AGGREGATIONS)}"}
+    if limit_period not in ("day", "month"):
+        return {"status": "error", "message": "limit_period must be 'day' or 'month'"}
+    try:
+        started = time.time()
+        end_hour = int(time.time()) // 86400 * 24  # Only complete days
+        first_hour = end_hour - history_days * 24
+        fetch = backfill_usage(product_families, first_hour, end_hour)
+        names = usage_table.column_names(product_families)
+        if usage_types:
+            names = [name for name in names if name.split("/", 1)[1] in usage_types]
+        _, daily = aggregate(usage_table.matrix(names, first_hour, end_hour), first_hour, "day", aggregation)
+        keep = [row for row in range(len(names)) if np.count_nonzero(~np.isnan(daily[row])) >= 14]
+        if not keep:
+            return {"status": "success", "message": "Not enough usage history to forecast", "content": {"series": [], "fetch": fetch}}
+        names, history = [names[row] for row in keep], fill_gaps(daily[keep])
+        first_day = first_hour // 24
+        days = (np.arange(first_day, first_day + history_days + horizon_days) * 86400).astype("datetime64[s]").astype("datetime64[D]")
+        phase = (np.arange(first_day, first_day + history_days + horizon_days) + 3) % 7  # 0 = Monday
+        result = forecast_batch(history, phase, horizon_days)
+        forecast = np.clip(result["forecast"], 0, None)
+        upper = forecast + result["interval"][:, np.newaxis]
+        future_days = days[history_days:]
+        months = future_days.astype("datetime64[M]")
+        fitted_in = round(time.time() - started, 3)
+
+        series = []
+        for row, name in enumerate(names):
+            by_month = {}
+            for month in np.unique(months):
+                mask = months == month
+                reduce = np.sum if aggregation == "sum" else np.max if aggregation == "max" else np.mean
+                by_month[str(month)] = {"forecast": round(float(reduce(forecast[row, mask])), 3),
+                                        "upper": round(float(reduce(upper[row, mask])), 3), "days": int(mask.sum())}
+            item = {
+                "usage_type": name,
+                "model": str(result["model"][row]),
+                "last_7_days_mean": round(float(history[row, -7:].mean()), 3),
+                "next_7_days_mean": round(float(forecast[row, :7].mean()), 3),
+                "horizon_end_value": round(float(forecast[row, -1]), 3),
+                "forecast_by_month": by_month,
+            }
+            limit = (limits or {}).get(name, (limits or {}).get(name.split("/", 1)[1]))
+            if limit is not None:
+                # The current month's actual days count towards a monthly limit
+                current = days[:history_days].astype("datetime64[M]") == months[0]
+                if limit_period == "day":
+                    current[:] = False
+                actual_days, actual = days[:history_days][current], history[row, current]
+                all_days = np.concatenate([actual_days, future_days])
+                item["limit"] = {
+                    "value": limit,
+                    "period": limit_period,
+                    "projected_breach": _crossing(np.concatenate([actual, forecast[row]]), all_days, limit, limit_period, aggregation),
+                    "earliest_breach": _crossing(np.concatenate([actual, upper[row]]), all_days, limit, limit_period, aggregation),
+                }
+            series.append(item)
+        series.sort(key=lambda s: (s.get("limit", {}).get("earliest_breach") is None, s["usage_type"]))
+        breaching = sum(1 for s in series if s.get("limit", {}).get("projected_breach"))
+        return {
+            "status": "success",
+            "message": f"Forecast {len(series)} usage types over {horizon_days} days; {breaching} projected to exceed their limit",
+            "content": {"series": series, "fetch": fetch, "compute_seconds": fitted_in},
+        }
+    except Exception as e:
+        return {"status": "error", "message": f"Error forecasting usage: {e}"}
@@ -1,6 +1,6 @@
 from typing import Optional, Dict, Any
 from pydantic import Field
-from datadog_api_client import ApiClient
+from utils.api_client import ApiClient
 from datadog_api_client.v2.api.users_api import UsersApi
 from config import configuration
 from mcp.server.fastmcp import FastMCP
@@ -0,0 +1,102 @@
+import warnings
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+from utils.timeseries import true_runs
+
+DETECTORS = ("zscore", "ewma", "seasonal")
+
+
+def _prefix(a: np.ndarray) -> np.ndarray:
+    return np.concatenate([np.zeros((a.shape[0], 1)), np.cumsum(a, axis=1)], axis=1)
+
+
+def rolling_zscore(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Score each point against the mean and std of the `window` points before it.
+
+    Works on a (series, time) matrix with NaN gaps using prefix sums, so the
+    cost is linear in the number of points whatever the window.
+    """
+    valid = ~np.isnan(matrix)
+    filled = np.where(valid, matrix, 0.0)
+    sums, squares, counts = _prefix(filled), _prefix(filled ** 2), _prefix(valid.astype(float))
+    idx = np.arange(matrix.shape[1])
+    lo = np.maximum(idx - window, 0)
+    n = counts[:, idx] - counts[:, lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (sums[:, idx] - sums[:, lo]) / n
+        var = np.maximum((squares[:, idx] - squares[:, lo]) / n - mean ** 2, 0.0)
+        std = np.maximum(np.sqrt(var), 1e-9 * (np.abs(mean) + 1))
+        scores = (matrix - mean) / std
+    scores[n < max(3, window // 2)] = np.nan
+    return scores
+
+
+def ewma_score(matrix: np.ndarray, window: int) -> np.ndarray:
+    """Score each point against an exponentially weighted mean/variance band built from earlier points.
+
+    The recursion runs over time but each step updates every series at once.
+    """
+    alpha = 2.0 / (window + 1)
+    rows, cols = matrix.shape
+    mean = np.full(rows, np.nan)
+    var = np.zeros(rows)
+    seen = np.zeros(rows)
+    scores = np.full((rows, cols), np.nan)
+    for t in range(cols):
+        x = matrix[:, t]
+        present = ~np.isnan(x)
+        diff = x - mean
+        ready = present & (seen >= window)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.maximum(np.sqrt(var), 1e-9 * (np.abs(mean) + 1))
+            scores[ready, t] = diff[ready] / std[ready]
+        update = present & ~np.isnan(mean)
+        var[update] = (1 - alpha) * (var[update] + alpha * diff[update] ** 2)
+        mean[update] += alpha * diff[update]
+        start = present & np.isnan(mean)
+        mean[start] = x[start]
+        seen += present
+    return scores
+
+
+def seasonal_residual_score(matrix: np.ndarray, lag: int) -> np.ndarray:
+    """Score each point by its difference from the point one season earlier, in robust (MAD) units."""
+    scores = np.full(matrix.shape, np.nan)
+    if lag <= 0 or lag >= matrix.shape[1]:
+        return scores
+    residual = matrix[:, lag:] - matrix[:, :-lag]
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        # Series with no overlap one season apart are all-NaN rows
+        warnings.simplefilter("ignore", RuntimeWarning)
+        center = np.nanmedian(residual, axis=1, keepdims=True)
+        mad = np.nanmedian(np.abs(residual - center), axis=1, keepdims=True) * 1.4826
+        scale = np.maximum(mad, 1e-9 * (np.abs(center) + 1))
+        scores[:, lag:] = (residual - center) / scale
+    return scores
+
+
+def combined_scores(matrix: np.ndarray, detectors: Iterable[str], window: int, season_lag: int):
+    """Run the chosen detectors and keep, per point, the score with the largest magnitude.
+
+    Returns (scores, winner) where winner holds the index into `detectors`
+    of the detector that produced each point's score.
+    """
+    detectors = list(detectors)
+    run = {
+        "zscore": lambda: rolling_zscore(matrix, window),
+        "ewma": lambda: ewma_score(matrix, window),
+        "seasonal": lambda: seasonal_residual_score(matrix, season_lag),
+    }
+    stacked = np.stack([run[name]() for name in detectors])
+    magnitude = np.where(np.isnan(stacked), -np.inf, np.abs(stacked))
+    winner = np.argmax(magnitude, axis=0)
+    scores = np.take_along_axis(stacked, winner[None], axis=0)[0]
+    return scores, winner
+
+
+def anomalous_intervals(scores: np.ndarray, threshold: float) -> List[Dict[str, Any]]:
+    """Return contiguous runs of |score| > threshold as (row, start, end) index ranges, end exclusive."""
+    flags = np.nan_to_num(np.abs(scores), nan=0.0) > threshold
+    return [{"row": row, "start": start, "end": end} for row, start, end in true_runs(flags)]
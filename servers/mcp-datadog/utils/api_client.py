@@ -0,0 +1,85 @@
+import copy
+import time
+
+from datadog_api_client import ApiClient as BaseApiClient
+from datadog_api_client.exceptions import ApiException
+
+from config import RETRY_MAX_ATTEMPTS
+from utils.hedging import hedger
+from utils.rate_limit import scheduler
+from utils.resilience import backoff_delay, breakers, is_idempotent, is_retriable, is_throttled
+
+
+def raw_configuration(configuration):
+    """Copy of `configuration` whose API calls return the raw HTTP response instead of SDK models.
+
+    Reading large responses with json.loads is an order of magnitude faster
+    than building a model object for every item.
+    """
+    raw = copy.deepcopy(configuration)
+    raw.preload_content = False
+    return raw
+
+
+class ApiClient(BaseApiClient):
+    """Datadog ApiClient whose requests all go through the shared rate-limit scheduler.
+
+    Requests that hit a 429 are queued until the rate-limit window resets and
+    sent again instead of being surfaced to the tool as an error. Idempotent
+    requests that fail transiently are retried with jittered backoff, and an
+    endpoint whose circuit breaker is open fails fast with CircuitOpenError.
+    Idempotent requests made by read-only tools may also be hedged.
+    """
+
+    def call_api(self, resource_path, method, *args, **kwargs):
+        endpoint = f"{method} {resource_path}"
+        idempotent = is_idempotent(method, resource_path)
+        max_attempts = RETRY_MAX_ATTEMPTS if idempotent else 1
+        attempt = 1
+        while True:
+            breakers.before_call(endpoint)
+            try:
+                if idempotent:
+                    result = hedger.call(
+                        endpoint, lambda: self._scheduled_call(endpoint, resource_path, method, *args, **kwargs)
+                    )
+                else:
+                    result = self._scheduled_call(endpoint, resource_path, method, *args, **kwargs)
+            except Exception as e:
+                if is_throttled(e):
+                    # The scheduler already waited as long as allowed for the rate-limit window
+                    breakers.record_throttled(endpoint)
+                    raise
+                breakers.record_failure(endpoint, e)
+                if attempt >= max_attempts or not is_retriable(e):
+                    raise
+                breakers.record_retry(endpoint)
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            breakers.record_success(endpoint)
+            return result
+
+    def _scheduled_call(self, endpoint, resource_path, method, *args, **kwargs):
+        data_only = kwargs.pop("return_http_data_only", None)
+        deadline = time.monotonic() + scheduler.max_wait
+        while True:
+            bucket = scheduler.acquire(endpoint)
+            try:
+                result = super().call_api(resource_path, method, *args, return_http_data_only=False, **kwargs)
+            except ApiException as e:
+                scheduler.release(bucket, endpoint, e.status or 0, e.headers)
+                if e.status == 429 and time.monotonic() < deadline:
+                    continue
+                raise
+            except Exception:
+                scheduler.release(bucket, endpoint, 0, None)
+                raise
+
+            if isinstance(result, tuple):
+                data, status, headers = result
+                scheduler.release(bucket, endpoint, status, headers)
+                return data if data_only else result
+            # preload_content=False hands back the raw urllib3 response
+            scheduler.release(bucket, endpoint, result.status, result.headers)
+            return result
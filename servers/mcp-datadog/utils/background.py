@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundValue(Generic[T]):
+    """A value that is rebuilt in a background thread once it is older than `max_age`.
+
+    The first get() builds the value in the caller's thread; callers arriving
+    while a build is in progress wait for it instead of starting their own.
+    After that get() always answers with the value in hand and, when it is stale, starts at most
+    one rebuild in the background. A failed rebuild keeps the previous value.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], T], max_age: float):
+        self.name = name
+        self.loader = loader
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._built = threading.Condition(self._lock)
+        self._value: Optional[T] = None
+        self._built_at = 0.0
+        self._refreshing = False
+        self._last_error: Optional[str] = None
+
+    def _build(self, reraise: bool = False) -> Optional[T]:
+        try:
+            value = self.loader()
+        except Exception as e:
+            logger.warning("Build of %s failed: %s", self.name, e)
+            with self._lock:
+                self._last_error = str(e)
+                self._refreshing = False
+                self._built.notify_all()
+            if reraise:
+                raise
+            return None
+        with self._lock:
+            self._value, self._built_at = value, time.time()
+            self._last_error = None
+            self._refreshing = False
+            self._built.notify_all()
+        return value
+
+    def get(self, wait: bool = True) -> Optional[T]:
+        """Return the current value, refreshing it in the background when stale.
+
+        With wait=False a missing value is built in the background as well
+        and None is returned instead of blocking.
+        """
+        with self._lock:
+            while wait and self._value is None and self._refreshing:
+                self._built.wait()
+            value, stale = self._value, time.time() - self._built_at > self.max_age
+            start = stale and not self._refreshing
+            if start:
+                self._refreshing = True
+        if start and value is None and wait:
+            return self._build(reraise=True)
+        if start:
+            threading.Thread(target=self._build, name=f"refresh-{self.name}", daemon=True).start()
+        return value
+
+    def refresh(self) -> T:
+        """Rebuild now in the caller's thread."""
+        value = self.loader()
+        with self._lock:
+            self._value, self._built_at = value, time.time()
+        return value
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "built_at": int(self._built_at) if self._value is not None else None,
+                "age_seconds": round(time.time() - self._built_at, 1) if self._value is not None else None,
+                "refreshing": self._refreshing,
+                "last_error": self._last_error,
+            }
@@ -0,0 +1,66 @@
+import operator
+import re
+from typing import Any, Dict
+
+import numpy as np
+
+_MONITOR_QUERY = re.compile(
+    r"^\s*(?P<aggregation>avg|sum|min|max)\(last_(?P<amount>\d+)(?P<unit>[mhdw])\):"
+    r"(?P<query>.+?)\s*(?P<comparator>>=|<=|>|<)\s*(?P<threshold>-?\d+(?:\.\d+)?)\s*$"
+)
+_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+_COMPARATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+def parse_monitor_query(text: str) -> Dict[str, Any]:
+    """Split a metric monitor query like 'avg(last_5m):avg:system.cpu.user{*} by {host} > 90'.
+
+    Only the time aggregations a metric alert evaluates over raw values
+    (avg, sum, min, max) are supported; raises ValueError otherwise.
+    """
+    match = _MONITOR_QUERY.match(text)
+    if not match:
+        raise ValueError(
+            "unsupported monitor query; expected '<avg|sum|min|max>(last_<n><m|h|d|w>):<metric query> <comparator> <threshold>'"
+        )
+    return {
+        "aggregation": match["aggregation"],
+        "window_seconds": int(match["amount"]) * _UNITS[match["unit"]],
+        "query": match["query"],
+        "comparator": match["comparator"],
+        "threshold": float(match["threshold"]),
+    }
+
+
+def rolling_aggregate(matrix: np.ndarray, points: int, aggregation: str) -> np.ndarray:
+    """Aggregate each point with the `points - 1` points before it, ignoring gaps.
+
+    avg and sum use prefix sums; min and max fold the window one shift at a
+    time, so memory stays at a few copies of the matrix for any window.
+    """
+    valid = ~np.isnan(matrix)
+    if aggregation in ("avg", "sum"):
+        filled = np.where(valid, matrix, 0.0)
+        zeros = np.zeros((matrix.shape[0], 1))
+        sums = np.concatenate([zeros, np.cumsum(filled, axis=1)], axis=1)
+        counts = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+        idx = np.arange(1, matrix.shape[1] + 1)
+        lo = np.maximum(idx - points, 0)
+        total = sums[:, idx] - sums[:, lo]
+        n = counts[:, idx] - counts[:, lo]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = total / n if aggregation == "avg" else total
+        result[n == 0] = np.nan
+        return result
+
+    fold = np.fmax if aggregation == "max" else np.fmin
+    result = matrix.copy()
+    for shift in range(1, min(points, matrix.shape[1])):
+        result[:, shift:] = fold(result[:, shift:], matrix[:, :-shift])
+    return result
+
+
+def breaches(values: np.ndarray, comparator: str, threshold: float) -> np.ndarray:
+    """Points whose aggregated value crosses the threshold; gaps never breach."""
+    with np.errstate(invalid="ignore"):
+        return _COMPARATORS[comparator](values, threshold) & ~np.isnan(values)
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.timeseries import true_runs
+
+# Multi-window, multi-burn-rate alert rules: (long window, short window, share of the
+# period's error budget the long window may consume, severity). The burn-rate threshold
+# is share * period / long window, i.e. 14.4 / 6 / 3 / 1 for a 30-day SLO.
+BURN_RULES: List[Tuple[int, int, float, str]] = [
+    (3600, 300, 0.02, "page"),
+    (21600, 1800, 0.05, "page"),
+    (86400, 7200, 0.10, "ticket"),
+    (259200, 21600, 0.10, "ticket"),
+]
+
+TIMEFRAME_SECONDS = {"7d": 7 * 86400, "30d": 30 * 86400, "90d": 90 * 86400}
+
+
+def window_sums(times: np.ndarray, values: np.ndarray, window: float) -> np.ndarray:
+    """Sum of values over the trailing `window` seconds ending at every point, from one cumulative sum."""
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    starts = np.searchsorted(times, times - window, side="right")
+    return cumulative[1:] - cumulative[starts]
+
+
+def burn_series(times: np.ndarray, bad: np.ndarray, total: np.ndarray, window: float, budget: float) -> np.ndarray:
+    """Burn rate at every point: error ratio over the trailing window divided by the error budget. NaN without traffic."""
+    bad_sum, total_sum = window_sums(times, bad, window), window_sums(times, total, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total_sum > 0, bad_sum / total_sum / budget, np.nan)
+
+
+def evaluate_burn(times: np.ndarray, good: np.ndarray, total: np.ndarray, target: float,
+                  period: float) -> Dict[str, Any]:
+    """Error budget and burn-rate alert state of an SLO from per-interval good and total counts.
+
+    `target` is the SLO target in percent and `period` its timeframe in
+    seconds; counts should cover the period. Each rule fires where both its
+    long and short window burn above the threshold; a rule is only
+    evaluated once a full long window of data is available.
+    """
+    budget = 1 - target / 100.0
+    bad = np.clip(total - good, 0, None)
+    good_total, total_sum, bad_sum = float(good.sum()), float(total.sum()), float(bad.sum())
+    remaining = 1 - bad_sum / (budget * total_sum) if total_sum > 0 and budget > 0 else None
+
+    rules = []
+    for long_window, short_window, share, severity in BURN_RULES:
+        threshold = share * period / long_window
+        long_burn = burn_series(times, bad, total, long_window, budget)
+        short_burn = burn_series(times, bad, total, short_window, budget)
+        firing = (long_burn >= threshold) & (short_burn >= threshold) & (times >= times[0] + long_window)
+        intervals = [(int(times[start]), int(times[end - 1])) for _, start, end in true_runs(firing[np.newaxis, :])]
+        rules.append({
+            "long_window_seconds": long_window,
+            "short_window_seconds": short_window,
+            "threshold": round(threshold, 3),
+            "severity": severity,
+            "long_burn": _rounded(long_burn[-1]),
+            "short_burn": _rounded(short_burn[-1]),
+            "firing": bool(firing[-1]),
+            "fired_count": len(intervals),
+            "recent_firings": [{"start": s, "end": e} for s, e in intervals[-5:]],
+        })
+    firing = [rule for rule in rules if rule["firing"]]
+    return {
+        "sli": round(good_total / total_sum * 100, 5) if total_sum > 0 else None,
+        "good": good_total,
+        "total": total_sum,
+        "error_budget_remaining_pct": round(remaining * 100, 3) if remaining is not None else None,
+        "alert": "page" if any(r["severity"] == "page" for r in firing) else "ticket" if firing else None,
+        "rules": rules,
+    }
+
+
+def exhaustion_eta(remaining_pct: Optional[float], burn: Optional[float], period: float) -> Optional[float]:
+    """Seconds until the error budget is gone if the current burn rate holds; None if it is not burning."""
+    if remaining_pct is None or burn is None or burn <= 0:
+        return None
+    return max(0.0, remaining_pct / 100.0 * period / burn)
+
+
+def _rounded(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 3)
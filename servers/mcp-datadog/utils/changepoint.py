@@ -0,0 +1,74 @@
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def noise_scale(values: np.ndarray) -> float:
+    """Robust estimate of a series' point-to-point noise, insensitive to level shifts."""
+    if len(values) < 3:
+        return 0.0
+    diffs = np.diff(values)
+    mad = float(np.median(np.abs(diffs - np.median(diffs))))
+    scale = mad / (0.6745 * math.sqrt(2))
+    return scale if scale > 0 else float(np.std(diffs)) / math.sqrt(2)
+
+
+def _best_split(values: np.ndarray, min_size: int):
+    """Return (split, gain) maximising the between-segment sum of squares, or None."""
+    n = len(values)
+    if n < 2 * min_size:
+        return None
+    csum = np.cumsum(values)
+    left = np.arange(min_size, n - min_size + 1)
+    left_mean = csum[left - 1] / left
+    right_mean = (csum[-1] - csum[left - 1]) / (n - left)
+    gain = left * (n - left) / n * (left_mean - right_mean) ** 2
+    best = int(np.argmax(gain))
+    return int(left[best]), float(gain[best])
+
+
+def binary_segmentation(values: np.ndarray, min_size: int = 3, max_changes: int = 5,
+                        threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Detect mean shifts in a series by greedy binary segmentation.
+
+    Each step splits the segment whose best split explains the most variance,
+    as long as that gain, measured in units of the series' noise variance,
+    exceeds `threshold` (3·ln(n) by default). Returns the change points in
+    time order with the index of the first point after the shift, the mean
+    on either side of it and the normalised score.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    sigma = noise_scale(values)
+    if n < 2 * min_size or sigma <= 0:
+        return []
+    threshold = 3 * math.log(n) if threshold is None else threshold
+
+    segments = [(0, n)]
+    splits: List[int] = []
+    scores: Dict[int, float] = {}
+    while len(splits) < max_changes:
+        best = None
+        for seg_index, (start, end) in enumerate(segments):
+            found = _best_split(values[start:end], min_size)
+            if found and (best is None or found[1] > best[2]):
+                best = (seg_index, start + found[0], found[1])
+        if best is None or best[2] / sigma ** 2 <= threshold:
+            break
+        seg_index, split, gain = best
+        start, end = segments.pop(seg_index)
+        segments[seg_index:seg_index] = [(start, split), (split, end)]
+        splits.append(split)
+        scores[split] = gain / sigma ** 2
+
+    bounds = [0] + sorted(splits) + [n]
+    changes = []
+    for i, split in enumerate(bounds[1:-1], start=1):
+        changes.append({
+            "index": split,
+            "before": float(values[bounds[i - 1]:split].mean()),
+            "after": float(values[split:bounds[i + 1]].mean()),
+            "score": round(scores[split], 2),
+        })
+    return changes
@@ -0,0 +1,258 @@
+import fnmatch
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from dateutil.rrule import rrulestr
+
+from utils.interval_tree import IntervalTree
+
+INFINITY = float("inf")
+
+# A downtime targets one monitor or every monitor carrying a set of tags, within a scope
+Key = Tuple[str, Tuple[str, ...], str]
+
+_DURATION = re.compile(r"^(\d+)([mhdw])$")
+_DURATION_SECONDS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+_TERM_SPLIT = re.compile(r"\s+AND\s+|,")
+
+
+def downtime_key(record: Dict[str, Any]) -> Key:
+    if record.get("monitor_id") is not None:
+        return ("monitor", (str(record["monitor_id"]),), record["scope"])
+    return ("tags", tuple(sorted(record.get("monitor_tags") or ["*"])), record["scope"])
+
+
+def _parse_time(value: Optional[str], tz: timezone) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=tz)
+
+
+def schedule_intervals(schedule: Dict[str, Any], now: float, window: float) -> List[Tuple[float, float]]:
+    """Epoch [start, end) intervals of a v2 downtime schedule; recurrences are expanded within `window` seconds of now.
+
+    An open-ended one-time downtime ends at infinity.
+    """
+    tz = ZoneInfo(schedule.get("timezone") or "UTC")
+    if "recurrences" not in schedule:
+        start, end = _parse_time(schedule.get("start"), tz), _parse_time(schedule.get("end"), tz)
+        return [(start.timestamp() if start else now, end.timestamp() if end else INFINITY)]
+    intervals = set()
+    current = schedule.get("current_downtime") or {}
+    if current.get("start"):
+        end = _parse_time(current.get("end"), tz)
+        intervals.add((_parse_time(current["start"], tz).timestamp(), end.timestamp() if end else INFINITY))
+    for recurrence in schedule["recurrences"]:
+        match = _DURATION.match(recurrence.get("duration") or "")
+        if not match or not recurrence.get("rrule"):
+            continue
+        duration = int(match.group(1)) * _DURATION_SECONDS[match.group(2)]
+        start = _parse_time(recurrence.get("start"), tz) or datetime.fromtimestamp(now, tz)
+        rule = rrulestr(recurrence["rrule"], dtstart=start)
+        lo = datetime.fromtimestamp(now - window - duration, tz)
+        hi = datetime.fromtimestamp(now + window, tz)
+        for occurrence in rule.between(lo, hi, inc=True):
+            intervals.add((occurrence.timestamp(), (occurrence + timedelta(seconds=duration)).timestamp()))
+    return sorted(intervals)
+
+
+def parse_scope(scope: str) -> Optional[List[Tuple[bool, str, List[str]]]]:
+    """Split a downtime scope into (negated, tag key, allowed values) terms joined by AND.
+
+    Returns [] for "*" (everything) and None for syntax this does not
+    understand, such as a top-level OR.
+    """
+    scope = (scope or "*").strip()
+    if scope == "*":
+        return []
+    terms = []
+    for term in _TERM_SPLIT.split(scope):
+        term = term.strip()
+        negated = term.startswith("-") or term.upper().startswith("NOT ")
+        term = term[1:] if term.startswith("-") else term[4:] if negated else term
+        key, _, value = term.partition(":")
+        value = value.strip()
+        if value.startswith("(") and value.endswith(")"):
+            values = [v.strip() for v in re.split(r"\s+OR\s+", value[1:-1])]
+        else:
+            values = [value]
+        if not key or " " in key or not all(values) or any(" " in v for v in values):
+            return None
+        terms.append((negated, key, values))
+    return terms
+
+
+def scope_matches(scope: str, group: Iterable[str]) -> Optional[bool]:
+    """Whether a monitor group, given as "key:value" tags, is inside a downtime scope; None if the scope is not understood."""
+    terms = parse_scope(scope)
+    if terms is None:
+        return None
+    tags: Dict[str, Set[str]] = {}
+    for tag in group:
+        key, _, value = tag.strip().partition(":")
+        tags.setdefault(key, set()).add(value)
+    for negated, key, values in terms:
+        hit = any(fnmatch.fnmatchcase(tag_value, value) for tag_value in tags.get(key, ()) for value in values)
+        if hit == negated:
+            return False
+    return True
+
+
+def scopes_overlap(a: str, b: str) -> bool:
+    """Whether two scopes can both contain some group: False only when they pin one tag key to disjoint literal values."""
+    return terms_overlap(parse_scope(a), parse_scope(b))
+
+
+def terms_overlap(terms_a: Optional[List[Tuple[bool, str, List[str]]]],
+                  terms_b: Optional[List[Tuple[bool, str, List[str]]]]) -> bool:
+    """scopes_overlap on scopes already split by parse_scope."""
+    if not terms_a or not terms_b:
+        return True
+    pinned_b = {key: set(values) for negated, key, values in terms_b if not negated}
+    for negated, key, values in terms_a:
+        if negated or key not in pinned_b:
+            continue
+        if any("*" in v or "?" in v for v in list(values) + list(pinned_b[key])):
+            continue
+        if not set(values) & pinned_b[key]:
+            return False
+    return True
+
+
+def targets_monitor(key: Key, monitor_id: Optional[int], monitor_tags: Iterable[str]) -> bool:
+    """Whether downtimes stored under `key` apply to a monitor with this id and tags."""
+    kind, target, _ = key
+    if kind == "monitor":
+        return monitor_id is not None and target[0] == str(monitor_id)
+    return target == ("*",) or set(target) <= set(monitor_tags)
+
+
+class DowntimeIndex:
+    """Downtimes held as one interval tree per (target, scope) key, plus one tree across all keys.
+
+    apply() diffs incoming records against the stored ones and rebuilds only
+    the trees of keys whose downtimes changed, so a refresh with no changes
+    costs one dictionary comparison per downtime. Keys are also indexed by
+    monitor id and by one of their tags, so coverage checks only look at
+    keys that can target the monitor, and each key keeps its parsed scope.
+    Conflict checks query the tree across keys and filter only its hits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._members: Dict[Key, Set[str]] = {}
+        self._trees: Dict[Key, IntervalTree] = {}
+        self._terms: Dict[Key, Optional[List[Tuple[bool, str, List[str]]]]] = {}
+        self._by_monitor: Dict[str, Set[Key]] = {}
+        self._by_tag: Dict[str, Set[Key]] = {}  # tag targets, under their first tag; "*" for every monitor
+        self._all = IntervalTree([])  # (start, end, (key, downtime_id)) across every key
+
+    def apply(self, records: Iterable[Dict[str, Any]], complete: bool = False) -> int:
+        """Insert or replace downtimes; with `complete`, downtimes missing from `records` are dropped. Returns the change count."""
+        changed = 0
+        with self._lock:
+            dirty: Set[Key] = set()
+            seen = set()
+            for record in records:
+                seen.add(record["id"])
+                old = self.records.get(record["id"])
+                if old == record:
+                    continue
+                if old is not None:
+                    self._forget(old, dirty)
+                self.records[record["id"]] = record
+                key = downtime_key(record)
+                self._members.setdefault(key, set()).add(record["id"])
+                dirty.add(key)
+                changed += 1
+            if complete:
+                for downtime_id in [i for i in self.records if i not in seen]:
+                    self._forget(self.records.pop(downtime_id), dirty)
+                    changed += 1
+            self._rebuild(dirty)
+        return changed
+
+    def remove(self, downtime_id: str) -> bool:
+        with self._lock:
+            record = self.records.pop(downtime_id, None)
+            if record is None:
+                return False
+            dirty: Set[Key] = set()
+            self._forget(record, dirty)
+            self._rebuild(dirty)
+            return True
+
+    def _forget(self, record: Dict[str, Any], dirty: Set[Key]) -> None:
+        key = downtime_key(record)
+        self._members.get(key, set()).discard(record["id"])
+        dirty.add(key)
+
+    def _lookup(self, key: Key) -> Dict[str, Set[Key]]:
+        return self._by_monitor if key[0] == "monitor" else self._by_tag
+
+    def _rebuild(self, keys: Set[Key]) -> None:
+        if not keys:
+            return
+        for key in keys:
+            members = self._members.get(key)
+            lookup = self._lookup(key)
+            if not members:
+                self._members.pop(key, None)
+                self._trees.pop(key, None)
+                self._terms.pop(key, None)
+                bucket = lookup.get(key[1][0])
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del lookup[key[1][0]]
+                continue
+            self._trees[key] = IntervalTree([
+                (start, end, downtime_id)
+                for downtime_id in members
+                for start, end in self.records[downtime_id]["intervals"]
+            ])
+            self._terms[key] = parse_scope(key[2])
+            lookup.setdefault(key[1][0], set()).add(key)
+        self._all = IntervalTree([(start, end, (key, downtime_id))
+                                  for key, members in self._members.items()
+                                  for downtime_id in members
+                                  for start, end in self.records[downtime_id]["intervals"]])
+
+    def covering(self, at: float, monitor_id: Optional[int], monitor_tags: Iterable[str]) -> List[Tuple[Dict[str, Any], float, float]]:
+        """(downtime, start, end) of every downtime applying to the monitor that is in effect at `at`."""
+        monitor_tags = list(monitor_tags)
+        with self._lock:
+            keys = set(self._by_tag.get("*", ()))
+            for tag in monitor_tags:
+                keys |= self._by_tag.get(tag, set())
+            if monitor_id is not None:
+                keys |= self._by_monitor.get(str(monitor_id), set())
+            return [(self.records[downtime_id], start, end)
+                    for key in keys if targets_monitor(key, monitor_id, monitor_tags)
+                    for start, end, downtime_id in self._trees[key].at(at)]
+
+    def overlapping(self, key: Key, start: float, end: float) -> List[Tuple[Dict[str, Any], float, float]]:
+        """(downtime, start, end) of downtimes whose target overlaps the key's and whose scope and time overlap it."""
+        kind, target, scope = key
+        terms = parse_scope(scope)
+        with self._lock:
+            return [(self.records[downtime_id], s, e)
+                    for s, e, (other, downtime_id) in self._all.overlapping(start, end)
+                    if self._targets_overlap((kind, target), other[:2]) and terms_overlap(terms, self._terms[other])]
+
+    @staticmethod
+    def _targets_overlap(a: Tuple[str, Tuple[str, ...]], b: Tuple[str, Tuple[str, ...]]) -> bool:
+        # A tag target may include any monitor, so it can overlap with everything but a different monitor id
+        if a[0] == "monitor" and b[0] == "monitor":
+            return a[1] == b[1]
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"downtimes": len(self.records), "keys": len(self._trees),
+                    "intervals": sum(len(tree) for tree in self._trees.values())}
@@ -0,0 +1,78 @@
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class _QueryRing:
+    def __init__(self):
+        self.order: List[Tuple[int, str]] = []  # (timestamp_ms, event_id), ascending
+        self.events: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self.covered: Optional[Tuple[int, int]] = None  # every matching event in [start, end) is held
+
+
+class EventRing:
+    """Bounded local copy of recently streamed events, kept per query.
+
+    Besides the events themselves each query records the time range it holds
+    completely, so a request inside that range can be answered without
+    calling Datadog. When the ring is full the oldest events are dropped and
+    the covered range shrinks accordingly.
+    """
+
+    def __init__(self, capacity: int, max_queries: int):
+        self.capacity = capacity
+        self.max_queries = max_queries
+        self._lock = threading.Lock()
+        self._rings: "OrderedDict[str, _QueryRing]" = OrderedDict()
+
+    def _ring(self, query: str) -> _QueryRing:
+        ring = self._rings.get(query)
+        if ring is None:
+            ring = self._rings[query] = _QueryRing()
+            while len(self._rings) > self.max_queries:
+                self._rings.popitem(last=False)
+        self._rings.move_to_end(query)
+        return ring
+
+    def covers(self, query: str, start_ms: int, end_ms: int) -> bool:
+        with self._lock:
+            ring = self._rings.get(query)
+            return bool(ring and ring.covered and ring.covered[0] <= start_ms and end_ms <= ring.covered[1])
+
+    def resume_from(self, query: str, start_ms: int) -> int:
+        """Where fetching must start so that, with what is held, [start_ms, ...) is complete."""
+        with self._lock:
+            ring = self._rings.get(query)
+            if ring and ring.covered and ring.covered[0] <= start_ms <= ring.covered[1]:
+                return ring.covered[1]
+            return start_ms
+
+    def add(self, query: str, events: List[Tuple[int, str, Dict[str, Any]]], fetched_from: int, fetched_to: int) -> None:
+        """Store events fetched completely for [fetched_from, fetched_to)."""
+        with self._lock:
+            ring = self._ring(query)
+            if ring.covered and ring.covered[0] <= fetched_from <= ring.covered[1]:
+                ring.covered = (ring.covered[0], max(ring.covered[1], fetched_to))
+            else:
+                # Not contiguous with what is held; start over from this fetch
+                ring.order, ring.events = [], {}
+                ring.covered = (fetched_from, fetched_to)
+            for ts, event_id, event in events:
+                if event_id in ring.events:
+                    continue
+                ring.events[event_id] = (ts, event)
+                bisect.insort(ring.order, (ts, event_id))
+            while len(ring.order) > self.capacity:
+                ts, event_id = ring.order.pop(0)
+                del ring.events[event_id]
+                ring.covered = (max(ring.covered[0], ts + 1), ring.covered[1])
+
+    def read(self, query: str, start_ms: int, end_ms: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+        with self._lock:
+            ring = self._rings.get(query)
+            if ring is None:
+                return []
+            lo = bisect.bisect_left(ring.order, (start_ms, ""))
+            hi = bisect.bisect_left(ring.order, (end_ms, ""))
+            return [(ts, event_id, ring.events[event_id][1]) for ts, event_id in ring.order[lo:hi]]
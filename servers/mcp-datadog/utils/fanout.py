@@ -0,0 +1,89 @@
+import contextvars
+import heapq
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Tuple
+
+from config import FANOUT_MAX_WINDOWS, FANOUT_MAX_WORKERS
+
+Window = Tuple[int, int]
+
+
+def iso8601(epoch_seconds: float) -> str:
+    """Format epoch seconds the way the v2 search APIs expect their 'from'/'to' bounds."""
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def plan_windows(from_time: int, to_time: int, estimated_count: float, limit: int, per_window: int,
+                 descending: bool, max_windows: int = FANOUT_MAX_WINDOWS) -> List[Window]:
+    """Plan sub-windows expected to hold the first `limit` results in sort order.
+
+    Assuming results are spread evenly over the range, only the leading
+    share expected to contain `limit` results (plus a 25% margin) is split
+    into windows of about `per_window` results. The rest of the range
+    becomes one trailing window, read only if the estimate was too high.
+    Adjacent windows share their boundary second, since the search APIs
+    treat both bounds as inclusive; fan_out drops the duplicates.
+    """
+    span = to_time - from_time
+    if span <= 0 or estimated_count <= 0:
+        return [(from_time, to_time)]
+    lead = min(span, max(1, math.ceil(span * 1.25 * limit / estimated_count)))
+    count = max(1, min(max_windows, lead, math.ceil(min(estimated_count, limit) / per_window)))
+    lead_start = to_time - lead if descending else from_time
+    edges = [lead_start + lead * i // count for i in range(count)] + [lead_start + lead]
+    windows = [(edges[i], edges[i + 1]) for i in range(count)]
+    if lead < span:
+        windows.append((from_time, lead_start) if descending else (lead_start + lead, to_time))
+    return windows
+
+
+def fan_out(windows: List[Window], fetch: Callable[[int, int, int, threading.Event], List[Any]], limit: int,
+            key: Callable[[Any], Any], ident: Callable[[Any], Any], descending: bool) -> List[Any]:
+    """Fetch windows concurrently and k-way merge their results in sort order.
+
+    `fetch(start, end, limit, stop)` must return the window's results
+    already sorted, and should return early once `stop` is set. Windows are
+    started in sort order with at most FANOUT_MAX_WORKERS in flight, and no
+    further window is started once the windows that sort first hold `limit`
+    distinct results between them; windows still running then are told to stop.
+    Results on a shared window boundary are merged once, by `ident`.
+    """
+    ordered = sorted(windows, reverse=descending)
+    workers = max(1, min(FANOUT_MAX_WORKERS, len(ordered)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fanout")
+    stop = threading.Event()
+
+    def submit(window: Window):
+        return executor.submit(contextvars.copy_context().run, fetch, window[0], window[1], limit, stop)
+
+    try:
+        futures = [submit(window) for window in ordered[:workers]]
+        results: List[List[Any]] = []
+        # Distinct ids, so results repeated on a window boundary do not count twice
+        collected = set()
+        for i in range(len(ordered)):
+            page = futures[i].result()
+            results.append(page)
+            collected.update(ident(item) for item in page)
+            if len(collected) >= limit:
+                break
+            if i + workers < len(ordered):
+                futures.append(submit(ordered[i + workers]))
+    finally:
+        # Windows still in flight are no longer needed; they exit at their next page
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+    seen = set()
+    merged = []
+    for item in heapq.merge(*results, key=key, reverse=descending):
+        item_id = ident(item)
+        if item_id in seen:
+            continue
+        seen.add(item_id)
+        merged.append(item)
+        if len(merged) >= limit:
+            break
+    return merged
@@ -0,0 +1,73 @@
+import hashlib
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_UUID = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b")
+_HEX = re.compile(r"\b(?:0x[0-9a-f]+|[0-9a-f]*\d[0-9a-f]*[a-f][0-9a-f]*|[0-9a-f]*[a-f][0-9a-f]*\d[0-9a-f]*)\b")
+_IP = re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_SPACE = re.compile(r"\s+")
+_FRAME = re.compile(r"^(?:at |file |\S+\.(?:go|js|ts|rb|php|cs|java|kt|scala|py)\b|[\w$.]+\.[\w$<>]+\(.*\)$)")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase text and replace the parts that vary between repeats (ids, hex, IPs, numbers)."""
+    if not text:
+        return ""
+    text = text.lower()
+    text = _UUID.sub("<uuid>", text)
+    text = _IP.sub("<ip>", text)
+    text = _HEX.sub(lambda m: "<hex>" if len(m.group()) >= 6 else m.group(), text)
+    text = _NUMBER.sub("<n>", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def normalize_stack(stack: Optional[str], frames: int = 3) -> List[str]:
+    """Normalized stack frame lines, keeping the outermost and innermost `frames` of each.
+
+    Lines that do not look like frames (messages, 'Traceback', '...') are
+    dropped, so the same failure from different requests gives the same list
+    whatever the language's frame order.
+    """
+    if not stack:
+        return []
+    lines = [normalize_text(line) for line in stack.splitlines()]
+    found = [line for line in lines if _FRAME.match(line)]
+    return found if len(found) <= 2 * frames else found[:frames] + found[-frames:]
+
+
+def fingerprint(*parts: Any) -> str:
+    """Short stable hash of already-normalized parts."""
+    digest = hashlib.sha1("\x1f".join(str(p) for p in parts).encode()).hexdigest()
+    return digest[:12]
+
+
+def group_by_fingerprint(items: Iterable[Any], key: Callable[[Any], str], timestamp: Callable[[Any], float],
+                         bucket_seconds: int = 0) -> List[Dict[str, Any]]:
+    """Group items by fingerprint and, optionally, fixed time bucket.
+
+    Returns one row per group with count, first/last seen (epoch seconds) and
+    the first item seen as exemplar, largest groups first.
+    """
+    groups: Dict[Any, Dict[str, Any]] = {}
+    for item in items:
+        ts = timestamp(item)
+        fp = key(item)
+        bucket = int(ts // bucket_seconds * bucket_seconds) if bucket_seconds else None
+        group = groups.get((fp, bucket))
+        if group is None:
+            groups[(fp, bucket)] = {
+                "fingerprint": fp,
+                "bucket_start": bucket,
+                "count": 1,
+                "first_seen": ts,
+                "last_seen": ts,
+                "exemplar": item,
+            }
+            continue
+        group["count"] += 1
+        if ts < group["first_seen"]:
+            group["first_seen"] = ts
+        if ts > group["last_seen"]:
+            group["last_seen"] = ts
+    return sorted(groups.values(), key=lambda g: (-g["count"], g["first_seen"]))
@@ -0,0 +1,97 @@
+import itertools
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Smoothing parameters tried for every series at once: (alpha, beta, gamma)
+HW_GRID = np.array(list(itertools.product((0.1, 0.3, 0.6), (0.0, 0.05, 0.2), (0.05, 0.2, 0.5))))
+
+
+def fill_gaps(matrix: np.ndarray) -> np.ndarray:
+    """Linearly interpolate NaNs inside each row; leading and trailing gaps take the nearest known value."""
+    filled = matrix.copy()
+    index = np.arange(matrix.shape[1])
+    for row in range(matrix.shape[0]):
+        known = ~np.isnan(matrix[row])
+        if known.any() and not known.all():
+            filled[row] = np.interp(index, index[known], matrix[row, known])
+    return np.nan_to_num(filled)
+
+
+def linear_seasonal(y: np.ndarray, phase: np.ndarray, horizon: int, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Least-squares linear trend plus one offset per position in the season, for every row of y at once.
+
+    `phase` is the season position (0..period-1) of each of the len(y) + horizon
+    steps. Returns (in-sample fit, forecast) as (series, time) matrices.
+    """
+    steps = y.shape[1] + horizon
+    t = np.arange(steps, dtype=float) / max(y.shape[1], 1)
+    design = np.column_stack([np.ones(steps), t] + [(phase == p).astype(float) for p in range(1, period)])
+    coef, *_ = np.linalg.lstsq(design[:y.shape[1]], y.T, rcond=None)
+    fitted = (design @ coef).T
+    return fitted[:, :y.shape[1]], fitted[:, y.shape[1]:]
+
+
+def holt_winters(y: np.ndarray, horizon: int, period: int, grid: np.ndarray = HW_GRID) -> Tuple[np.ndarray, np.ndarray]:
+    """Additive Holt-Winters fitted for every series and every grid parameter set in one pass over time.
+
+    For each series the parameters with the smallest one-step-ahead squared
+    error (after the first two seasons) are kept. Returns (one-step fit,
+    forecast) as (series, time) matrices; needs at least two seasons of data.
+    """
+    series, steps = y.shape
+    g = len(grid)
+    values = np.repeat(y, g, axis=0)  # row i * g + j is series i with parameters j
+    alpha, beta, gamma = (np.tile(grid[:, k], series) for k in range(3))
+    first, second = values[:, :period].mean(axis=1), values[:, period:2 * period].mean(axis=1)
+    level, trend = first, (second - first) / period
+    season = values[:, :period] - first[:, np.newaxis]
+    fitted = np.empty_like(values)
+    for t in range(steps):
+        position = t % period
+        fitted[:, t] = level + trend + season[:, position]
+        observed = values[:, t]
+        new_level = alpha * (observed - season[:, position]) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        season[:, position] = gamma * (observed - new_level) + (1 - gamma) * season[:, position]
+        level = new_level
+    errors = ((values - fitted)[:, 2 * period:] ** 2).sum(axis=1).reshape(series, g)
+    best = np.arange(series) * g + errors.argmin(axis=1)
+    ahead = np.arange(1, horizon + 1)
+    positions = (steps + ahead - 1) % period
+    forecast = level[best, np.newaxis] + trend[best, np.newaxis] * ahead + season[best][:, positions]
+    return fitted[best], forecast
+
+
+def forecast_batch(y: np.ndarray, phase: np.ndarray, horizon: int, period: int = 7,
+                   holdout: int = 14) -> Dict[str, np.ndarray]:
+    """Forecast every row of y with the model that did best on the last `holdout` steps.
+
+    Both models are first fitted without the holdout and scored by mean
+    absolute error on it, then the winner is refitted on all data. The
+    residual standard deviation of the winner gives an approximate 80%
+    interval. Holt-Winters only competes with at least two seasons besides
+    the holdout.
+    """
+    steps = y.shape[1]
+    candidates = {"linear_seasonal": lambda data, h: linear_seasonal(data, phase[:data.shape[1] + h], h, period)}
+    if steps - holdout >= 2 * period:
+        candidates["holt_winters"] = lambda data, h: holt_winters(data, h, period)
+    names = list(candidates)
+    if len(names) > 1:
+        train, test = y[:, :steps - holdout], y[:, steps - holdout:]
+        scores = np.stack([np.abs(candidates[name](train, holdout)[1] - test).mean(axis=1) for name in names])
+        choice = scores.argmin(axis=0)
+    else:
+        choice = np.zeros(y.shape[0], dtype=int)
+    forecast = np.empty((y.shape[0], horizon))
+    spread = np.empty(y.shape[0])
+    for index, name in enumerate(names):
+        rows = np.flatnonzero(choice == index)
+        if not len(rows):
+            continue
+        fitted, ahead = candidates[name](y[rows], horizon)
+        forecast[rows] = ahead
+        skip = 2 * period if name == "holt_winters" else 0
+        spread[rows] = (y[rows] - fitted)[:, skip:].std(axis=1)
+    return {"model": np.array(names)[choice], "forecast": forecast, "interval": 1.2816 * spread}
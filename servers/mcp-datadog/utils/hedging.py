@@ -0,0 +1,135 @@
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List
+
+from config import HEDGE_BUDGET_RATIO, HEDGE_MIN_SAMPLES, HEDGING_ENABLED
+
+# Set while a tool classified as read-only is running
+hedging_allowed: contextvars.ContextVar[bool] = contextvars.ContextVar("hedging_allowed", default=False)
+
+
+def hedged(tool: Callable) -> Callable:
+    """Wrap a read-only tool so the upstream requests it makes may be hedged."""
+    @functools.wraps(tool)
+    def wrapper(*args, **kwargs):
+        token = hedging_allowed.set(True)
+        try:
+            return tool(*args, **kwargs)
+        finally:
+            hedging_allowed.reset(token)
+    return wrapper
+
+
+def _release_loser(future) -> None:
+    """Done-callback for the attempt that lost a hedge race: hand its connection back to the pool.
+
+    Raw responses (preload_content=False) keep their connection checked out
+    until the body is read, so an unread loser would leak a pool slot.
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    response = future.result()
+    if hasattr(response, "release_conn"):
+        try:
+            response.drain_conn()
+        finally:
+            response.release_conn()
+
+
+class Hedger:
+    """Sends a second identical request when the first is slower than the endpoint's p95.
+
+    Latencies are tracked per endpoint over a sliding window. Hedges are paid
+    for from a global budget that earns `budget_ratio` of a hedge per request,
+    so at most that fraction of traffic is duplicated.
+    """
+
+    def __init__(self, enabled: bool, budget_ratio: float, min_samples: int, window: int = 200):
+        self.enabled = enabled
+        self.budget_ratio = budget_ratio
+        self.min_samples = min_samples
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._budget = 0.0
+        self._max_budget = 10.0
+        self._stats = {"requests": 0, "hedges_sent": 0, "hedges_won": 0, "hedges_denied": 0}
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+    def _record(self, endpoint: str, elapsed: float) -> None:
+        with self._lock:
+            samples = self._latencies.get(endpoint)
+            if samples is None:
+                samples = self._latencies[endpoint] = deque(maxlen=self.window)
+            samples.append(elapsed)
+
+    def _p95(self, endpoint: str):
+        samples = self._latencies.get(endpoint)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _take_budget(self) -> bool:
+        if self._budget >= 1:
+            self._budget -= 1
+            return True
+        return False
+
+    def _timed(self, endpoint: str, fn: Callable[[], Any]) -> Any:
+        start = time.monotonic()
+        result = fn()
+        self._record(endpoint, time.monotonic() - start)
+        return result
+
+    def call(self, endpoint: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._stats["requests"] += 1
+            self._budget = min(self._max_budget, self._budget + self.budget_ratio)
+            delay = self._p95(endpoint) if self.enabled and hedging_allowed.get() else None
+        if delay is None:
+            return self._timed(endpoint, fn)
+
+        primary = self._executor.submit(contextvars.copy_context().run, self._timed, endpoint, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        with self._lock:
+            allowed = self._take_budget()
+            self._stats["hedges_sent" if allowed else "hedges_denied"] += 1
+        if not allowed:
+            return primary.result()
+
+        hedge = self._executor.submit(contextvars.copy_context().run, self._timed, endpoint, fn)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self._stats["hedges_won"] += 1
+                    loser = primary if future is hedge else hedge
+                    loser.add_done_callback(_release_loser)
+                    return future.result()
+        # Both attempts failed; surface the primary's error
+        return primary.result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            endpoints: List[Dict[str, Any]] = []
+            for endpoint, samples in self._latencies.items():
+                p95 = self._p95(endpoint)
+                endpoints.append({
+                    "endpoint": endpoint,
+                    "samples": len(samples),
+                    "p95_seconds": round(p95, 3) if p95 is not None else None,
+                })
+            return {"enabled": self.enabled, "budget": round(self._budget, 2), **self._stats, "endpoints": endpoints}
+
+
+hedger = Hedger(HEDGING_ENABLED, HEDGE_BUDGET_RATIO, HEDGE_MIN_SAMPLES)
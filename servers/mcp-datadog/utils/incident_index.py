@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id TEXT PRIMARY KEY,
+    public_id INTEGER,
+    title TEXT,
+    state TEXT,
+    severity TEXT,
+    created REAL,
+    modified REAL,
+    resolved REAL,
+    customer_impacted INTEGER,
+    fields TEXT,
+    attachments TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS incidents_fts USING fts5(
+    id UNINDEXED, title, fields, attachments, tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_COLUMNS = ("id", "public_id", "title", "state", "severity", "created", "modified", "resolved",
+            "customer_impacted", "fields", "attachments")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def match_query(text: str, max_terms: int = 32) -> Optional[str]:
+    """Turn free text into an FTS5 query matching any of its words, so ranking decides similarity."""
+    terms = list(dict.fromkeys(word.lower() for word in _WORD.findall(text) if len(word) > 1))[:max_terms]
+    return " OR ".join(f'"{term}"' for term in terms) or None
+
+
+class IncidentIndexError(Exception):
+    """Raised when the index database cannot be opened."""
+
+
+class IncidentIndex:
+    """Incidents stored in SQLite with an FTS5 index over title, fields and attachment text.
+
+    One connection is shared behind a lock; the database lives at `path`
+    (":memory:" for a throwaway index) so a restart starts from the last sync.
+    It is opened on first use, so an unwritable path only fails the calls
+    that need the index.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # Only touched with self._lock held
+        if self._conn is None:
+            try:
+                if self.path != ":memory:":
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False)
+                db.row_factory = sqlite3.Row
+                with db:
+                    db.executescript(_SCHEMA)
+            except (OSError, sqlite3.Error) as e:
+                raise IncidentIndexError(f"cannot open the incident index at {self.path}: {e}") from e
+            self._conn = db
+        return self._conn
+
+    def modified_times(self) -> Dict[str, float]:
+        with self._lock:
+            return {row["id"]: row["modified"] for row in self._db.execute("SELECT id, modified FROM incidents")}
+
+    def upsert(self, incidents: Iterable[Dict[str, Any]]) -> int:
+        """Insert or replace incidents; `fields` and `attachments` are flattened into searchable text."""
+        count = 0
+        with self._lock, self._db:
+            for incident in incidents:
+                row = {column: incident.get(column) for column in _COLUMNS}
+                row["fields"] = json.dumps(incident.get("fields") or {})
+                row["attachments"] = json.dumps(incident.get("attachments") or [])
+                self._db.execute(f"INSERT OR REPLACE INTO incidents ({', '.join(_COLUMNS)}) "
+                                 f"VALUES ({', '.join('?' * len(_COLUMNS))})", [row[c] for c in _COLUMNS])
+                self._db.execute("DELETE FROM incidents_fts WHERE id = ?", (row["id"],))
+                self._db.execute(
+                    "INSERT INTO incidents_fts (id, title, fields, attachments) VALUES (?, ?, ?, ?)",
+                    (row["id"], row["title"] or "",
+                     "\n".join(f"{name}: {value}" for name, value in (incident.get("fields") or {}).items()),
+                     "\n".join(a.get("title") or "" for a in incident.get("attachments") or [])),
+                )
+                count += 1
+        return count
+
+    def delete_missing(self, keep: Iterable[str]) -> int:
+        """Drop incidents that are no longer listed upstream."""
+        keep = set(keep)
+        with self._lock:
+            stale = [row["id"] for row in self._db.execute("SELECT id FROM incidents") if row["id"] not in keep]
+        with self._lock, self._db:
+            for incident_id in stale:
+                self._db.execute("DELETE FROM incidents WHERE id = ?", (incident_id,))
+                self._db.execute("DELETE FROM incidents_fts WHERE id = ?", (incident_id,))
+        return len(stale)
+
+    def get(self, incident_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM incidents WHERE id = ? OR CAST(public_id AS TEXT) = ?",
+                                   (incident_id, incident_id)).fetchone()
+        return self._record(row) if row else None
+
+    def search(self, text: str, limit: int = 10, exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Incidents ranked by BM25 against the words of `text`, title matches weighted highest."""
+        query = match_query(text)
+        if not query:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT i.*, bm25(incidents_fts, 0.0, 5.0, 2.0, 1.0) AS rank, "
+                "snippet(incidents_fts, -1, '[', ']', '...', 12) AS snippet "
+                "FROM incidents_fts JOIN incidents i ON i.id = incidents_fts.id "
+                "WHERE incidents_fts MATCH ? AND i.id != ? ORDER BY rank LIMIT ?",
+                (query, exclude or "", limit),
+            ).fetchall()
+        return [{**self._record(row), "score": round(-row["rank"], 3), "snippet": row["snippet"]} for row in rows]
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_state(self, key: str, value: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM incidents").fetchone()[0]
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> Dict[str, Any]:
+        record = {column: row[column] for column in _COLUMNS}
+        record["fields"] = json.loads(record["fields"] or "{}")
+        record["attachments"] = json.loads(record["attachments"] or "[]")
+        record["customer_impacted"] = bool(record["customer_impacted"])
+        return record
@@ -0,0 +1,83 @@
+from typing import Generic, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+Interval = Tuple[float, float, T]
+
+
+class _Node(Generic[T]):
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, center: float, by_start: List[Interval], by_end: List[Interval],
+                 left: Optional["_Node[T]"], right: Optional["_Node[T]"]):
+        self.center = center
+        self.by_start = by_start
+        self.by_end = by_end
+        self.left = left
+        self.right = right
+
+
+class IntervalTree(Generic[T]):
+    """Static centered interval tree over half-open [start, end) intervals carrying a value.
+
+    Built once in O(n log n); point and range queries cost O(log n + matches).
+    Open-ended intervals use float("inf") as their end.
+    """
+
+    def __init__(self, intervals: Sequence[Interval]):
+        self.size = len(intervals)
+        self._root = self._build([i for i in intervals if i[0] < i[1]])
+
+    @classmethod
+    def _build(cls, intervals: List[Interval]) -> Optional[_Node[T]]:
+        if not intervals:
+            return None
+        # The median start always lies inside its own interval, so no node is empty
+        starts = sorted(start for start, _, _ in intervals)
+        center = starts[len(starts) // 2]
+        left, here, right = [], [], []
+        for interval in intervals:
+            if interval[1] <= center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        return _Node(center, sorted(here, key=lambda i: i[0]), sorted(here, key=lambda i: -i[1]),
+                     cls._build(left), cls._build(right))
+
+    def at(self, point: float) -> List[Interval]:
+        """Intervals containing `point`."""
+        return self.overlapping(point, point, inclusive=True)
+
+    def overlapping(self, start: float, end: float, inclusive: bool = False) -> List[Interval]:
+        """Intervals overlapping [start, end); with `inclusive`, [start, end] so a zero-length query is a point."""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            # Intervals at a node all contain its center, so only one bound needs checking per side
+            if end < node.center or (end == node.center and not inclusive):
+                for interval in node.by_start:
+                    if interval[0] > end or (interval[0] == end and not inclusive):
+                        break
+                    if interval[1] > start:
+                        found.append(interval)
+                stack.append(node.left)
+            elif start >= node.center:
+                for interval in node.by_end:
+                    if interval[1] <= start:
+                        break
+                    if interval[0] < end or (inclusive and interval[0] <= end):
+                        found.append(interval)
+                stack.append(node.right)
+            else:
+                found.extend(node.by_start)
+                stack.append(node.left)
+                stack.append(node.right)
+        return found
+
+    def __len__(self) -> int:
+        return self.size
@@ -0,0 +1,85 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.sketches import LogSketch
+
+METRIC_TYPES = ("count", "gauge", "distribution")
+
+# Intake types of the v2 series API
+INTAKE_COUNT = 1
+INTAKE_GAUGE = 3
+
+
+class MetricAggregate:
+    """Values submitted for one (metric, type, tags, host) during a flush interval, reduced statsd-style.
+
+    Counts are summed (scaled up by 1 / sample_rate), gauges keep the value
+    with the latest timestamp and distributions go into a LogSketch. The unit
+    is only sent with counts and gauges; the distribution intake has none.
+    """
+
+    __slots__ = ("metric", "metric_type", "tags", "host", "unit", "timestamp", "value", "sketch")
+
+    def __init__(self, metric: str, metric_type: str, tags: Tuple[str, ...], host: Optional[str], unit: Optional[str],
+                 value: float, timestamp: Optional[float] = None, sample_rate: float = 1.0):
+        self.metric = metric
+        self.metric_type = metric_type
+        self.tags = tags
+        self.host = host
+        self.unit = unit
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.sketch: Optional[LogSketch] = None
+        if metric_type == "count":
+            self.value = value / sample_rate
+        elif metric_type == "gauge":
+            self.value = value
+        else:
+            self.value = 0.0
+            self.sketch = LogSketch()
+            self.sketch.add(value, 1.0 / sample_rate)
+
+    @property
+    def key(self) -> Tuple[str, str, Tuple[str, ...], Optional[str]]:
+        return (self.metric, self.metric_type, self.tags, self.host)
+
+    def merge(self, other: "MetricAggregate") -> "MetricAggregate":
+        """Fold a later aggregate of the same key into this one."""
+        if self.metric_type == "count":
+            self.value += other.value
+            self.timestamp = min(self.timestamp, other.timestamp)
+        elif self.metric_type == "gauge":
+            if other.timestamp >= self.timestamp:
+                self.value, self.timestamp = other.value, other.timestamp
+        else:
+            self.sketch.merge(other.sketch)
+            self.timestamp = min(self.timestamp, other.timestamp)
+        self.unit = self.unit or other.unit
+        return self
+
+    def series(self, interval: int) -> Dict[str, Any]:
+        """v2 intake series of a count or gauge aggregate."""
+        kind = INTAKE_COUNT if self.metric_type == "count" else INTAKE_GAUGE
+        series: Dict[str, Any] = {"metric": self.metric, "type": kind,
+                                  "points": [{"timestamp": int(self.timestamp), "value": self.value}],
+                                  "tags": list(self.tags)}
+        if kind == INTAKE_COUNT:
+            series["interval"] = interval
+        if self.host:
+            series["resources"] = [{"name": self.host, "type": "host"}]
+        if self.unit:
+            series["unit"] = self.unit
+        return series
+
+    def distribution_series(self) -> Dict[str, Any]:
+        """v1 distribution points of a distribution aggregate.
+
+        The intake takes raw values, so each sketch bucket is sent as its
+        midpoint repeated by its rounded weight; Datadog then builds a real
+        distribution that aggregates across hosts and tags.
+        """
+        values = [value for value, weight in self.sketch.buckets() for _ in range(max(1, round(weight)))]
+        series: Dict[str, Any] = {"metric": self.metric, "points": [[int(self.timestamp), values]],
+                                  "tags": list(self.tags), "type": "distribution"}
+        if self.host:
+            series["host"] = self.host
+        return series
@@ -0,0 +1,17 @@
+import functools
+from typing import Callable
+
+import anyio.to_thread
+
+
+def off_loop(tool: Callable) -> Callable:
+    """Wrap a sync tool as an async one that runs in a worker thread.
+
+    FastMCP calls sync tools on the event-loop thread, so a tool waiting on
+    the network, a rate-limit window or a retry backoff would stall every
+    other request. The wrapper keeps the tool's signature for the schema.
+    """
+    @functools.wraps(tool)
+    async def wrapper(*args, **kwargs):
+        return await anyio.to_thread.run_sync(functools.partial(tool, *args, **kwargs))
+    return wrapper
@@ -0,0 +1,185 @@
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional
+
+from config import (
+    RATE_LIMIT_INITIAL_CONCURRENCY,
+    RATE_LIMIT_MAX_CONCURRENCY,
+    RATE_LIMIT_MAX_WAIT,
+)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request waited longer than allowed for rate-limit capacity."""
+
+
+def _header_int(headers: Mapping[str, Any], name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket for one Datadog rate-limit name, learned from X-RateLimit-* headers.
+
+    Until the first response arrives the limit is unknown and only the
+    concurrency limit applies.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_concurrency: int):
+        self.name = name
+        self.limit: Optional[int] = None
+        self.period: Optional[float] = None
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.concurrency = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.requests = 0
+        self.throttled_requests = 0
+        self.throttled_seconds = 0.0
+
+    def refill(self, now: float) -> None:
+        if self.limit is not None:
+            self.tokens = min(float(self.limit), self.tokens + (now - self.updated) * self.limit / self.period)
+        self.updated = now
+
+    def wait_time(self, now: float) -> Optional[float]:
+        """Seconds until a request may be sent; None when only a release can free a slot."""
+        if self.in_flight >= int(self.concurrency):
+            return None
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.limit is not None and self.tokens < 1:
+            return (1 - self.tokens) * self.period / self.limit
+        return 0.0
+
+    def learn(self, headers: Mapping[str, Any], now: float) -> None:
+        limit = _header_int(headers, "x-ratelimit-limit")
+        period = _header_int(headers, "x-ratelimit-period")
+        remaining = _header_int(headers, "x-ratelimit-remaining")
+        reset = _header_int(headers, "x-ratelimit-reset")
+        if limit and period:
+            first = self.limit is None
+            self.limit, self.period = limit, float(period)
+            if remaining is not None:
+                self.tokens = float(remaining) if first else min(self.tokens, float(remaining))
+        if remaining == 0 and reset is not None:
+            self.blocked_until = max(self.blocked_until, now + reset)
+
+    def on_success(self) -> None:
+        # Additive increase: roughly one extra slot per window of successful requests
+        self.concurrency = min(float(self.max_concurrency), self.concurrency + 1 / self.concurrency)
+
+    def on_throttled(self, headers: Mapping[str, Any], now: float) -> None:
+        # Multiplicative decrease, and hold the bucket until the window resets
+        self.throttled_requests += 1
+        self.concurrency = max(1.0, self.concurrency / 2)
+        reset = _header_int(headers, "x-ratelimit-reset")
+        self.blocked_until = max(self.blocked_until, now + (reset if reset is not None else 1))
+        self.tokens = min(self.tokens, 0.0)
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "limit": self.limit,
+            "period_seconds": self.period,
+            "tokens": round(self.tokens, 2) if self.limit is not None else None,
+            "blocked_for_seconds": round(max(0.0, self.blocked_until - now), 2),
+            "concurrency": int(self.concurrency),
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "max_queue_depth": self.max_queued,
+            "requests": self.requests,
+            "throttled_requests": self.throttled_requests,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+
+class RateLimitScheduler:
+    """Queues upstream requests per rate-limit name instead of letting them fail with 429.
+
+    Endpoints start in their own bucket and are moved to the shared bucket
+    named by X-RateLimit-Name as soon as a response reveals it.
+    """
+
+    def __init__(self, max_wait: float, initial_concurrency: int, max_concurrency: int):
+        self.max_wait = max_wait
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self._cond = threading.Condition()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._names: Dict[str, str] = {}
+
+    def _bucket(self, name: str) -> TokenBucket:
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = TokenBucket(name, self.initial_concurrency, self.max_concurrency)
+        return bucket
+
+    def acquire(self, endpoint: str) -> TokenBucket:
+        """Block until the endpoint's bucket has a token and a free concurrency slot."""
+        with self._cond:
+            bucket = self._bucket(self._names.get(endpoint, endpoint))
+            bucket.queued += 1
+            bucket.max_queued = max(bucket.max_queued, bucket.queued)
+            start = time.monotonic()
+            deadline = start + self.max_wait
+            try:
+                while True:
+                    now = time.monotonic()
+                    bucket.refill(now)
+                    wait = bucket.wait_time(now)
+                    if wait == 0:
+                        break
+                    if now >= deadline:
+                        raise RateLimitTimeout(
+                            f"Rate limit '{bucket.name}' still exhausted after waiting {self.max_wait:.0f}s"
+                        )
+                    self._cond.wait(deadline - now if wait is None else min(wait, deadline - now))
+            finally:
+                bucket.queued -= 1
+                bucket.throttled_seconds += time.monotonic() - start
+            bucket.in_flight += 1
+            bucket.requests += 1
+            if bucket.limit is not None:
+                bucket.tokens -= 1
+            return bucket
+
+    def release(self, bucket: TokenBucket, endpoint: str, status: int, headers: Optional[Mapping[str, Any]]) -> None:
+        """Return the slot taken by acquire() and learn from the response headers."""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        with self._cond:
+            now = time.monotonic()
+            target = bucket
+            name = headers.get("x-ratelimit-name")
+            if name:
+                self._names[endpoint] = name
+                target = self._bucket(name)
+            target.learn(headers, now)
+            if status == 429:
+                target.on_throttled(headers, now)
+            elif 200 <= status < 300:
+                target.on_success()
+            bucket.in_flight -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            now = time.monotonic()
+            result = []
+            for bucket in self._buckets.values():
+                if bucket.name in self._names and not (bucket.in_flight or bucket.queued):
+                    continue  # endpoint has moved to its named bucket
+                entry = bucket.snapshot(now)
+                entry["endpoints"] = sorted(e for e, n in self._names.items() if n == bucket.name)
+                result.append(entry)
+            return result
+
+
+scheduler = RateLimitScheduler(RATE_LIMIT_MAX_WAIT, RATE_LIMIT_INITIAL_CONCURRENCY, RATE_LIMIT_MAX_CONCURRENCY)
@@ -0,0 +1,178 @@
+import random
+import threading
+import time
+from typing import Any, Dict, List
+
+import urllib3
+from datadog_api_client.exceptions import ApiException
+
+from config import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+)
+from utils.rate_limit import RateLimitTimeout
+
+RETRIABLE_STATUS_CODES = frozenset([408, 425, 429, 500, 502, 503, 504])
+
+# POST endpoints that only read data and can be replayed safely
+READ_ONLY_POST_PATHS = frozenset([
+    "/api/v2/spans/events/search",
+    "/api/v2/spans/analytics/aggregate",
+    "/api/v2/events/search",
+    "/api/v2/logs/events/search",
+    "/api/v2/logs/analytics/aggregate",
+    "/api/v2/query/timeseries",
+    "/api/v2/query/scalar",
+])
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling Datadog while an endpoint's circuit breaker is open."""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        super().__init__(
+            f"Datadog endpoint '{endpoint}' is failing; circuit open, not retrying for another {retry_in:.0f}s"
+        )
+
+
+def is_retriable(exc: BaseException) -> bool:
+    """Whether an upstream failure is transient and worth another attempt."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, ApiException):
+        # status 0 is raised for transport problems such as SSL errors
+        return exc.status in RETRIABLE_STATUS_CODES or exc.status == 0
+    return isinstance(exc, (urllib3.exceptions.HTTPError, ConnectionError, TimeoutError))
+
+
+def is_throttled(exc: BaseException) -> bool:
+    """Whether a failure is a 429 or rate-limit timeout left over after the scheduler already waited for the window."""
+    return isinstance(exc, RateLimitTimeout) or (isinstance(exc, ApiException) and exc.status == 429)
+
+
+def is_idempotent(method: str, resource_path: str) -> bool:
+    return method.upper() in ("GET", "HEAD") or resource_path in READ_ONLY_POST_PATHS
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry number (1-based)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for a single endpoint.
+
+    closed -> open after `failure_threshold` retriable failures in a row;
+    open -> half_open once `reset_timeout` has elapsed, letting one probe through;
+    half_open -> closed on success, back to open on failure.
+    """
+
+    def __init__(self, endpoint: str, failure_threshold: int, reset_timeout: float):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.calls = 0
+        self.retries = 0
+        self.retriable_failures = 0
+        self.non_retriable_failures = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.last_error = None
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "open_for_seconds": round(max(0.0, self.opened_at + self.reset_timeout - now), 2)
+            if self.state == "open" else 0.0,
+            "calls": self.calls,
+            "retries": self.retries,
+            "retriable_failures": self.retriable_failures,
+            "non_retriable_failures": self.non_retriable_failures,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "last_error": self.last_error,
+        }
+
+
+class CircuitBreakerRegistry:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def _get(self, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(endpoint, self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def before_call(self, endpoint: str) -> None:
+        """Raise CircuitOpenError if the endpoint must fail fast."""
+        with self._lock:
+            breaker = self._get(endpoint)
+            now = time.monotonic()
+            if breaker.state == "open":
+                if now - breaker.opened_at < breaker.reset_timeout:
+                    breaker.rejected += 1
+                    raise CircuitOpenError(endpoint, breaker.opened_at + breaker.reset_timeout - now)
+                breaker.state = "half_open"
+            if breaker.state == "half_open":
+                if breaker.probe_in_flight:
+                    breaker.rejected += 1
+                    raise CircuitOpenError(endpoint, breaker.reset_timeout)
+                breaker.probe_in_flight = True
+            breaker.calls += 1
+
+    def record_retry(self, endpoint: str) -> None:
+        with self._lock:
+            self._get(endpoint).retries += 1
+
+    def record_success(self, endpoint: str) -> None:
+        with self._lock:
+            breaker = self._get(endpoint)
+            breaker.state = "closed"
+            breaker.consecutive_failures = 0
+            breaker.probe_in_flight = False
+
+    def record_throttled(self, endpoint: str) -> None:
+        """A throttled call says nothing about the endpoint's health; only free a half-open probe slot."""
+        with self._lock:
+            breaker = self._get(endpoint)
+            breaker.probe_in_flight = False
+            breaker.throttled += 1
+
+    def record_failure(self, endpoint: str, exc: BaseException) -> None:
+        with self._lock:
+            breaker = self._get(endpoint)
+            breaker.probe_in_flight = False
+            breaker.last_error = f"{type(exc).__name__}: {str(exc).splitlines()[0] if str(exc) else ''}"
+            if not is_retriable(exc):
+                # The endpoint answered; a bad request says nothing about its health
+                breaker.non_retriable_failures += 1
+                if breaker.state == "half_open":
+                    breaker.state = "closed"
+                return
+            breaker.retriable_failures += 1
+            breaker.consecutive_failures += 1
+            if breaker.state == "half_open" or breaker.consecutive_failures >= breaker.failure_threshold:
+                breaker.state = "open"
+                breaker.opened_at = time.monotonic()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            now = time.monotonic()
+            return [b.snapshot(now) for b in self._breakers.values()]
+
+
+breakers = CircuitBreakerRegistry(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
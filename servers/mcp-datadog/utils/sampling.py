@@ -0,0 +1,111 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Z95 = 1.959964
+
+
+class Stratum:
+    """Sample drawn from one stratum of a population of known size.
+
+    `clusters[i]` names the read that drew `values[i]` when the sample was
+    taken as several reads of neighbouring items rather than one by one.
+    """
+
+    def __init__(self, population: int, values: Sequence[float], clusters: Optional[Sequence[int]] = None):
+        self.population = population
+        self.values = np.asarray(values, dtype=float)
+        self.clusters = None if clusters is None else np.asarray(clusters)
+
+    @property
+    def n(self) -> int:
+        return len(self.values)
+
+    @property
+    def fpc(self) -> float:
+        """Finite population correction; 0 when the whole stratum was read."""
+        return max(0.0, 1 - self.n / self.population) if self.population else 0.0
+
+
+def _mean_variance(s: Stratum, values: np.ndarray) -> float:
+    """Variance of the sample mean of `values` over `s`, before finite population correction.
+
+    A clustered sample uses the ultimate cluster estimator for a ratio mean,
+    which follows the spread between reads instead of between items.
+    """
+    if s.n < 2:
+        return 0.0
+    if s.clusters is not None:
+        ids, index = np.unique(s.clusters, return_inverse=True)
+        if len(ids) > 1:
+            sizes = np.bincount(index).astype(float)
+            totals = np.bincount(index, weights=values)
+            mean = totals.sum() / sizes.sum()
+            residuals = (totals - mean * sizes) / sizes.mean()
+            return float((residuals ** 2).sum()) / (len(ids) * (len(ids) - 1))
+    return float(np.var(values, ddof=1)) / s.n
+
+
+def _usable(strata: List[Stratum]) -> Tuple[List[Stratum], int]:
+    usable = [s for s in strata if s.population > 0 and s.n > 0]
+    return usable, sum(s.population for s in usable)
+
+
+def stratified_mean(strata: List[Stratum]) -> Dict[str, float]:
+    """Stratified estimate of the population mean with a 95% confidence interval."""
+    usable, total = _usable(strata)
+    if not total:
+        return {"estimate": None, "ci95": None}
+    estimate, variance = 0.0, 0.0
+    for s in usable:
+        weight = s.population / total
+        estimate += weight * float(s.values.mean())
+        variance += weight ** 2 * s.fpc * _mean_variance(s, s.values)
+    half = Z95 * math.sqrt(variance)
+    return {"estimate": estimate, "ci95": [estimate - half, estimate + half]}
+
+
+def stratified_proportion(strata: List[Stratum], matches: List[np.ndarray]) -> Dict[str, float]:
+    """Stratified estimate of the share of the population matching, with a 95% confidence interval.
+
+    `matches[i]` is a boolean array over the sample of `strata[i]`.
+    """
+    total = sum(s.population for s, m in zip(strata, matches) if s.population > 0 and s.n > 0)
+    if not total:
+        return {"estimate": None, "ci95": None}
+    estimate, variance = 0.0, 0.0
+    for s, m in zip(strata, matches):
+        if s.population <= 0 or s.n == 0:
+            continue
+        weight = s.population / total
+        estimate += weight * float(np.mean(m))
+        variance += weight ** 2 * s.fpc * _mean_variance(s, np.asarray(m, dtype=float))
+    half = Z95 * math.sqrt(variance)
+    return {"estimate": estimate, "ci95": [max(0.0, estimate - half), min(1.0, estimate + half)]}
+
+
+def weighted_quantile(strata: List[Stratum], q: float) -> Dict[str, float]:
+    """Quantile of the population estimated from stratum samples weighted by population / sample size.
+
+    The interval inverts the weighted empirical CDF at q ± 1.96·se (Woodruff),
+    se being the stratified standard error of the share of the population at
+    or below the estimate.
+    """
+    usable, total = _usable(strata)
+    if not usable:
+        return {"estimate": None, "ci95": None}
+    values = np.concatenate([s.values for s in usable])
+    weights = np.concatenate([np.full(s.n, s.population / s.n) for s in usable])
+    order = np.argsort(values)
+    values, weights = values[order], weights[order]
+    cdf = np.cumsum(weights) / weights.sum()
+
+    def at(p: float) -> float:
+        return float(values[min(int(np.searchsorted(cdf, min(max(p, 0.0), 1.0))), len(values) - 1)])
+
+    estimate = at(q)
+    variance = sum((s.population / total) ** 2 * s.fpc * _mean_variance(s, (s.values <= estimate).astype(float))
+                   for s in usable)
+    half = Z95 * math.sqrt(variance)
+    return {"estimate": estimate, "ci95": [at(q - half), at(q + half)]}
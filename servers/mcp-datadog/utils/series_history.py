@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+
+class SeriesHistory:
+    """Time blocks of metric queries kept without expiry, for histories that are read again and again.
+
+    Blocks that ended before the ingest delay never change, so unlike
+    TTLCache entries they are kept until they slide out of the oldest range
+    asked for under their key. Only blocks still open are fetched again, at
+    most every `recent_ttl` seconds. Keys are dropped least recently used
+    first beyond `max_keys`.
+    """
+
+    def __init__(self, block: int, ingest_delay: float, recent_ttl: float, max_keys: int):
+        self.block = block
+        self.ingest_delay = ingest_delay
+        self.recent_ttl = recent_ttl
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # key -> block start -> (block, fetched_at, settled)
+        self._keys: "OrderedDict[Hashable, Dict[int, Tuple[Any, float, bool]]]" = OrderedDict()
+        self._stats = {"blocks_fetched": 0, "blocks_served": 0, "evicted_keys": 0}
+
+    def get(self, key: Hashable, from_time: int, to_time: int,
+            fetch: Callable[[List[int]], Dict[int, Any]]) -> List[Any]:
+        """Blocks covering [from_time, to_time] in time order; `fetch(starts)` is called for missing or open ones."""
+        first = from_time // self.block * self.block
+        starts = range(first, to_time, self.block)
+        now = time.time()
+        with self._lock:
+            held = self._keys.get(key) or {}
+            missing = [start for start in starts if start not in held
+                       or not held[start][2] and now - held[start][1] > self.recent_ttl]
+        fetched = fetch(missing) if missing else {}
+        settled_before = now - self.ingest_delay
+        with self._lock:
+            held = self._keys.get(key)
+            if held is None:
+                held = self._keys[key] = {}
+                while len(self._keys) > self.max_keys:
+                    self._keys.popitem(last=False)
+                    self._stats["evicted_keys"] += 1
+            self._keys.move_to_end(key)
+            for start, block in fetched.items():
+                held[start] = (block, now, start + self.block <= settled_before)
+            for start in [start for start in held if start < first]:
+                del held[start]
+            self._stats["blocks_fetched"] += len(fetched)
+            self._stats["blocks_served"] += len(starts) - len(fetched)
+            return [held[start][0] for start in starts]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"keys": len(self._keys), "blocks": sum(len(held) for held in self._keys.values()), **self._stats}
@@ -0,0 +1,102 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+Edge = Tuple[str, str, float, Optional[float]]  # caller, callee, calls, avg duration (ns)
+
+
+def _csr(count: int, pairs: List[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Compressed adjacency: neighbours of node i are targets[offsets[i]:offsets[i + 1]]."""
+    if not pairs:
+        return np.zeros(count + 1, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    sources = np.array([p[0] for p in pairs], dtype=np.int32)
+    targets = np.array([p[1] for p in pairs], dtype=np.int32)
+    order = np.argsort(sources, kind="stable")
+    offsets = np.zeros(count + 1, dtype=np.int32)
+    np.add.at(offsets, sources + 1, 1)
+    return np.cumsum(offsets, dtype=np.int32), targets[order]
+
+
+class ServiceGraph:
+    """Directed service call graph stored as compressed adjacency arrays, both ways.
+
+    An edge A -> B means A calls B, so B is downstream of A and A upstream of B.
+    """
+
+    def __init__(self, edges: Iterable[Edge], built_at: float = 0.0):
+        self.built_at = built_at
+        self.stats: Dict[Tuple[int, int], Tuple[float, Optional[float]]] = {}
+        names = set()
+        edges = [e for e in edges if e[0] and e[1] and e[0] != e[1]]
+        for caller, callee, _, _ in edges:
+            names.update((caller, callee))
+        self.names: List[str] = sorted(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        for caller, callee, calls, duration in edges:
+            key = (self.index[caller], self.index[callee])
+            known = self.stats.get(key)
+            self.stats[key] = (calls + known[0], duration) if known else (calls, duration)
+        pairs = list(self.stats)
+        self._down = _csr(len(self.names), pairs)
+        self._up = _csr(len(self.names), [(b, a) for a, b in pairs])
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.stats)
+
+    def _neighbours(self, node: int, direction: str) -> np.ndarray:
+        offsets, targets = self._down if direction == "downstream" else self._up
+        return targets[offsets[node]:offsets[node + 1]]
+
+    def neighbours(self, service: str, direction: str) -> List[Dict[str, object]]:
+        """Direct callees (downstream) or callers (upstream) of a service with call stats."""
+        node = self.index[service]
+        result = []
+        for other in self._neighbours(node, direction):
+            key = (node, int(other)) if direction == "downstream" else (int(other), node)
+            calls, duration = self.stats[key]
+            result.append({"service": self.names[other], "calls": int(calls),
+                           "avg_duration_ms": round(duration / 1e6, 3) if duration is not None else None})
+        return sorted(result, key=lambda r: -r["calls"])
+
+    def bfs(self, service: str, direction: str, max_depth: int) -> List[Dict[str, object]]:
+        """Every service reachable in `direction` within max_depth hops, with its depth and the hop it was reached through."""
+        start = self.index[service]
+        depth = {start: 0}
+        via: Dict[int, int] = {}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            if depth[node] >= max_depth:
+                continue
+            for other in self._neighbours(node, direction):
+                other = int(other)
+                if other not in depth:
+                    depth[other] = depth[node] + 1
+                    via[other] = node
+                    queue.append(other)
+        return [
+            {"service": self.names[node], "depth": d, "via": self.names[via[node]]}
+            for node, d in sorted(depth.items(), key=lambda item: (item[1], self.names[item[0]])) if node != start
+        ]
+
+    def shortest_path(self, source: str, target: str) -> Optional[List[str]]:
+        """Fewest-hop call chain from source down to target, or None if target is not downstream."""
+        start, goal = self.index[source], self.index[target]
+        previous = {start: -1}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            if node == goal:
+                path = []
+                while node != -1:
+                    path.append(self.names[node])
+                    node = previous[node]
+                return path[::-1]
+            for other in self._neighbours(node, "downstream"):
+                other = int(other)
+                if other not in previous:
+                    previous[other] = node
+                    queue.append(other)
+        return None
@@ -0,0 +1,159 @@
+import heapq
+import math
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter counter holding at most `capacity` keys.
+
+    When a new key arrives and the table is full it takes over the smallest
+    counter, inheriting its count as overestimation error. Any key whose
+    true weight exceeds total/capacity is guaranteed to be in the table, and
+    `count - error` is a lower bound of its true weight.
+
+    Counters sit in a min-heap that is only updated lazily: an entry holds
+    the count its key had when pushed, which can only have grown since, so
+    a popped entry that is out of date is pushed again with its current
+    count until the top one is current, and that one is the smallest.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0.0
+        self._counts: Dict[Hashable, List[float]] = {}  # key -> [count, error]
+        self._heap: List[Tuple[float, int, Hashable]] = []  # (count when pushed, tie-break, key)
+        self._pushed = 0
+
+    def offer(self, key: Hashable, weight: float = 1.0) -> None:
+        if weight <= 0:
+            return
+        self.total += weight
+        counter = self._counts.get(key)
+        if counter is not None:
+            counter[0] += weight
+            return
+        if len(self._counts) < self.capacity:
+            self._counts[key] = [weight, 0.0]
+            self._push(key, weight)
+            return
+        while True:
+            count, _, victim = heapq.heappop(self._heap)
+            current = self._counts[victim][0]
+            if current == count:
+                break
+            self._push(victim, current)
+        del self._counts[victim]
+        self._counts[key] = [count + weight, count]
+        self._push(key, count + weight)
+
+    def _push(self, key: Hashable, count: float) -> None:
+        self._pushed += 1
+        heapq.heappush(self._heap, (count, self._pushed, key))
+
+    def top(self, k: int) -> List[Tuple[Hashable, float, float]]:
+        """The k largest counters as (key, count, error), largest first."""
+        ranked = sorted(self._counts.items(), key=lambda item: -item[1][0])[:k]
+        return [(key, count, error) for key, (count, error) in ranked]
+
+
+class TopN:
+    """Bounded min-heap keeping the n items with the largest score, one per id."""
+
+    def __init__(self, n: int):
+        self.n = n
+        self._heap: List[Tuple[float, Hashable, Any]] = []
+        self._scores: Dict[Hashable, float] = {}
+
+    def offer(self, score: float, item_id: Hashable, item: Any) -> None:
+        known = self._scores.get(item_id)
+        if known is not None:
+            if score <= known:
+                return
+            # A larger score for an id already kept replaces its entry
+            self._heap = [entry for entry in self._heap if entry[1] != item_id]
+            heapq.heapify(self._heap)
+        elif len(self._heap) >= self.n and score <= self._heap[0][0]:
+            return
+        heapq.heappush(self._heap, (score, item_id, item))
+        self._scores[item_id] = score
+        if len(self._heap) > self.n:
+            _, evicted, _ = heapq.heappop(self._heap)
+            del self._scores[evicted]
+
+    def items(self) -> List[Tuple[float, Any]]:
+        """Kept (score, item) pairs, largest score first."""
+        return [(score, item) for score, _, item in sorted(self._heap, key=lambda e: -e[0])]
+
+
+class LogSketch:
+    """Mergeable quantile sketch with relative-error guarantees, in the style of DDSketch.
+
+    Values fall into logarithmic buckets of ratio (1 + a) / (1 - a), so any
+    quantile is returned within `relative_accuracy` of a true value; memory
+    grows with the log of the value range, not with the number of values.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma_log = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self._positive: Dict[int, float] = {}
+        self._negative: Dict[int, float] = {}
+        self.zeros = 0.0
+        self.count = 0.0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        if value > 0:
+            index = math.ceil(math.log(value) / self._gamma_log)
+            self._positive[index] = self._positive.get(index, 0.0) + weight
+        elif value < 0:
+            index = math.ceil(math.log(-value) / self._gamma_log)
+            self._negative[index] = self._negative.get(index, 0.0) + weight
+        else:
+            self.zeros += weight
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LogSketch") -> None:
+        for mine, theirs in ((self._positive, other._positive), (self._negative, other._negative)):
+            for index, weight in theirs.items():
+                mine[index] = mine.get(index, 0.0) + weight
+        self.zeros += other.zeros
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _value(self, index: int) -> float:
+        # Midpoint of the bucket in relative terms
+        return 2 * math.exp(index * self._gamma_log) / (1 + math.exp(self._gamma_log))
+
+    def buckets(self) -> List[Tuple[float, float]]:
+        """(value, weight) of every non-empty bucket in ascending order, each value its bucket's midpoint within [min, max]."""
+        values = [(max(self.min, -self._value(index)), self._negative[index]) for index in sorted(self._negative, reverse=True)]
+        if self.zeros:
+            values.append((0.0, self.zeros))
+        values += [(min(self.max, self._value(index)), self._positive[index]) for index in sorted(self._positive)]
+        return values
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0.0
+        for index in sorted(self._negative, reverse=True):
+            seen += self._negative[index]
+            if seen > rank:
+                return max(self.min, -self._value(index))
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self._positive):
+            seen += self._positive[index]
+            if seen > rank:
+                return min(self.max, self._value(index))
+        return self.max
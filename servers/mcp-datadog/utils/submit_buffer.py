@@ -0,0 +1,194 @@
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from config import SUBMIT_MAX_ATTEMPTS
+from utils.resilience import backoff_delay, is_retriable, is_throttled
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFullError(Exception):
+    """Raised when a submission cannot be queued before its timeout because the buffer is full."""
+
+
+class SubmissionBuffer:
+    """Keyed buffer that coalesces submissions and sends them in batches from a background thread.
+
+    A submission whose key is already pending is combined with the pending
+    one by `merge(old, new)` (by default the new one replaces it), so it
+    takes no extra room. The flusher sends everything pending every
+    `flush_interval` seconds, or as soon as `max_batch` keys are waiting,
+    in batches of at most `max_batch` through `send`. When `max_pending`
+    keys are waiting, add() blocks until a flush makes room. A batch that
+    fails transiently is put back (merged under anything newer) and retried
+    with backoff, up to `max_attempts` sends per submission; one rejected
+    outright, such as a 400, 403 or 413, is dropped and logged. Pending
+    submissions are flushed at interpreter exit.
+    """
+
+    def __init__(self, name: str, send: Callable[[List[Any]], None], flush_interval: float, max_batch: int,
+                 max_pending: int, merge: Optional[Callable[[Any, Any], Any]] = None,
+                 max_attempts: int = SUBMIT_MAX_ATTEMPTS):
+        self.name = name
+        self.send = send
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.merge = merge or (lambda old, new: new)
+        self.max_attempts = max_attempts
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._failures = 0  # consecutive failed sends
+        self._retry_at = 0.0  # monotonic time before which a failed send is not retried
+        self._attempts: Dict[Hashable, int] = {}  # failed sends of keys put back for another try
+        self._stats = {"submitted": 0, "coalesced": 0, "sent": 0, "batches": 0, "failed_batches": 0, "rejected": 0,
+                       "dropped": 0}
+        self._last_error: Optional[str] = None
+        self._last_flush: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"flush-{self.name}", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def add(self, key: Hashable, value: Any, timeout: float) -> None:
+        """Queue a submission, waiting up to `timeout` seconds for room; raises BufferFullError otherwise."""
+        with self._cond:
+            if self._closed:
+                raise BufferFullError(f"{self.name} buffer is closed")
+            self._start()
+            self._stats["submitted"] += 1
+            if key in self._pending:
+                self._pending[key] = self.merge(self._pending[key], value)
+                self._stats["coalesced"] += 1
+                return
+            deadline = time.monotonic() + timeout
+            while len(self._pending) >= self.max_pending:
+                self._flush_requested = True
+                self._cond.notify_all()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining) and len(self._pending) >= self.max_pending:
+                    self._stats["rejected"] += 1
+                    raise BufferFullError(f"{self.name} buffer is full ({self.max_pending} pending)")
+            self._pending[key] = value
+            if len(self._pending) >= self.max_batch:
+                self._flush_requested = True
+                self._cond.notify_all()
+
+    def flush(self, timeout: float) -> bool:
+        """Send everything pending now and wait up to `timeout` seconds for it; True if the buffer drained."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._thread is None or self._closed:
+                return not self._pending
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending or self._in_flight or self._flush_requested:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush what is pending and stop the flusher."""
+        drained = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if not drained:
+            logger.warning("%s buffer closed with %d submissions unsent", self.name, len(self._pending))
+
+    def _take(self) -> List[Tuple[Hashable, Any]]:
+        items = list(self._pending.items())
+        self._pending.clear()
+        self._in_flight = len(items)
+        self._flush_requested = False
+        self._cond.notify_all()  # room for blocked add() calls
+        return items
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                due = time.monotonic() + self.flush_interval
+                while not self._closed:
+                    now = time.monotonic()
+                    if now >= self._retry_at and (self._flush_requested or now >= due):
+                        break
+                    self._cond.wait(max(self._retry_at, now if self._flush_requested else due) - now)
+                if self._closed and not self._pending:
+                    return
+                items = self._take()
+            for start in range(0, len(items), self.max_batch):
+                batch = items[start:start + self.max_batch]
+                try:
+                    self.send([value for _, value in batch])
+                except Exception as e:
+                    logger.warning("Sending %d %s submissions failed: %s", len(batch), self.name, e)
+                    self._requeue(batch, items[start + self.max_batch:], e)
+                    break
+                with self._cond:
+                    for key, _ in batch:
+                        self._attempts.pop(key, None)
+                    self._failures, self._retry_at = 0, 0.0
+                    self._in_flight -= len(batch)
+                    self._stats["sent"] += len(batch)
+                    self._stats["batches"] += 1
+                    self._last_flush = time.time()
+                    self._cond.notify_all()
+
+    def _requeue(self, failed: List[Tuple[Hashable, Any]], untried: List[Tuple[Hashable, Any]], error: Exception) -> None:
+        with self._cond:
+            self._stats["failed_batches"] += 1
+            self._last_error = str(error)
+            retry, dropped = [], 0
+            transient = is_retriable(error) or is_throttled(error)
+            for key, value in failed:
+                attempts = self._attempts.pop(key, 0) + 1
+                if transient and attempts < self.max_attempts:
+                    self._attempts[key] = attempts
+                    retry.append((key, value))
+                else:
+                    dropped += 1
+            if dropped:
+                self._stats["dropped"] += dropped
+                logger.error("Dropped %d %s submissions (%s): %s", dropped, self.name,
+                             f"gave up after {self.max_attempts} attempts" if transient else "not retriable", error)
+            if retry:
+                self._failures += 1
+                self._retry_at = time.monotonic() + backoff_delay(self._failures)
+            newer = self._pending
+            self._pending = OrderedDict()
+            for key, value in retry + untried:
+                self._pending[key] = value
+            for key, value in newer.items():
+                self._pending[key] = self.merge(self._pending[key], value) if key in self._pending else value
+            self._in_flight = 0
+            # Without a failure to back off from, the untried batches go out right away
+            self._flush_requested = bool(self._pending) and not retry
+            if self._closed:
+                # Nobody will retry after close; give up on them
+                self._stats["dropped"] += len(self._pending)
+                self._pending.clear()
+                self._attempts.clear()
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self._stats,
+                "pending": len(self._pending),
+                "in_flight": self._in_flight,
+                "consecutive_failures": self._failures,
+                "last_flush": int(self._last_flush) if self._last_flush else None,
+                "last_error": self._last_error,
+            }
@@ -0,0 +1,54 @@
+from typing import Any, List, Tuple
+
+import numpy as np
+
+
+def pointlist_arrays(pointlist: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Split a v1 metrics pointlist into epoch-second times and values, dropping null points."""
+    raw = [getattr(point, "value", point) for point in pointlist or []]
+    pairs = np.array([(p[0], p[1]) for p in raw if p[1] is not None], dtype=float).reshape(-1, 2)
+    return pairs[:, 0] / 1000.0, pairs[:, 1]
+
+
+def response_series(response: Any) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+    """Return (scope, times, values) for every series of a v1 metrics query response."""
+    result = []
+    for series in response.get("series") or []:
+        times, values = pointlist_arrays(series.get("pointlist"))
+        result.append((series.get("scope") or series.get("expression") or "", times, values))
+    return result
+
+
+def align(series: List[Tuple[str, np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Put series on their union of timestamps as a (series, time) matrix, NaN where a series has no point."""
+    if not series:
+        return np.empty(0), np.empty((0, 0))
+    grid = np.unique(np.concatenate([times for _, times, _ in series]))
+    matrix = np.full((len(series), len(grid)), np.nan)
+    for row, (_, times, values) in enumerate(series):
+        matrix[row, np.searchsorted(grid, times)] = values
+    return grid, matrix
+
+
+def true_runs(flags: np.ndarray) -> List[Tuple[int, int, int]]:
+    """Return (row, start, end) for each run of True in a (series, time) boolean matrix, end exclusive."""
+    padded = np.pad(flags.astype(np.int8), ((0, 0), (1, 1)))
+    edges = np.diff(padded, axis=1)
+    starts = np.argwhere(edges == 1)
+    ends = np.argwhere(edges == -1)
+    return [(int(s[0]), int(s[1]), int(e[1])) for s, e in zip(starts, ends)]
+
+
+def align_to(grid: np.ndarray, scopes: List[str], series: List[Tuple[str, np.ndarray, np.ndarray]],
+             shift: float = 0.0) -> np.ndarray:
+    """Interpolate series onto an existing grid, one row per scope, after moving their times by `shift`.
+
+    Scopes absent from `series` and grid points outside a series' range are NaN.
+    """
+    matrix = np.full((len(scopes), len(grid)), np.nan)
+    rows = {scope: row for row, scope in enumerate(scopes)}
+    for scope, times, values in series:
+        row = rows.get(scope)
+        if row is not None and len(times):
+            matrix[row] = np.interp(grid, times + shift, values, left=np.nan, right=np.nan)
+    return matrix
@@ -0,0 +1,159 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+Span = Dict[str, Any]  # span_id, parent_id, trace_id, service, resource, start, end (epoch seconds), error
+
+
+def group_traces(spans: List[Span]) -> Dict[str, List[Span]]:
+    """Group spans by trace_id, dropping duplicates of the same span."""
+    traces: Dict[str, Dict[str, Span]] = defaultdict(dict)
+    for span in spans:
+        traces[span["trace_id"]].setdefault(span["span_id"], span)
+    return {trace_id: list(by_id.values()) for trace_id, by_id in traces.items()}
+
+
+def build_tree(spans: List[Span]) -> Tuple[List[Span], Dict[str, List[Span]]]:
+    """Return the roots and the children of every span, each list sorted by start time.
+
+    Spans whose parent is not among `spans` (the root, or spans whose parent
+    was not retained) become roots.
+    """
+    ids = {span["span_id"] for span in spans}
+    children: Dict[str, List[Span]] = defaultdict(list)
+    roots = []
+    for span in spans:
+        parent = span.get("parent_id")
+        if parent and parent != "0" and parent in ids and parent != span["span_id"]:
+            children[parent].append(span)
+        else:
+            roots.append(span)
+    for siblings in children.values():
+        siblings.sort(key=lambda s: s["start"])
+    roots.sort(key=lambda s: s["start"])
+    return roots, children
+
+
+def self_time(span: Span, children: List[Span]) -> float:
+    """Time the span spent outside all of its children."""
+    busy, cursor = 0.0, span["start"]
+    for child in children:
+        start, end = max(child["start"], cursor), min(child["end"], span["end"])
+        if end > start:
+            busy += end - start
+            cursor = end
+    return max(0.0, span["end"] - span["start"] - busy)
+
+
+def critical_path(root: Span, children: Dict[str, List[Span]]) -> List[Tuple[Span, float]]:
+    """Walk back from the end of the root, always following the child that finished last.
+
+    Returns (span, seconds on the path) for every span on the critical
+    path, in start order. Iterative, so deep traces do not hit the
+    recursion limit.
+    """
+    contribution: Dict[str, float] = defaultdict(float)
+    on_path: Dict[str, Span] = {}
+    stack = [(root, root["end"])]
+    while stack:
+        span, bound = stack.pop()
+        on_path[span["span_id"]] = span
+        cursor = min(span["end"], bound)
+        for child in sorted(children.get(span["span_id"], []), key=lambda c: c["end"], reverse=True):
+            if child["start"] >= cursor:
+                continue
+            child_end = min(child["end"], cursor)
+            contribution[span["span_id"]] += cursor - child_end
+            stack.append((child, child_end))
+            cursor = max(child["start"], span["start"])
+        contribution[span["span_id"]] += max(0.0, cursor - span["start"])
+    path = sorted(on_path.values(), key=lambda s: s["start"])
+    return [(span, contribution[span["span_id"]]) for span in path]
+
+
+def analyze_trace(spans: List[Span], max_rows: int = 30, top: int = 5) -> Dict[str, Any]:
+    """Summarize one trace: critical path, self time per service, slowest cross-service hops and a waterfall.
+
+    The waterfall collapses spans that share the same chain of
+    (service, resource) from the root into one row with a count, so loops
+    of identical calls read as a single line; only the `max_rows` rows with
+    the most total time are kept, in tree order.
+    """
+    roots, children = build_tree(spans)
+    trace_start = min(span["start"] for span in spans)
+    trace_end = max(span["end"] for span in spans)
+    by_id = {span["span_id"]: span for span in spans}
+    root = max(roots, key=lambda s: s["end"] - s["start"])
+
+    service_self: Dict[str, float] = defaultdict(float)
+    for span in spans:
+        service_self[span["service"]] += self_time(span, children.get(span["span_id"], []))
+
+    hops = []
+    for span in spans:
+        parent = by_id.get(span.get("parent_id"))
+        if parent is not None and parent["service"] != span["service"]:
+            hops.append((span["end"] - span["start"], parent, span))
+    hops.sort(key=lambda h: -h[0])
+
+    rows: Dict[Tuple, Dict[str, Any]] = {}
+    stack = [(r, ()) for r in reversed(roots)]
+    order = 0
+    while stack:
+        span, prefix = stack.pop()
+        key = prefix + ((span["service"], span["resource"]),)
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = {"order": order, "depth": len(key) - 1, "service": span["service"],
+                               "resource": span["resource"], "count": 0, "errors": 0, "total": 0.0,
+                               "offset": span["start"] - trace_start, "end": 0.0}
+            order += 1
+        row["count"] += 1
+        row["errors"] += 1 if span.get("error") else 0
+        row["total"] += span["end"] - span["start"]
+        row["offset"] = min(row["offset"], span["start"] - trace_start)
+        row["end"] = max(row["end"], span["end"] - trace_start)
+        stack.extend((child, key) for child in reversed(children.get(span["span_id"], [])))
+    kept = sorted(sorted(rows.values(), key=lambda r: -r["total"])[:max_rows], key=lambda r: r["order"])
+
+    def ms(seconds: float) -> float:
+        return round(seconds * 1000, 3)
+
+    # Consecutive path entries for the same call (e.g. a loop of queries) become one entry
+    path: List[Dict[str, Any]] = []
+    for span, seconds in critical_path(root, children):
+        if seconds <= 0:
+            continue
+        last = path[-1] if path else None
+        if last and (last["service"], last["resource"]) == (span["service"], span["resource"]):
+            last["count"] += 1
+            last["self"] += seconds
+        else:
+            path.append({"service": span["service"], "resource": span["resource"], "span_id": span["span_id"],
+                         "count": 1, "self": seconds})
+
+    return {
+        "trace_id": root["trace_id"],
+        "root": {"service": root["service"], "resource": root["resource"]},
+        "duration_ms": ms(trace_end - trace_start),
+        "span_count": len(spans),
+        "error_count": sum(1 for span in spans if span.get("error")),
+        "services": len(service_self),
+        "critical_path": [
+            {"service": p["service"], "resource": p["resource"], "span_id": p["span_id"], "count": p["count"],
+             "self_ms": ms(p["self"])}
+            for p in path
+        ],
+        "self_time_by_service_ms": {
+            service: ms(seconds) for service, seconds in sorted(service_self.items(), key=lambda i: -i[1])
+        },
+        "slowest_hops": [
+            {"from": parent["service"], "to": span["service"], "resource": span["resource"], "duration_ms": ms(duration)}
+            for duration, parent, span in hops[:top]
+        ],
+        "waterfall": [
+            {"depth": r["depth"], "service": r["service"], "resource": r["resource"], "count": r["count"],
+             "errors": r["errors"], "offset_ms": ms(r["offset"]), "end_ms": ms(r["end"]), "total_ms": ms(r["total"])}
+            for r in kept
+        ],
+        "waterfall_rows_omitted": len(rows) - len(kept),
+    }
@@ -0,0 +1,144 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+HOUR = 3600
+
+AGGREGATIONS = ("sum", "avg", "max")
+PERIODS = {"hour": "h", "day": "D", "month": "M"}
+
+
+class HourlyUsageTable:
+    """Hourly usage kept as one float array per column over a shared, contiguous hour axis.
+
+    Columns are "product_family/usage_type". Each product family also keeps,
+    per hour, when that hour was last fetched, which is what decides whether
+    it needs fetching again: an hour fetched at least `finalize_delay`
+    seconds after it ended is final and never refetched.
+    """
+
+    def __init__(self, finalize_delay: float, recent_ttl: float):
+        self.finalize_delay = finalize_delay
+        self.recent_ttl = recent_ttl
+        self._lock = threading.Lock()
+        self.start_hour = 0  # epoch hour of index 0
+        self.hours = 0
+        self.columns: Dict[str, np.ndarray] = {}
+        self.fetched_at: Dict[str, np.ndarray] = {}  # product family -> epoch seconds, 0 when never fetched
+        self.last_reported: Dict[str, int] = {}  # product family -> latest epoch hour any fetch returned
+
+    def _ensure(self, first_hour: int, end_hour: int) -> None:
+        """Grow every array so that [first_hour, end_hour) is covered."""
+        if self.hours == 0:
+            self.start_hour, self.hours = first_hour, 0
+        new_start = min(self.start_hour, first_hour)
+        new_end = max(self.start_hour + self.hours, end_hour)
+        if new_start == self.start_hour and new_end == self.start_hour + self.hours:
+            return
+        before, after = self.start_hour - new_start, new_end - (self.start_hour + self.hours)
+        for name, values in self.columns.items():
+            self.columns[name] = np.pad(values, (before, after), constant_values=np.nan)
+        for family, fetched in self.fetched_at.items():
+            self.fetched_at[family] = np.pad(fetched, (before, after))
+        self.start_hour, self.hours = new_start, new_end - new_start
+
+    def stale_ranges(self, family: str, first_hour: int, end_hour: int, now: float) -> List[Tuple[int, int]]:
+        """Runs of hours in [first_hour, end_hour) of a family that must be (re)fetched, as (first, end) hours."""
+        with self._lock:
+            self._ensure(first_hour, end_hour)
+            fetched = self.fetched_at.setdefault(family, np.zeros(self.hours))
+            offset = first_hour - self.start_hour
+            window = fetched[offset:offset + end_hour - first_hour]
+        hour_end = (np.arange(first_hour, end_hour) + 1) * HOUR
+        final = window >= hour_end + self.finalize_delay
+        fresh = now - window < self.recent_ttl
+        stale = ~(final | fresh)
+        edges = np.diff(np.concatenate(([0], stale.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        return [(first_hour + int(s), first_hour + int(e)) for s, e in zip(starts, ends)]
+
+    def store(self, family: str, first_hour: int, end_hour: int, fetched_at: float,
+              rows: Iterable[Tuple[int, str, float]]) -> None:
+        """Record a fetch of [first_hour, end_hour) for a family; rows are (epoch hour, usage_type, value).
+
+        Hours up to the last reported one without a row for a column become
+        0, since the API omits hours with no usage; later hours, not reported
+        yet, stay unknown. A usage type seen for the first time is also 0
+        over every hour the family was already fetched for, up to the
+        family's last reported hour.
+        """
+        rows = [row for row in rows if first_hour <= row[0] < end_hour]
+        with self._lock:
+            self._ensure(first_hour, end_hour)
+            lo, hi = first_hour - self.start_hour, end_hour - self.start_hour
+            reported = max((row[0] for row in rows), default=first_hour - 1) + 1 - self.start_hour
+            last = self.last_reported[family] = max(self.last_reported.get(family, -1), reported - 1 + self.start_hour)
+            fetched = self.fetched_at.setdefault(family, np.zeros(self.hours))
+            prefix = f"{family}/"
+            for name, values in self.columns.items():
+                if name.startswith(prefix):
+                    values[lo:hi] = np.nan
+                    values[lo:reported] = 0.0
+            for hour, usage_type, value in rows:
+                name = prefix + usage_type
+                column = self.columns.get(name)
+                if column is None:
+                    column = self.columns[name] = np.full(self.hours, np.nan)
+                    known = last + 1 - self.start_hour
+                    column[:known][fetched[:known] > 0] = 0.0
+                    column[lo:reported] = 0.0
+                column[hour - self.start_hour] = value
+            fetched[lo:hi] = fetched_at
+
+    def matrix(self, names: List[str], first_hour: int, end_hour: int) -> np.ndarray:
+        """(column, hour) copy of the requested columns over [first_hour, end_hour), NaN where unknown."""
+        with self._lock:
+            result = np.full((len(names), end_hour - first_hour), np.nan)
+            lo, hi = max(first_hour, self.start_hour), min(end_hour, self.start_hour + self.hours)
+            for row, name in enumerate(names):
+                values = self.columns.get(name)
+                if values is not None and hi > lo:
+                    result[row, lo - first_hour:hi - first_hour] = values[lo - self.start_hour:hi - self.start_hour]
+            return result
+
+    def column_names(self, families: Optional[Iterable[str]] = None) -> List[str]:
+        with self._lock:
+            names = sorted(self.columns)
+        if families is None:
+            return names
+        families = set(families)
+        return [name for name in names if name.split("/", 1)[0] in families]
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(a.nbytes for a in self.columns.values()) + sum(a.nbytes for a in self.fetched_at.values())
+
+
+def aggregate(matrix: np.ndarray, first_hour: int, period: Optional[str], aggregation: str) -> Tuple[List[str], np.ndarray]:
+    """Aggregate a (column, hour) matrix into calendar periods, ignoring unknown hours.
+
+    Returns the period labels and a (column, period) matrix; periods with no
+    known hour for a column are NaN. A period of None aggregates the whole range.
+    """
+    if period is None:
+        labels, inverse = np.array(["total"]), np.zeros(matrix.shape[1], dtype=int)
+    else:
+        hours = (np.arange(matrix.shape[1]) + first_hour) * HOUR
+        buckets = hours.astype("datetime64[s]").astype(f"datetime64[{PERIODS[period]}]")
+        labels, inverse = np.unique(buckets, return_inverse=True)
+    known = ~np.isnan(matrix)
+    values = np.where(known, matrix, 0.0)
+    counts = np.zeros((matrix.shape[0], len(labels)))
+    np.add.at(counts, (slice(None), inverse), known)
+    if aggregation == "max":
+        result = np.full((matrix.shape[0], len(labels)), -np.inf)
+        np.maximum.at(result, (slice(None), inverse), np.where(known, matrix, -np.inf))
+    else:
+        result = np.zeros((matrix.shape[0], len(labels)))
+        np.add.at(result, (slice(None), inverse), values)
+        if aggregation == "avg":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = result / counts
+    result[counts == 0] = np.nan
+    return [str(label) for label in labels], result